@@ -0,0 +1,31 @@
+"""index messages by room and creation time
+
+Revision ID: a3d5e7f9b1c2
+Revises: f1c86e0b6770
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d5e7f9b1c2"
+down_revision: Union[str, Sequence[str], None] = "f1c86e0b6770"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: composite index backing room history reads."""
+    op.create_index(
+        "ix_messages_room_id_created_at",
+        "messages",
+        ["room_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the room history index."""
+    op.drop_index("ix_messages_room_id_created_at", table_name="messages")
@@ -0,0 +1,70 @@
+"""direct messages and inboxes
+
+Revision ID: a7c9e1f3b5d6
+Revises: f6c8e0a2b4d5
+Create Date: 2026-10-19 21:02:17.480913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c9e1f3b5d6"
+down_revision: Union[str, Sequence[str], None] = "f6c8e0a2b4d5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: direct_messages and inbox_entries."""
+    op.create_table(
+        "direct_messages",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("sender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("recipient_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(["sender_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["recipient_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_direct_messages_pair_created_at",
+        "direct_messages",
+        [
+            sa.text("least(sender_id, recipient_id)"),
+            sa.text("greatest(sender_id, recipient_id)"),
+            "created_at",
+            "id",
+        ],
+    )
+    op.create_table(
+        "inbox_entries",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("peer_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("last_message_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("last_sender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("preview", sa.String(length=200), nullable=False),
+        sa.Column("last_message_at", sa.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+        sa.Column("unread", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["peer_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "peer_id"),
+    )
+    op.create_index(
+        "ix_inbox_entries_user_id_last_message_at",
+        "inbox_entries",
+        ["user_id", "last_message_at", "peer_id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop direct_messages and inbox_entries."""
+    op.drop_index("ix_inbox_entries_user_id_last_message_at", table_name="inbox_entries")
+    op.drop_table("inbox_entries")
+    op.drop_index("ix_direct_messages_pair_created_at", table_name="direct_messages")
+    op.drop_table("direct_messages")
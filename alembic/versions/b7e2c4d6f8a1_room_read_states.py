@@ -0,0 +1,62 @@
+"""room message counters and per-user read watermarks
+
+Revision ID: b7e2c4d6f8a1
+Revises: a3d5e7f9b1c2
+Create Date: 2026-10-19 18:40:12.504113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2c4d6f8a1"
+down_revision: Union[str, Sequence[str], None] = "a3d5e7f9b1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: chatrooms.message_count and room_read_states."""
+    op.add_column(
+        "chatrooms",
+        sa.Column("message_count", sa.BigInteger(), server_default="0", nullable=False),
+    )
+    op.execute(
+        "UPDATE chatrooms SET message_count = counts.n "
+        "FROM (SELECT room_id, count(*) AS n FROM messages GROUP BY room_id) AS counts "
+        "WHERE counts.room_id = chatrooms.id"
+    )
+
+    op.create_table(
+        "room_read_states",
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "room_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("chatrooms.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("read_count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("user_id", "room_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop read watermarks and the room counter."""
+    op.drop_table("room_read_states")
+    op.drop_column("chatrooms", "message_count")
@@ -0,0 +1,34 @@
+"""one message per attachment
+
+Revision ID: b8d0f2a4c6e8
+Revises: a7c9e1f3b5d6
+Create Date: 2026-10-19 22:40:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d0f2a4c6e8"
+down_revision: Union[str, Sequence[str], None] = "a7c9e1f3b5d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: an attachment is posted in at most one message."""
+    op.create_index(
+        "ux_messages_attachment_id",
+        "messages",
+        ["attachment_id"],
+        unique=True,
+        postgresql_where=sa.text("attachment_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the attachment index."""
+    op.drop_index("ux_messages_attachment_id", table_name="messages")
@@ -0,0 +1,38 @@
+"""cluster membership for room ownership
+
+Revision ID: c9d1e3f5a7b2
+Revises: b7e2c4d6f8a1
+Create Date: 2026-10-19 19:02:37.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c9d1e3f5a7b2"
+down_revision: Union[str, Sequence[str], None] = "b7e2c4d6f8a1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: create cluster_members."""
+    op.create_table(
+        "cluster_members",
+        sa.Column("member_id", sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column("url", sa.String(length=255), nullable=False),
+        sa.Column(
+            "heartbeat_at",
+            sa.TIMESTAMP(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop cluster_members."""
+    op.drop_table("cluster_members")
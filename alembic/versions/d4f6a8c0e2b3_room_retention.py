@@ -0,0 +1,30 @@
+"""per-room message retention settings
+
+Revision ID: d4f6a8c0e2b3
+Revises: c9d1e3f5a7b2
+Create Date: 2026-10-19 19:31:05.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4f6a8c0e2b3"
+down_revision: Union[str, Sequence[str], None] = "c9d1e3f5a7b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: chatrooms.retention_days / retention_max_messages."""
+    op.add_column("chatrooms", sa.Column("retention_days", sa.Integer(), nullable=True))
+    op.add_column("chatrooms", sa.Column("retention_max_messages", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the retention settings."""
+    op.drop_column("chatrooms", "retention_max_messages")
+    op.drop_column("chatrooms", "retention_days")
@@ -0,0 +1,53 @@
+"""file attachments
+
+Revision ID: e5b7d9f1a3c4
+Revises: d4f6a8c0e2b3
+Create Date: 2026-10-19 20:04:48.273615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b7d9f1a3c4"
+down_revision: Union[str, Sequence[str], None] = "d4f6a8c0e2b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: attachments and messages.attachment_id."""
+    op.create_table(
+        "attachments",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("content_type", sa.String(length=100), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("room_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["room_id"], ["chatrooms.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_attachments_sha256", "attachments", ["sha256"])
+    op.add_column(
+        "messages",
+        sa.Column("attachment_id", postgresql.UUID(as_uuid=True), nullable=True),
+    )
+    op.create_foreign_key(
+        "messages_attachment_id_fkey", "messages", "attachments", ["attachment_id"], ["id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop attachments."""
+    op.drop_constraint("messages_attachment_id_fkey", "messages", type_="foreignkey")
+    op.drop_column("messages", "attachment_id")
+    op.drop_index("ix_attachments_sha256", table_name="attachments")
+    op.drop_table("attachments")
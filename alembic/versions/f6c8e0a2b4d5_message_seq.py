@@ -0,0 +1,42 @@
+"""per-room message sequence numbers
+
+Revision ID: f6c8e0a2b4d5
+Revises: e5b7d9f1a3c4
+Create Date: 2026-10-19 20:41:16.903527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6c8e0a2b4d5"
+down_revision: Union[str, Sequence[str], None] = "e5b7d9f1a3c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: messages.seq, numbered up to each room's message_count."""
+    op.add_column("messages", sa.Column("seq", sa.BigInteger(), nullable=True))
+    # Existing messages in creation order; the newest one gets the room's
+    # current message_count (older, pruned messages keep their numbers)
+    op.execute(
+        "UPDATE messages SET seq = numbered.seq "
+        "FROM ("
+        "  SELECT m.id, c.message_count - count(*) OVER (PARTITION BY m.room_id)"
+        "         + row_number() OVER (PARTITION BY m.room_id ORDER BY m.created_at, m.id) AS seq"
+        "  FROM messages m JOIN chatrooms c ON c.id = m.room_id"
+        ") AS numbered "
+        "WHERE numbered.id = messages.id"
+    )
+    op.alter_column("messages", "seq", nullable=False)
+    op.create_index("ux_messages_room_id_seq", "messages", ["room_id", "seq"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop messages.seq."""
+    op.drop_index("ux_messages_room_id_seq", table_name="messages")
+    op.drop_column("messages", "seq")
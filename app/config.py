@@ -5,6 +5,87 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
 
+    # Read replica (see app/database/session.py)
+    DATABASE_READ_URL: str | None = None# Read-only pages use this database when set
+    READ_YOUR_WRITES_SECONDS: float = 5.0# Users who just wrote read from the primary this long (per worker: needs sticky sessions with several workers)
+
+    # Metrics (see app/utils/metrics.py)
+    METRICS_ENDPOINT: bool = False# Serve /metrics; unauthenticated, keep it off public listeners
+
+    # SQL profiling (opt-in, see app/database/profiler.py)
+    SQL_PROFILING: bool = False
+    SQL_SLOW_QUERY_MS: float = 100.0# Log statements slower than this
+    SQL_REPEAT_THRESHOLD: int = 2# Flag statements issued this many times in one request
+    SQL_PROFILING_ENDPOINT: bool = False# Serve /debug/sql; shows statement text, keep it off public listeners
+
+    # User identity cache (id <-> username, see app/services/user_cache.py)
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 300.0
+    USER_CACHE_SHARED: bool = False# Propagate invalidations to other workers via Postgres NOTIFY
+    LISTEN_HEALTH_CHECK_SECONDS: float = 30.0# Ping LISTEN connections this often, reconnect when they are gone (see app/database/listener.py)
+
+    # HTTP caching (see app/services/chat_state.py)
+    HTTP_VALIDATOR_TTL_SECONDS: float = 5.0# Reload page validators after this long (0 = never, single process only)
+    HISTORY_PAGE_SIZE: int = 50# Default page size of the JSON history endpoint
+
+    # Unread counts (see app/services/read_state.py)
+    READ_STATE_FLUSH_SECONDS: float = 2.0# Debounce interval for writing read watermarks
+
+    # File attachments (see app/services/attachments.py)
+    ATTACHMENT_DIR: str = "data/attachments"# Content-addressed store, keep it on a persistent volume
+    ATTACHMENT_MAX_BYTES: int = 100 * 1024 * 1024
+
+    # Message retention (see app/services/retention.py)
+    RETENTION_INTERVAL_SECONDS: float = 3600.0# Pruning runs this often (0 = never in the background)
+    RETENTION_BATCH_SIZE: int = 500# Messages deleted per transaction
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.05# Sleep between batches (lets replicas and writers catch up)
+    RETENTION_DRY_RUN: bool = False# Only count what would be deleted
+
+    # Reconnect resync (see app/websocket/resync.py)
+    RESYNC_BUFFER_SIZE: int = 100# Recent message frames kept per room for reconnecting clients
+    RESYNC_BUFFER_ROOMS: int = 1000# Rooms with a buffer, least recently active dropped first
+    RESYNC_MAX_MESSAGES: int = 500# Most messages replayed to one client, older ones are skipped
+
+    # Event-loop health (see app/utils/loop_monitor.py)
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.5# Scheduling lag is sampled this often (0 = off)
+    LOOP_LAG_WINDOW: int = 120# Recent samples behind the lag percentile gauges
+    LOOP_SLOW_CALLBACK_MS: float = 0# Log callbacks blocking the loop longer than this (0 = off)
+
+    # Static assets (see app/utils/assets.py)
+    ASSET_BUILD_ON_STARTUP: bool = False# Build app/static/dist on startup if it has not been built (the image build does it)
+
+    # Startup warm-up (see app/utils/warmup.py)
+    DB_POOL_WARM_CONNECTIONS: int = 5# Pool connections opened before reporting ready (0 = off)
+    TEMPLATE_PRECOMPILE: bool = True# Compile every Jinja2 template before reporting ready
+    WARM_ROOM_STATES: int = 50# Rooms whose page validators are loaded at startup
+
+    # Typing indicators (see app/websocket/typing_indicators.py)
+    TYPING_INTERVAL_SECONDS: float = 1.0# At most one typing frame per room per interval
+    TYPING_THROTTLE_SECONDS: float = 2.0# At most one accepted typing event per user per room
+
+    # Message rate limits, token buckets (see app/websocket/rate_limit.py; 0 = off)
+    RATE_LIMIT_USER_PER_SECOND: float = 5.0# Sustained messages per second per user
+    RATE_LIMIT_USER_BURST: float = 10.0# Messages a user can send in a burst
+    RATE_LIMIT_ROOM_PER_SECOND: float = 50.0# Sustained messages per second per room
+    RATE_LIMIT_ROOM_BURST: float = 100.0
+
+    # Content filter (see app/services/content_filter.py)
+    CONTENT_FILTER_FILE: str = ""# Blocklist, one term or domain per line (empty = off)
+    CONTENT_FILTER_ACTION: str = "mask"# mask (replace matches with *) or reject (400 / error frame)
+    CONTENT_FILTER_RELOAD_SECONDS: float = 5.0# The file is checked for changes this often (0 = load once)
+
+    # Room ownership across workers (see app/services/cluster.py)
+    CLUSTER_ENABLED: bool = False
+    CLUSTER_ADVERTISE_URL: str | None = None# WebSocket base URL of this worker, e.g. ws://10.0.0.5:8000
+    CLUSTER_HEARTBEAT_SECONDS: float = 5.0
+    CLUSTER_MEMBER_TTL_SECONDS: float = 15.0# Members without a heartbeat this long drop out
+    CLUSTER_VIRTUAL_NODES: int = 64# Ring points per worker, evens out room distribution
+
+    # Graceful shutdown (see app/server.py)
+    DRAIN_RECONNECT_MIN_MS: int = 500# Earliest reconnect delay handed to clients
+    DRAIN_RECONNECT_WINDOW_MS: int = 15000# Reconnects are spread uniformly up to this delay
+    DRAIN_TIMEOUT_SECONDS: float = 10.0# Max wait for in-flight message writes
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -12,12 +93,14 @@ class Settings(BaseSettings):
 
 settings = Settings()# Application settings instance
 
-# Convert Render's sync DB URL to async one
-if settings.DATABASE_URL.startswith("postgres://"):
-    settings.DATABASE_URL = settings.DATABASE_URL.replace(
-        "postgres://", "postgresql+asyncpg://", 1
-    )
-elif settings.DATABASE_URL.startswith("postgresql://"):
-    settings.DATABASE_URL = settings.DATABASE_URL.replace(
-        "postgresql://", "postgresql+asyncpg://", 1
-    )
\ No newline at end of file
+def _async_url(url: str) -> str:
+    # Convert Render's sync DB URL to async one
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+settings.DATABASE_URL = _async_url(settings.DATABASE_URL)
+if settings.DATABASE_READ_URL:
+    settings.DATABASE_READ_URL = _async_url(settings.DATABASE_READ_URL)
@@ -0,0 +1,101 @@
+"""Postgres LISTEN over a dedicated asyncpg connection that survives drops.
+
+asyncpg delivers notifications through a callback on the connection that
+ran LISTEN; when that connection goes away (database restart, failover,
+a proxy closing idle connections) the callbacks just stop and nothing
+else notices. ``ChannelListener`` watches the connection, through
+asyncpg's termination callback and a ``SELECT 1`` every
+LISTEN_HEALTH_CHECK_SECONDS for drops asyncpg only sees on the next
+query, reconnects with backoff and then calls ``on_reconnect``:
+notifications sent while it was away are lost, the owner resynchronises
+whatever depended on them.
+"""
+from typing import Callable, Optional
+import asyncio
+import logging
+
+from app.config import settings
+from app.utils.metrics import LISTEN_RECONNECTS
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelListener:
+    def __init__(self, channel: str, callback: Callable, on_reconnect: Optional[Callable[[], None]] = None) -> None:
+        self.channel = channel
+        self._callback = callback
+        # asyncpg signature: callback(connection, pid, channel, payload)
+        self._on_reconnect = on_reconnect
+        self._connection = None
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        connection = await asyncpg.connect(dsn)
+        try:
+            await connection.add_listener(self.channel, self._callback)
+        except BaseException:
+            connection.terminate()
+            raise
+        connection.add_termination_listener(self._on_terminated)
+        self._connection = connection
+
+    def _on_terminated(self, connection) -> None:
+        # Ignore the connection we closed ourselves on the way to a new one
+        if connection is self._connection:
+            self._lost.set()
+
+    async def _alive(self) -> bool:
+        try:
+            await asyncio.wait_for(self._connection.execute("SELECT 1"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await asyncio.wait_for(connection.close(), timeout=5)
+            except Exception:
+                connection.terminate()
+
+    async def _reconnect(self) -> None:
+        await self._close()
+        self._lost.clear()
+        delay = 1.0
+        while True:
+            try:
+                await self._connect()
+                break
+            except Exception as e:
+                logger.warning("LISTEN %s: reconnect failed, retrying in %.0fs: %s", self.channel, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+        LISTEN_RECONNECTS.labels(self.channel).inc()
+        logger.info("LISTEN %s: reconnected", self.channel)
+        if self._on_reconnect is not None:
+            self._on_reconnect()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), timeout=settings.LISTEN_HEALTH_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                if await self._alive():
+                    continue
+            logger.warning("LISTEN %s: connection lost, reconnecting", self.channel)
+            await self._reconnect()
+
+    async def start(self) -> None:
+        await self._connect()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._close()
@@ -0,0 +1,194 @@
+"""Opt-in SQL statement profiler built on SQLAlchemy engine events.
+
+When ``SQL_PROFILING`` is enabled every HTTP request and WebSocket
+connection gets a :class:`RequestProfile` stored in a context variable.
+The cursor-execute hooks attribute each statement (and its duration) to
+the profile of the request that issued it, which makes it possible to:
+
+* return per-request statement counts and timings in response headers,
+* log statements slower than ``SQL_SLOW_QUERY_MS`` (parameters redacted),
+* flag statements repeated ``SQL_REPEAT_THRESHOLD`` times in one request,
+  the usual signature of an N+1 query pattern,
+* browse the most recent profiles at ``/debug/sql`` (SQL_PROFILING_ENDPOINT).
+"""
+from collections import deque
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Deque, Dict, List, Optional
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "sql_profile", default=None)
+# Profile of the request currently running on this task (None when idle)
+
+recent_profiles: Deque["RequestProfile"] = deque(maxlen=200)
+# Ring buffer of finished profiles served by /debug/sql
+
+
+class StatementStats:
+    __slots__ = ("count", "total_time", "max_time")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class RequestProfile:
+    """Statements issued while serving a single request or socket."""
+
+    __slots__ = ("kind", "method", "path", "statements", "count", "total_time")
+
+    def __init__(self, kind: str, method: str, path: str) -> None:
+        self.kind = kind
+        self.method = method
+        self.path = path
+        self.statements: Dict[str, StatementStats] = {}
+        self.count = 0
+        self.total_time = 0.0
+
+    def record(self, statement: str, elapsed: float) -> None:
+        stats = self.statements.get(statement)
+        if stats is None:
+            stats = self.statements[statement] = StatementStats()
+        stats.count += 1
+        stats.total_time += elapsed
+        if elapsed > stats.max_time:
+            stats.max_time = elapsed
+        self.count += 1
+        self.total_time += elapsed
+
+    def repeated(self) -> List[str]:
+        """Statements issued at least ``SQL_REPEAT_THRESHOLD`` times."""
+        return [
+            statement
+            for statement, stats in self.statements.items()
+            if stats.count >= settings.SQL_REPEAT_THRESHOLD
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "method": self.method,
+            "path": self.path,
+            "statement_count": self.count,
+            "total_ms": round(self.total_time * 1000, 3),
+            "repeated": self.repeated(),
+            "statements": [
+                {
+                    "sql": statement,
+                    "count": stats.count,
+                    "total_ms": round(stats.total_time * 1000, 3),
+                    "max_ms": round(stats.max_time * 1000, 3),
+                }
+                for statement, stats in sorted(
+                    self.statements.items(), key=lambda item: -item[1].total_time)
+            ],
+        }
+
+
+def _redacted(parameters) -> str:
+    # Only the parameter types are logged, never the values
+    if not parameters:
+        return "no parameters"
+    if isinstance(parameters, dict):
+        values = parameters.values()
+    elif isinstance(parameters, (list, tuple)):
+        values = parameters
+    else:
+        values = (parameters,)
+    return "redacted: " + ", ".join(type(value).__name__ for value in values)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_profiler_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["sql_profiler_start"].pop()
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        where = f"{profile.method} {profile.path}" if profile else "background"
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s [%s]",
+            elapsed * 1000, where, statement, _redacted(parameters),
+        )
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute, drop their start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("sql_profiler_start"):
+        conn.info["sql_profiler_start"].pop()
+
+
+def install(engine: Engine) -> None:
+    """Attach the profiling hooks to a (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _finish(profile: RequestProfile) -> None:
+    recent_profiles.append(profile)
+    if profile.kind != "http":
+        # A socket re-runs the same insert for every message it sends,
+        # repeats there are expected rather than an N+1 pattern.
+        return
+    for statement in profile.repeated():
+        logger.warning(
+            "Statement issued %d times in %s %s (possible N+1): %s",
+            profile.statements[statement].count,
+            profile.method, profile.path, statement,
+        )
+
+
+class SQLProfilerMiddleware:
+    """Pure ASGI middleware that scopes a RequestProfile to each request.
+
+    For HTTP responses the totals are attached as ``X-SQL-Queries``,
+    ``X-SQL-Time-Ms`` and a ``Server-Timing`` entry so browser dev tools
+    show database time next to the request.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            scope["type"], scope.get("method", "WS"), scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                total_ms = profile.total_time * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-queries", str(profile.count).encode()))
+                headers.append((b"x-sql-time-ms", f"{total_ms:.2f}".encode()))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={total_ms:.2f};desc="{profile.count} queries"'.encode(),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            _finish(profile)
@@ -19,14 +19,49 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 # async_sessionmaker: Creates an asynchronous session factory
 # AsyncSession: An asynchronous session class
 
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+# The default pool class used by async engines, subclassed below for metrics
+
 from typing import AsyncGenerator
 # Importing Asynchronous Generator Type Hints
 # AsyncGenerator: The return type used to annotate asynchronous generators
 
+from collections import OrderedDict
+from time import monotonic, perf_counter
+
+from fastapi import Request
+
 from app.config import settings
 # Import application configuration
 # settings: Includes configuration information such as database URL
 
+from app.database import profiler
+# Opt-in SQL statement profiler (enabled with SQL_PROFILING)
+
+from app.utils.metrics import DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_WAIT, DB_READ_SESSIONS
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waits.
+
+    The measured time covers waiting for a free slot, opening new
+    connections and the pre-ping, i.e. everything a request pays before
+    it can run its first statement.
+    """
+
+    pool_name = "primary"
+    # Value of the ``pool`` label on the pool metrics
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_WAIT.labels(self.pool_name).observe(perf_counter() - start)
+
+
+class InstrumentedReplicaQueuePool(InstrumentedQueuePool):
+    pool_name = "replica"
 
 
 engine = create_async_engine(
@@ -61,8 +96,42 @@ engine = create_async_engine(
     # pool_recycle: Maximum lifetime of a connection in the pool (in seconds)
     # 3600: Recycle connections every hour to prevent timeout issues
 
+    poolclass=InstrumentedQueuePool,
+    # poolclass: The connection pool implementation
+    # InstrumentedQueuePool: Default async queue pool plus wait-time metrics
+
 )
 
+if settings.DATABASE_READ_URL:
+    read_engine = create_async_engine(
+        # Read-only engine for a replica (or any second URL of the database)
+        # Same pool settings as the primary; only get_read_db() uses it
+        settings.DATABASE_READ_URL,
+        echo=False,
+        future=True,
+        pool_size=20,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        poolclass=InstrumentedReplicaQueuePool,
+    )
+else:
+    read_engine = engine
+    # No replica configured: reads share the primary engine
+
+for _engine in {engine, read_engine}:
+    _name = _engine.sync_engine.pool.pool_name
+    DB_POOL_CHECKED_OUT.labels(_name).set_function(lambda e=_engine: e.sync_engine.pool.checkedout())
+    DB_POOL_OVERFLOW.labels(_name).set_function(lambda e=_engine: e.sync_engine.pool.overflow())
+# Pool gauges are read straight from the pool when /metrics is scraped
+# (through the engine: dispose() replaces the pool object)
+
+if settings.SQL_PROFILING:
+    profiler.install(engine.sync_engine)
+    if read_engine is not engine:
+        profiler.install(read_engine.sync_engine)
+    # Attribute every statement to the request that issued it
+
 AsyncSessionLocal = async_sessionmaker(
     # Creating an Asynchronous Session Factory
     # This factory is used to create database session instances.
@@ -89,6 +158,56 @@ AsyncSessionLocal = async_sessionmaker(
 
 )
 
+AsyncReadSessionLocal = async_sessionmaker(
+    # Session factory for read-only work, bound to the replica when configured
+    bind=read_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+)
+
+
+class RecentWriters:
+    """Users who wrote recently and should read from the primary.
+
+    A replica can lag behind the primary, so right after posting a message
+    or creating a room a user could load a page that doesn't show it yet.
+    For READ_YOUR_WRITES_SECONDS after a write their reads go to the
+    primary. Entries are kept in expiry order and pruned as new ones
+    arrive.
+
+    The marks live in this worker's memory, so the guarantee only holds
+    for reads served by the worker that took the write: with several
+    workers behind a load balancer that does not pin users to a worker,
+    a read elsewhere can still hit a lagging replica. Most writes arrive
+    over the chat WebSocket, which cannot set a cookie, so the mark
+    cannot travel with the client either.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._until: "OrderedDict[str, float]" = OrderedDict()
+
+    def mark(self, user_id) -> None:
+        now = monotonic()
+        key = str(user_id)
+        self._until[key] = now + self.window
+        self._until.move_to_end(key)
+        while self._until:
+            oldest_key, until = next(iter(self._until.items()))
+            if until > now:
+                break
+            del self._until[oldest_key]
+
+    def is_recent(self, user_id) -> bool:
+        until = self._until.get(str(user_id)) if user_id else None
+        return until is not None and until > monotonic()
+
+
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     # Asynchronous generator function: Obtaining a database session
     
@@ -144,4 +263,31 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             # This part will eventually be executed regardless of 
             # whether an exception occurs.
             # Close the session and release the database connection back to 
-            # the connection pool.
\ No newline at end of file
+            # the connection pool.
+
+def is_replica(session: AsyncSession) -> bool:
+    # True for sessions from get_read_db that read from the replica
+    return session.info.get("replica", False)
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only requests (room list, room history).
+
+    Routed to the replica when DATABASE_READ_URL is set, except for users
+    who wrote within the read-your-writes window. Never write through it.
+    """
+    if read_engine is engine or recent_writers.is_recent(request.session.get("user_id")):
+        session_factory, target = AsyncSessionLocal, "primary"
+    else:
+        session_factory, target = AsyncReadSessionLocal, "replica"
+    DB_READ_SESSIONS.labels(target).inc()
+
+    async with session_factory() as session:
+        session.info["replica"] = target == "replica"
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
@@ -1,33 +1,120 @@
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI
-from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse
 
 from app.config import settings
-from app.routers import auth, chat
+from app.routers import attachments, auth, chat, debug, direct, metrics
 from app.utils.security import login_required
+from app.utils.metrics import MetricsMiddleware
+from app.database.profiler import SQLProfilerMiddleware
+from app.services.cluster import cluster
+from app.services.content_filter import content_filter
+from app.services.direct_messages import direct_relay
+from app.services.read_state import read_watermarks
+from app.services.retention import pruner
+from app.services.user_cache import invalidation_listener
+from app.utils.assets import PrecompressedStaticFiles, ensure_assets
+from app.utils.loop_monitor import LoopMonitorMiddleware, loop_monitor
+from app.utils.warmup import warm_up
 from app.websocket import chatws
+from app.websocket.manager import manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup / shutdown hooks
+    app.state.ready = False
+    # /ready reports 503 until the warm-up task has finished
+
+    if settings.ASSET_BUILD_ON_STARTUP:
+        ensure_assets()
+        # Fingerprint and precompress static files unless already built (image build)
+    if settings.USER_CACHE_SHARED:
+        await invalidation_listener.start()
+        # Receive user cache invalidations from the other workers
+
+    if settings.CLUSTER_ENABLED:
+        await cluster.start()
+        # Join the room ownership ring (heartbeat in cluster_members)
+        await direct_relay.start()
+        # Direct messages reach users whose sockets are on other workers
+
+    loop_monitor.start()
+    # Scheduling lag sampling (and slow-callback logging when enabled)
+    read_watermarks.start()
+    # Batched, debounced writes of read watermarks (unread counts)
+    pruner.start()
+    # Periodic, batched deletion of messages past their room's retention
+    content_filter.start()
+    # Blocklist for message text, reloaded when CONTENT_FILTER_FILE changes
+
+    warmup_task = asyncio.create_task(warm_up(app))
+    # Pre-open pool connections, compile templates and load page validators
+    yield
+
+    app.state.ready = False
+    warmup_task.cancel()
+    await content_filter.stop()
+    await pruner.stop()
+    await read_watermarks.stop()
+    await loop_monitor.stop()
+    if settings.CLUSTER_ENABLED:
+        await direct_relay.stop()
+        await cluster.stop()
+    if settings.USER_CACHE_SHARED:
+        await invalidation_listener.stop()
+
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application: middleware, static files and routers."""
+    app = FastAPI(lifespan=lifespan)# FastAPI application instance
+    app.state.ready = False
+
+    app.add_middleware(
+        # Session middleware for managing user sessions
+        SessionMiddleware,
+        secret_key=settings.SECRET_KEY,
+        session_cookie="session_id",
+        max_age=3600,
+    )
+
+    if settings.SQL_PROFILING:
+        app.add_middleware(SQLProfilerMiddleware)# Per-request SQL statement counts and timings
+
+    if settings.LOOP_SLOW_CALLBACK_MS > 0:
+        app.add_middleware(LoopMonitorMiddleware)# Lets slow-callback logs name the route responsible
+
+    app.add_middleware(MetricsMiddleware)# Per-route request latency (outermost, times the whole stack)
+
+    app.mount("/static", PrecompressedStaticFiles(directory="app/static"), name="static")
+
+    app.include_router(auth.router)# Authentication routes
+    app.include_router(chat.router)# Chat routes
+    app.include_router(attachments.router)# File attachment upload / download
+    app.include_router(direct.router)# Direct messages and inbox
+    app.include_router(chatws.router)# WebSocket chat routes
 
+    if settings.METRICS_ENDPOINT:
+        app.include_router(metrics.router)# Prometheus metrics endpoint
 
-app = FastAPI()# FastAPI application instance
+    if settings.SQL_PROFILING and settings.SQL_PROFILING_ENDPOINT:
+        app.include_router(debug.router)# SQL profiler debug endpoints
 
-templates = Jinja2Templates(directory="app/templates")# Jinja2 templates for rendering HTML pages
+    @app.get("/")
+    async def home():
+        return RedirectResponse("/chat/rooms", status_code=302)
 
-app.add_middleware(
-    # Session middleware for managing user sessions
-    SessionMiddleware,
-    secret_key=settings.SECRET_KEY,
-    session_cookie="session_id",
-    max_age=3600,
-)
+    @app.get("/ready")
+    async def ready():
+        """Readiness probe: 200 once warm-up is done, 503 before that or while draining."""
+        if app.state.ready and manager.accepting:
+            return JSONResponse({"status": "ready"})
+        return JSONResponse({"status": "starting"}, status_code=503)
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+    return app
 
-app.include_router(auth.router)# Authentication routes
-app.include_router(chat.router)# Chat routes
-app.include_router(chatws.router)# WebSocket chat routes
 
-@app.get("/")
-async def home():
-    return RedirectResponse("/chat/rooms", status_code=302)
\ No newline at end of file
+app = create_app()# Application instance served by uvicorn (app.main:app)
@@ -0,0 +1,45 @@
+from sqlalchemy import BigInteger, String, func, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.base import Base
+from app.utils.ids import uuid7
+from datetime import datetime
+import uuid
+
+
+class Attachment(Base):
+    """A file uploaded to a chat room, stored by content hash on disk."""
+
+    __tablename__ = 'attachments'# Database table name
+
+    __table_args__ = (
+        Index('ix_attachments_sha256', 'sha256'),
+        # Uploads of the same content share one blob in the store
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    # Primary key, time-ordered UUID generated in the app (app/utils/ids.py)
+
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    # Hex SHA-256 of the content, names the blob in ATTACHMENT_DIR
+
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Size of the content in bytes
+
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Original file name, used for Content-Disposition on download
+
+    content_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    # MIME type sent by the uploader
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id'))
+     # Foreign key to the user who uploaded the file
+
+    room_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('chatrooms.id'))
+     # Foreign key to the chat room the file was uploaded to
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.now())
+     # Timestamp of when the upload finished
@@ -1,7 +1,8 @@
-from sqlalchemy import String, func, TIMESTAMP
+from sqlalchemy import BigInteger, Integer, String, func, TIMESTAMP
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from app.database.base import Base
+from app.utils.ids import uuid7
 from datetime import datetime
 import uuid
 
@@ -11,8 +12,8 @@ class ChatRoom(Base):
 
     __tablename__ = 'chatrooms'  # Database table name
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    # Primary key, automatically generated UUID
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    # Primary key, time-ordered UUID generated in the app (app/utils/ids.py)
 
     name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
     # Chat room name, must be unique and cannot be null
@@ -21,6 +22,16 @@ class ChatRoom(Base):
      # Timestamp of when the chat room was created, 
      # defaults to current time on database server
 
+    message_count: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default='0')
+    # Number of messages ever posted in the room, bumped by create_message
+    # in the same transaction as the insert (used for unread counts)
+
+    retention_days: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Messages older than this many days are pruned (None = kept forever)
+
+    retention_max_messages: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Only the newest this many messages are kept (None = no limit)
+
 
     # One-to-many relationship with Message model
     # Lists all messages belonging to this chat room
@@ -0,0 +1,20 @@
+from sqlalchemy import String, func, TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database.base import Base
+from datetime import datetime
+
+
+class ClusterMember(Base):
+    """A running worker process taking part in room ownership."""
+
+    __tablename__ = 'cluster_members'# Database table name
+
+    member_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # Random id generated by the worker at startup
+
+    url: Mapped[str] = mapped_column(String(255), nullable=False)
+    # WebSocket base URL clients are redirected to (CLUSTER_ADVERTISE_URL)
+
+    heartbeat_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.now(), nullable=False)
+    # Refreshed every CLUSTER_HEARTBEAT_SECONDS; stale members drop out
@@ -0,0 +1,42 @@
+from sqlalchemy import String, func, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.base import Base
+from app.utils.ids import uuid7
+from datetime import datetime
+import uuid
+
+
+class DirectMessage(Base):
+    """A message sent from one user to another, outside any room."""
+
+    __tablename__ = 'direct_messages'# Database table name
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    # Primary key, time-ordered UUID generated in the app (app/utils/ids.py)
+
+    sender_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+     # Foreign key to the user who sent the message
+
+    recipient_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+     # Foreign key to the user the message was sent to
+
+    content: Mapped[str] = mapped_column(String, nullable=False)
+    # Content/text of the message
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.now(), nullable=False)
+     # Timestamp of when the message was sent
+
+
+Index(
+    'ix_direct_messages_pair_created_at',
+    func.least(DirectMessage.sender_id, DirectMessage.recipient_id),
+    func.greatest(DirectMessage.sender_id, DirectMessage.recipient_id),
+    DirectMessage.created_at,
+    DirectMessage.id,
+)
+# A conversation is read by its (unordered) pair of users, newest first,
+# whichever of them sent each message
@@ -0,0 +1,46 @@
+from sqlalchemy import Integer, String, func, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.base import Base
+from datetime import datetime
+import uuid
+
+
+class InboxEntry(Base):
+    """One conversation in a user's direct message inbox.
+
+    Both users of a conversation have their own entry, updated with every
+    message, so loading an inbox reads a page of these rows instead of
+    grouping ``direct_messages``.
+    """
+
+    __tablename__ = 'inbox_entries'# Database table name
+
+    __table_args__ = (
+        Index('ix_inbox_entries_user_id_last_message_at', 'user_id', 'last_message_at', 'peer_id'),
+        # Inbox pages: a user's conversations by latest activity
+    )
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # User whose inbox this is
+
+    peer_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # The other user of the conversation
+
+    last_message_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    # Latest direct message between the two
+
+    last_sender_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    # Who sent it (the user or the peer)
+
+    preview: Mapped[str] = mapped_column(String(200), nullable=False)
+    # Start of its text, shown in the inbox
+
+    last_message_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.now(), nullable=False)
+    # When it was sent; inbox order
+
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, server_default='0')
+    # Messages from the peer the user hasn't read yet
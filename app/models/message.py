@@ -1,7 +1,8 @@
-from sqlalchemy import String, func, TIMESTAMP, ForeignKey
+from sqlalchemy import BigInteger, String, func, text, TIMESTAMP, ForeignKey, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from app.database.base import Base
+from app.utils.ids import uuid7
 from datetime import datetime
 import uuid
 
@@ -11,8 +12,18 @@ class Message(Base):
 
     __tablename__ = 'messages'# Database table name
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    # Primary key, automatically generated UUID
+    __table_args__ = (
+        Index('ix_messages_room_id_created_at', 'room_id', 'created_at'),
+        # Room history is always read by room in creation order
+        Index('ux_messages_room_id_seq', 'room_id', 'seq', unique=True),
+        # Reconnecting clients fetch what they missed by sequence number
+        Index('ux_messages_attachment_id', 'attachment_id', unique=True,
+              postgresql_where=text('attachment_id IS NOT NULL')),
+        # An uploaded file is posted once, by the message that claims it
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    # Primary key, time-ordered UUID generated in the app (app/utils/ids.py)
 
     content: Mapped[str] = mapped_column(String)
     # Content/text of the message
@@ -29,5 +40,13 @@ class Message(Base):
         UUID(as_uuid=True), ForeignKey('chatrooms.id'))
      # Foreign key to the chat room where this message was sent
 
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Position in the room (1, 2, 3, ...): the room's message_count
+    # right after this message was counted
+
+    attachment_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('attachments.id'), nullable=True)
+     # File shared with this message, if any (content may then be empty)
+
     user: Mapped["User"] = relationship(back_populates="messages") # pyright: ignore[reportUndefinedVariable]
     room: Mapped["ChatRoom"] = relationship(back_populates="messages") # pyright: ignore[reportUndefinedVariable]
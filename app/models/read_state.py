@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, func, TIMESTAMP, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.base import Base
+from datetime import datetime
+import uuid
+
+
+class RoomReadState(Base):
+    """How far a user has read in a chat room (their read watermark)."""
+
+    __tablename__ = 'room_read_states'# Database table name
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # User the watermark belongs to
+
+    room_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('chatrooms.id', ondelete='CASCADE'), primary_key=True)
+    # Chat room the watermark is for
+
+    read_count: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default='0')
+    # Room's message_count when the user last read it;
+    # unread = chatrooms.message_count - read_count
+
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # Timestamp of the last watermark update
@@ -2,6 +2,7 @@ from sqlalchemy import String, func, TIMESTAMP
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from app.database.base import Base
+from app.utils.ids import uuid7
 from datetime import datetime
 import uuid
 
@@ -11,8 +12,8 @@ class User(Base):
     __tablename__ = 'users'# Database table name
 
     id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-        # Primary key, automatically generated UUID
+        UUID(as_uuid=True), primary_key=True, default=uuid7)
+        # Primary key, time-ordered UUID generated in the app (app/utils/ids.py)
 
     username: Mapped[str] = mapped_column(
         String(100), nullable=False, unique=True)
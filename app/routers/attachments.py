@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.session import get_db, recent_writers
+from app.services.attachments import get_attachment, save_attachment, store
+from app.services.chat_state import chat_state
+from app.utils.http_cache import IMMUTABLE, is_not_modified, not_modified
+from app.utils.security import login_required
+
+router = APIRouter(prefix="/chat")
+# Attachment routes, under the chat URL prefix
+
+
+@router.post("/room/{room_id}/attachments")
+async def upload_attachment(
+    request: Request,
+    room_id: str, # Chat room ID from the URL path
+    filename: str | None = None, # Original file name (query parameter)
+    db: AsyncSession = Depends(get_db), # Database session dependency
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Store the raw request body as an attachment and return its reference.
+
+    The body is the file itself (not multipart), streamed to disk as it
+    arrives; post the returned id over the room's WebSocket as
+    ``{"type": "attachment", "attachment_id": ..., "content": ...}``.
+    """
+    if await chat_state.room_state(db, room_id) is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    await db.close()
+    # Don't keep a pool connection checked out while the body streams in
+
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > settings.ATTACHMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Attachment too large")
+
+    attachment = await save_attachment(
+        db,
+        request.stream(),
+        filename,
+        request.headers.get("content-type"),
+        user_id,
+        room_id,
+    )
+    recent_writers.mark(user_id)
+    # The uploader's next reads (room history) go to the primary
+    return JSONResponse(attachment.as_json(), status_code=201)
+
+
+@router.get("/attachments/{attachment_id}")
+async def download_attachment(
+    request: Request,
+    attachment_id: str, # Attachment ID from the URL path
+    db: AsyncSession = Depends(get_db), # Primary: the file is usually fetched right after it is posted
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Serve an attachment from the store.
+
+    FileResponse handles Range requests and streams the file in 64 KiB
+    reads, or hands the path to the server (``http.response.pathsend``)
+    when it can send the file itself. The content never changes, so the
+    hash is a strong ETag and the response is cacheable forever.
+    """
+    attachment = await get_attachment(db, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    await db.close()
+
+    etag = f'"{attachment.sha256}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag, None, IMMUTABLE)
+
+    path = store.path(attachment.sha256)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    return FileResponse(
+        path,
+        media_type=attachment.content_type,
+        filename=attachment.filename,
+        headers={
+            "etag": etag,
+            "cache-control": IMMUTABLE,
+            "x-content-type-options": "nosniff",
+        },
+    )
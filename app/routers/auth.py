@@ -1,17 +1,14 @@
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.session import get_db
 from app.services.auth_service import create_user, authenticate_user
+from app.utils.templating import templates
 
 router = APIRouter(prefix="/auth")
 # Authentication router with URL prefix
 
-templates = Jinja2Templates(directory="app/templates")
-# Jinja2 templates for rendering HTML pages
-
 
 @router.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
@@ -1,33 +1,75 @@
+from datetime import datetime
+import uuid
+
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import RedirectResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.session import get_db
+from app.config import settings
+from app.database.session import get_db, get_read_db, is_replica, recent_writers
 from app.utils.security import login_required
+from app.utils.templating import templates
+from app.utils.http_cache import (
+    REVALIDATE,
+    cache_headers,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
+from app.services.chat_state import chat_state
+from app.services.read_state import read_watermarks
 from app.services.chat_service import (
-    get_all_rooms,
+    get_rooms_with_unread,
     get_room,
     create_room_service,
     get_messages_for_room,
+    get_message_page,
 )
 
 router = APIRouter(prefix="/chat")
 # Chat router with URL prefix
 
-templates = Jinja2Templates(directory="app/templates")
-# Jinja2 templates for rendering HTML pages
+
+# Validators. A page rendered from a replica gets them from the replica's
+# own state, loaded before the page's queries: the replica only moves
+# forward, so the page is at least as new as the validator says, never
+# older (the in-memory state comes from the primary and may be ahead).
+
+def _rooms_etag(directory, user_id: str, username: str) -> str:
+    return make_etag(
+        "rooms", directory.count, directory.last_created_at, directory.message_total,
+        read_watermarks.version(user_id), user_id, username,
+    )
+
+
+def _room_etag(room_id: str, state, user_id: str, username: str) -> str:
+    return make_etag("room", room_id, state.count, state.last_message_id, state.first_seq, user_id, username)
 
 
 @router.get("/rooms")
 async def list_rooms(
     request: Request,
-    db: AsyncSession = Depends(get_db), # Database session dependency
+    db: AsyncSession = Depends(get_read_db), # Read-only session (replica when configured)
     user_id: str = Depends(login_required), # Ensure user is logged in
 ):
     """Display a list of all available chat rooms."""
-    rooms = await get_all_rooms(db)
-    # Retrieve all chat rooms from the database
+    username = request.session.get("username", "User")
+    # Get username from session or default to "User"
+
+    directory = await chat_state.directory_state(db)
+    etag = _rooms_etag(directory, user_id, username)
+    # New messages anywhere and the user's own reads change the unread counts,
+    # so there is no Last-Modified: only the ETag tracks them
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+        # Nothing changed since the client's copy: skip the query and rendering
+
+    if is_replica(db):
+        directory = await chat_state.load_directory_state(db)
+        etag = _rooms_etag(directory, user_id, username)
+
+    rooms = await get_rooms_with_unread(db, user_id)
+    # Retrieve all chat rooms with the user's unread counts
 
     return templates.TemplateResponse(
         # Render the rooms page with the list of rooms and current username
@@ -35,9 +77,9 @@ async def list_rooms(
         {
             "request": request,
             "rooms": rooms,
-            "username": request.session.get("username", "User") 
-            # Get username from session or default to "User"
+            "username": username,
         },
+        headers=cache_headers(etag),
     )
 
 
@@ -45,21 +87,40 @@ async def list_rooms(
 async def open_room(
     request: Request, # Request object
     room_id: str, # Chat room ID from the URL path
-    db: AsyncSession = Depends(get_db), # Database session dependency
+    db: AsyncSession = Depends(get_read_db), # Read-only session (replica when configured)
     user_id: str = Depends(login_required), # Ensure user is logged in
 ):
     """Open a specific chat room and display its messages."""
+    username = request.session.get("username", "User")
+    # Get username from session or default to "User"
+
+    state = await chat_state.room_state(db, room_id)
+    # In-memory validator (message count + latest message) for the room
+    if state is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    read_watermarks.mark(user_id, room_id, state.count)
+    # Opening the room shows every message: mark it read
+
+    etag = _room_etag(room_id, state, user_id, username)
+    if is_not_modified(request, etag, state.last_modified):
+        return not_modified(etag, state.last_modified)
+        # Nothing changed since the client's copy: skip the queries and rendering
+
+    if is_replica(db):
+        state = await chat_state.load_room_state(db, room_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Room not found")
+        etag = _room_etag(room_id, state, user_id, username)
+
     # Retrieve the chat room by ID
     room = await get_room(db, room_id)
     if room is None:
         raise HTTPException(status_code=404, detail="Room not found")
 
-
-    
     messages = await get_messages_for_room(db, room_id)
     # Retrieve messages for the chat room
 
-   
     return templates.TemplateResponse( 
         # Render the chat room page with room details and messages
         "chatroom.html",
@@ -67,9 +128,83 @@ async def open_room(
             "request": request, # Request object
             "room": room, # Chat room details
             "messages": messages,  # List of messages in the room
-            "username": request.session.get("username", "User") 
-            # Get username from session or default to "User"
+            "username": username,
         },
+        headers=cache_headers(etag, state.last_modified),
+    )
+
+
+def _page_validators(room_id: str, state, before: str | None, limit: int):
+    # (ETag, Last-Modified) of a history page
+    if before is None:
+        etag = make_etag("page", room_id, state.count, state.last_message_id, state.first_seq, limit)
+        return etag, state.last_modified
+    return make_etag("page", room_id, before, limit, state.first_seq), None
+
+
+def _encode_cursor(message) -> str:
+    return f"{message.created_at.isoformat()}_{message.id}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, message_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/room/{room_id}/messages")
+async def room_messages(
+    request: Request,
+    room_id: str, # Chat room ID from the URL path
+    before: str | None = None, # Cursor from a previous page's next_before
+    limit: int = settings.HISTORY_PAGE_SIZE, # Page size
+    db: AsyncSession = Depends(get_read_db), # Read-only session (replica when configured)
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Return a page of room history as JSON, newest page first.
+
+    Every page is revalidated against the room's in-memory validator. Older
+    pages (requested with a cursor) only change when retention deletes
+    messages, so their ETag only depends on the oldest stored message.
+    """
+    limit = max(1, min(limit, 200))
+
+    state = await chat_state.room_state(db, room_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    etag, last_modified = _page_validators(room_id, state, before, limit)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, REVALIDATE)
+
+    if is_replica(db):
+        state = await chat_state.load_room_state(db, room_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Room not found")
+        etag, last_modified = _page_validators(room_id, state, before, limit)
+
+    cursor = _decode_cursor(before) if before else None
+    messages = await get_message_page(db, room_id, cursor, limit)
+
+    return JSONResponse(
+        {
+            "messages": [
+                {
+                    "id": str(message.id),
+                    "user_id": str(message.user_id),
+                    "username": message.username,
+                    "content": message.content,
+                    "created_at": message.created_at.isoformat() if message.created_at else None,
+                    "seq": message.seq,
+                    "attachment": message.attachment.as_json() if message.attachment else None,
+                }
+                for message in messages
+            ],
+            "next_before": _encode_cursor(messages[0]) if len(messages) == limit else None,
+        },
+        headers=cache_headers(etag, last_modified, REVALIDATE),
     )
 
 
@@ -77,16 +212,18 @@ async def open_room(
 async def create_room(
     request: Request, # Request object
     name: str = Form(...), # Chat room name from form data
+    retention_days: int | None = Form(None), # Optional: prune messages older than this
+    retention_max_messages: int | None = Form(None), # Optional: keep only this many messages
     db: AsyncSession = Depends(get_db), # Database session dependency
     user_id: str = Depends(login_required), # Ensure user is logged in
 ):
     """Create a new chat room."""
     try:
         # Create the chat room using the service function
-        await create_room_service(db, name)
+        await create_room_service(db, name, retention_days, retention_max_messages)
     except HTTPException as e:
         # If room creation fails, re-render the rooms page with an error message
-        rooms = await get_all_rooms(db)
+        rooms = await get_rooms_with_unread(db, user_id)
         return templates.TemplateResponse(
             "rooms.html",
             {
@@ -97,5 +234,8 @@ async def create_room(
             },
         )
 
+    recent_writers.mark(user_id)
+    # Read the room list back from the primary so the new room shows up
+
     return RedirectResponse(url="/chat/rooms", status_code=302)
     # Redirect to the rooms list after successful creation
\ No newline at end of file
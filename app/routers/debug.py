@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from app.database.profiler import recent_profiles
+
+router = APIRouter(prefix="/debug")
+# Debug router, only mounted when SQL_PROFILING is enabled
+
+
+@router.get("/sql")
+async def sql_profiles(limit: int = 50, path: str | None = None):
+    """Return the most recent per-request SQL profiles, newest first."""
+    profiles = [
+        profile for profile in reversed(recent_profiles)
+        if path is None or profile.path == path
+    ]
+    return {"profiles": [profile.to_dict() for profile in profiles[:limit]]}
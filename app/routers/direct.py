@@ -0,0 +1,129 @@
+from datetime import datetime
+from math import ceil
+from time import monotonic
+import uuid
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.session import get_db, get_read_db, recent_writers
+from app.services.direct_messages import (
+    get_conversation,
+    get_inbox,
+    mark_conversation_read,
+    send_direct_message,
+)
+from app.utils.security import login_required
+from app.websocket.rate_limit import message_limits
+
+router = APIRouter(prefix="/dm")
+# Direct message routes (JSON API)
+
+
+def _encode_cursor(created_at: datetime, key: uuid.UUID) -> str:
+    return f"{created_at.isoformat()}_{key}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, key = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(key)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/inbox")
+async def inbox(
+    before: str | None = None, # Cursor from a previous page's next_before
+    limit: int = settings.HISTORY_PAGE_SIZE, # Page size
+    db: AsyncSession = Depends(get_read_db), # Read-only session (replica when configured)
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Return a page of the user's conversations, most recently active first."""
+    limit = max(1, min(limit, 200))
+    cursor = _decode_cursor(before) if before else None
+    conversations = await get_inbox(db, user_id, cursor, limit)
+
+    return JSONResponse({
+        "conversations": [
+            {
+                "peer_id": str(conversation.peer_id),
+                "peer_username": conversation.peer_username,
+                "last_message_id": str(conversation.last_message_id),
+                "last_sender_id": str(conversation.last_sender_id),
+                "preview": conversation.preview,
+                "last_message_at": conversation.last_message_at.isoformat(),
+                "unread": conversation.unread,
+            }
+            for conversation in conversations
+        ],
+        "next_before": _encode_cursor(conversations[-1].last_message_at, conversations[-1].peer_id)
+        if len(conversations) == limit else None,
+    })
+
+
+@router.get("/{peer_id}/messages")
+async def conversation_messages(
+    peer_id: str, # The other user of the conversation
+    before: str | None = None, # Cursor from a previous page's next_before
+    limit: int = settings.HISTORY_PAGE_SIZE, # Page size
+    db: AsyncSession = Depends(get_read_db), # Read-only session (replica when configured)
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Return a page of the conversation with ``peer_id`` as JSON, newest page first."""
+    limit = max(1, min(limit, 200))
+    cursor = _decode_cursor(before) if before else None
+    messages = await get_conversation(db, user_id, peer_id, cursor, limit)
+
+    return JSONResponse({
+        "messages": [
+            {
+                "id": str(message.id),
+                "sender_id": str(message.sender_id),
+                "recipient_id": str(message.recipient_id),
+                "content": message.content,
+                "created_at": message.created_at.isoformat(),
+            }
+            for message in messages
+        ],
+        "next_before": _encode_cursor(messages[0].created_at, messages[0].id)
+        if len(messages) == limit else None,
+    })
+
+
+@router.post("/{peer_id}")
+async def send(
+    peer_id: str, # Recipient's user ID
+    content: str = Form(...), # Message text from form data
+    db: AsyncSession = Depends(get_db), # Database session dependency
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Send a direct message; it is delivered to every open socket of both users."""
+    wait = message_limits.user.wait_time(user_id, monotonic())
+    # Same per-user budget as chat messages
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many messages",
+            headers={"Retry-After": str(ceil(wait))},
+        )
+    message_limits.user.take(user_id)
+
+    _, frame = await send_direct_message(db, user_id, peer_id, content)
+    recent_writers.mark(user_id)
+    # The sender's next inbox read goes to the primary
+    return JSONResponse(frame, status_code=201)
+
+
+@router.post("/{peer_id}/read")
+async def mark_read(
+    peer_id: str, # The other user of the conversation
+    db: AsyncSession = Depends(get_db), # Database session dependency
+    user_id: str = Depends(login_required), # Ensure user is logged in
+):
+    """Mark the conversation with ``peer_id`` as read."""
+    await mark_conversation_read(db, user_id, peer_id)
+    recent_writers.mark(user_id)
+    return Response(status_code=204)
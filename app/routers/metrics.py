@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+router = APIRouter()
+# Metrics router (no prefix, Prometheus scrapes /metrics by default)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose all process metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        registry.expose(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,40 @@
+"""Production entrypoint: uvicorn with a graceful WebSocket drain.
+
+On SIGTERM plain uvicorn closes every WebSocket with 1012 at once and only
+then runs the lifespan shutdown, so every client of the worker reconnects
+at the same moment. ``DrainingServer`` drains the connection manager first:
+new handshakes are turned away, in-flight message writes finish, and each
+client is told to reconnect after its own random delay.
+
+Run with ``python -m app.server`` (HOST / PORT from the environment).
+"""
+import os
+
+import uvicorn
+
+from app.config import settings
+from app.websocket.manager import manager
+
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets=None) -> None:
+        await manager.drain(
+            settings.DRAIN_RECONNECT_MIN_MS,
+            settings.DRAIN_RECONNECT_WINDOW_MS,
+            settings.DRAIN_TIMEOUT_SECONDS,
+        )
+        await super().shutdown(sockets=sockets)
+
+
+def main() -> None:
+    config = uvicorn.Config(
+        "app.main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        proxy_headers=True,
+    )
+    DrainingServer(config).run()
+
+
+if __name__ == "__main__":
+    main()
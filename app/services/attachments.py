@@ -0,0 +1,145 @@
+"""File attachments in a local content-addressed store.
+
+Uploads are streamed: the request body is hashed and written to a temp
+file in ATTACHMENT_WRITE_CHUNK pieces (hashing and writing run in a worker
+thread, so the event loop never waits on disk or SHA-256), then renamed
+to ``<ATTACHMENT_DIR>/<sha[:2]>/<sha[2:4]>/<sha>``. Content that is
+already stored is not written twice; each upload still gets its own
+``attachments`` row with its name and type. Messages reference the row by
+id, so broadcast frames carry a few metadata fields, never file data.
+"""
+from typing import AsyncIterator, NamedTuple, Optional
+from pathlib import Path
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.attachment import Attachment
+from app.utils.metrics import ATTACHMENT_UPLOAD_BYTES, ATTACHMENT_UPLOADS
+
+ATTACHMENT_WRITE_CHUNK = 1024 * 1024
+# Body chunks are gathered up to this size before each hash + write
+
+
+class AttachmentRef(NamedTuple):
+    # What messages (history rows and broadcast frames) carry
+    id: uuid.UUID
+    filename: str
+    size: int
+    content_type: str
+
+    def as_json(self) -> dict:
+        return {
+            "id": str(self.id),
+            "filename": self.filename,
+            "size": self.size,
+            "content_type": self.content_type,
+            "url": f"/chat/attachments/{self.id}",
+        }
+
+
+class AttachmentStore:
+    """Blobs on local disk, named by the SHA-256 of their content."""
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    @staticmethod
+    def _write(file, hasher, data: bytearray) -> None:
+        # Runs in a thread; hashlib releases the GIL for large buffers
+        hasher.update(data)
+        file.write(data)
+
+    async def save(self, chunks: AsyncIterator[bytes], max_bytes: int) -> tuple[str, int, bool]:
+        """Stream ``chunks`` into the store, return (sha256, size, deduplicated)."""
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pending = bytearray()
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail="Attachment too large")
+                    pending += chunk
+                    if len(pending) >= ATTACHMENT_WRITE_CHUNK:
+                        data, pending = pending, bytearray()
+                        await asyncio.to_thread(self._write, file, hasher, data)
+                if pending:
+                    await asyncio.to_thread(self._write, file, hasher, pending)
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Attachment is empty")
+
+            sha256 = hasher.hexdigest()
+            final = self.path(sha256)
+            if final.exists():
+                os.unlink(tmp_name)
+                return sha256, size, True
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, final)
+            return sha256, size, False
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+
+store = AttachmentStore(settings.ATTACHMENT_DIR)
+
+
+def clean_filename(filename: str | None) -> str:
+    # Keep the last path component only, never an empty name
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name[:255] or "file"
+
+
+async def save_attachment(
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        filename: str | None,
+        content_type: str | None,
+        user_id: str,
+        room_id: str) -> AttachmentRef:
+    # Store the upload and record it; the caller's session should not hold
+    # a connection while the body streams in (it is only used at the end)
+    sha256, size, deduplicated = await store.save(chunks, settings.ATTACHMENT_MAX_BYTES)
+    ATTACHMENT_UPLOADS.labels("deduplicated" if deduplicated else "stored").inc()
+    ATTACHMENT_UPLOAD_BYTES.inc(size)
+
+    content_type = (content_type or "application/octet-stream").split(";")[0].strip()[:100]
+    row = (await db.execute(
+        insert(Attachment)
+        .values(
+            sha256=sha256,
+            size=size,
+            filename=clean_filename(filename),
+            content_type=content_type or "application/octet-stream",
+            user_id=uuid.UUID(user_id),
+            room_id=uuid.UUID(room_id),
+        )
+        .returning(Attachment.id, Attachment.filename, Attachment.size, Attachment.content_type)
+    )).one()
+    await db.commit()
+    return AttachmentRef(*row)
+
+
+async def get_attachment(db: AsyncSession, attachment_id: str) -> Optional[Attachment]:
+    # Attachment row by id, None for unknown or malformed ids
+    try:
+        key = uuid.UUID(attachment_id)
+    except ValueError:
+        return None
+    return (await db.execute(select(Attachment).where(Attachment.id == key))).scalars().first()
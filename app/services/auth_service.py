@@ -4,6 +4,7 @@ from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 
 from app.models.user import User
+from app.services.user_cache import UserIdentity, publish_invalidation, user_cache
 from app.utils.security import hash_password, verify_password
 
 
@@ -70,8 +71,12 @@ async def create_user(
 
     try:
         db.add(user) # Add the new user to the session
+        await publish_invalidation(db, username=username)
+        # Drop any cached identity for this username, on every worker
         await db.commit() # Commit the transaction to save the user
         await db.refresh(user) # Refresh the instance to get updated data from the DB
+        user_cache.put(UserIdentity(str(user.id), user.username))
+        # Warm the identity cache, the new user usually logs in next
         return user
     except IntegrityError:
         await db.rollback()
@@ -121,6 +126,7 @@ async def authenticate_user(
         # Get the first matching user
 
         if user and verify_password(password, user.password):
+            user_cache.put(UserIdentity(str(user.id), user.username))
             return user
             # Password matches, return the user
 
@@ -1,13 +1,34 @@
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy import and_, select, insert, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+from app.database.session import recent_writers
+from app.models.attachment import Attachment
 from app.models.chatroom import ChatRoom
 from app.models.message import Message
+from app.models.read_state import RoomReadState
+from app.services.attachments import AttachmentRef
+from app.services.chat_state import chat_state
+from app.services.content_filter import content_filter
+from app.services.read_state import read_watermarks
+from app.services.user_cache import get_usernames
 import uuid
 
 
+class HistoryMessage(NamedTuple):
+    # Lightweight row rendered by chatroom.html
+    id: uuid.UUID
+    content: str
+    created_at: datetime
+    user_id: uuid.UUID
+    username: str
+    seq: int
+    attachment: Optional[AttachmentRef] = None
+
+
 async def get_all_rooms(db: AsyncSession) -> List[ChatRoom]:
     # Retrieve all chat rooms
     stmt = select(ChatRoom).order_by(ChatRoom.created_at)
@@ -15,6 +36,42 @@ async def get_all_rooms(db: AsyncSession) -> List[ChatRoom]:
     return result.scalars().all()
 
 
+class RoomSummary(NamedTuple):
+    # Row rendered by rooms.html
+    id: uuid.UUID
+    name: str
+    created_at: datetime
+    unread: int
+
+
+async def get_rooms_with_unread(db: AsyncSession, user_id: str) -> List[RoomSummary]:
+    # All chat rooms with the user's unread count, one row per room:
+    # room counter minus the user's read watermark, no COUNT over messages
+    stmt = (
+        select(
+            ChatRoom.id,
+            ChatRoom.name,
+            ChatRoom.created_at,
+            ChatRoom.message_count,
+            RoomReadState.read_count,
+        )
+        .outerjoin(RoomReadState, and_(
+            RoomReadState.room_id == ChatRoom.id,
+            RoomReadState.user_id == uuid.UUID(user_id),
+        ))
+        .order_by(ChatRoom.created_at)
+    )
+    result = await db.execute(stmt)
+    unflushed = read_watermarks.overlay(user_id)
+    # Watermarks recorded in memory but not written yet
+
+    rooms = []
+    for row in result:
+        read_count = max(row.read_count or 0, unflushed.get(str(row.id), 0))
+        rooms.append(RoomSummary(row.id, row.name, row.created_at, max(0, row.message_count - read_count)))
+    return rooms
+
+
 async def get_room(db: AsyncSession, room_id: str) -> ChatRoom | None:
     # Get specific chat room
     try:
@@ -25,8 +82,15 @@ async def get_room(db: AsyncSession, room_id: str) -> ChatRoom | None:
         return None
 
 
-async def create_room_service(db: AsyncSession, name: str) -> ChatRoom:
-    # Create a new chat room
+async def create_room_service(
+        db: AsyncSession, name: str,
+        retention_days: int | None = None, retention_max_messages: int | None = None) -> ChatRoom:
+    # Create a new chat room, optionally with a retention policy
+    # (app/services/retention.py); None keeps messages forever
+    if any(limit is not None and limit < 1 for limit in (retention_days, retention_max_messages)):
+        raise HTTPException(
+            status_code=400, detail="Retention limits must be at least 1")
+
     stmt = select(ChatRoom).where(ChatRoom.name == name)
     result = await db.execute(stmt)
     existing = result.scalars().first()
@@ -36,43 +100,180 @@ async def create_room_service(db: AsyncSession, name: str) -> ChatRoom:
             status_code=400, detail="Room name already exists")
     # Create and persist the new chat room
 
-    room = ChatRoom(name=name)
+    room = ChatRoom(name=name, retention_days=retention_days, retention_max_messages=retention_max_messages)
     db.add(room)
     await db.commit()
     await db.refresh(room)
+    chat_state.room_created(room)
+    # Keep the room list validator current
     return room
 
 
-async def get_messages_for_room(db: AsyncSession, room_id: str) -> List[Message]:
+_ATTACHMENT_COLUMNS = (
+    Message.attachment_id,
+    Attachment.filename.label("attachment_filename"),
+    Attachment.size.label("attachment_size"),
+    Attachment.content_type.label("attachment_content_type"),
+)
+# History rows carry the attachment's metadata, never its content
+
+
+async def get_messages_for_room(db: AsyncSession, room_id: str) -> List[HistoryMessage]:
     # Retrieve messages for a specific chat room
     try:
-        # Build the query to get messages with user details
+        # Column-only select returning lightweight rows instead of
+        # hydrating Message objects; authors are resolved through the
+        # user identity cache rather than a join per message.
         stmt = (
-            select(Message)
-            .options(selectinload(Message.user))
+            select(
+                Message.id,
+                Message.content,
+                Message.created_at,
+                Message.user_id,
+                Message.seq,
+                *_ATTACHMENT_COLUMNS,
+            )
+            .outerjoin(Attachment, Attachment.id == Message.attachment_id)
             .where(Message.room_id == uuid.UUID(room_id))
             .order_by(Message.created_at)
         )
         result = await db.execute(stmt)
-        return result.scalars().all()
+        rows = result.all()
+    except ValueError:
+        return []
+
+    return await _with_usernames(db, rows)
+
+
+async def get_message_page(
+        db: AsyncSession,
+        room_id: str,
+        before: Optional[Tuple[datetime, uuid.UUID]] = None,
+        limit: int = 50) -> List[HistoryMessage]:
+    # Retrieve one page of history older than the (created_at, id) cursor,
+    # returned oldest first
+    try:
+        stmt = (
+            select(
+                Message.id,
+                Message.content,
+                Message.created_at,
+                Message.user_id,
+                Message.seq,
+                *_ATTACHMENT_COLUMNS,
+            )
+            .outerjoin(Attachment, Attachment.id == Message.attachment_id)
+            .where(Message.room_id == uuid.UUID(room_id))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit)
+        )
     except ValueError:
         return []
+    if before is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < tuple_(*before))
+
+    result = await db.execute(stmt)
+    rows = result.all()
+    rows.reverse()
+    return await _with_usernames(db, rows)
+
+
+async def get_messages_after(
+        db: AsyncSession,
+        room_id: str,
+        after_seq: int,
+        limit: int) -> Tuple[List[HistoryMessage], bool]:
+    # Messages with seq > after_seq, oldest first, as one range scan of
+    # (room_id, seq). At most the newest ``limit``; the flag tells whether
+    # older ones were left out.
+    stmt = (
+        select(
+            Message.id,
+            Message.content,
+            Message.created_at,
+            Message.user_id,
+            Message.seq,
+            *_ATTACHMENT_COLUMNS,
+        )
+        .outerjoin(Attachment, Attachment.id == Message.attachment_id)
+        .where(Message.room_id == uuid.UUID(room_id), Message.seq > after_seq)
+        .order_by(Message.seq.desc())
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return await _with_usernames(db, rows), truncated
+
 
+async def _with_usernames(db: AsyncSession, rows) -> List[HistoryMessage]:
+    # Attach author names from the user identity cache
+    usernames = await get_usernames(db, {row.user_id for row in rows})
+    return [
+        HistoryMessage(row.id, row.content, row.created_at, row.user_id,
+                       usernames.get(str(row.user_id), "Unknown"),
+                       row.seq,
+                       AttachmentRef(row.attachment_id, row.attachment_filename,
+                                     row.attachment_size, row.attachment_content_type)
+                       if row.attachment_id else None)
+        for row in rows
+    ]
 
-async def create_message(db: AsyncSession, room_id: str, user_id: str, content: str) -> Message:
-    # Create a new message in a chat room
-    if not content or len(content.strip()) == 0:
+
+async def create_message(
+        db: AsyncSession,
+        room_id: str,
+        user_id: str,
+        content: str,
+        attachment: Optional[AttachmentRef] = None) -> Row:
+    # Create a new message in a chat room (the text may be empty when a
+    # file is attached)
+    if attachment is None and (not content or len(content.strip()) == 0):
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
     if len(content) > 1000:
         raise HTTPException(status_code=400, detail="Message too long")
+    content = content_filter.apply((content or "").strip())
+    # Blocked terms are masked (or the message refused) before any DB work
 
-    message = Message(
-        content=content.strip(),
-        user_id=uuid.UUID(user_id),
-        room_id=uuid.UUID(room_id),
+    # Bump the room's message counter in the same transaction; the new
+    # value is the message's seq, the author's read watermark and the
+    # room's unread baseline (the row lock orders concurrent writers)
+    count = await db.scalar(
+        update(ChatRoom)
+        .where(ChatRoom.id == uuid.UUID(room_id))
+        .values(message_count=ChatRoom.message_count + 1)
+        .returning(ChatRoom.message_count)
     )
-    db.add(message)
+
+    # INSERT ... RETURNING gives back the server-side created_at in the same
+    # round trip, so no ORM object or follow-up refresh SELECT is needed.
+    stmt = (
+        insert(Message)
+        .values(
+            content=content,
+            user_id=uuid.UUID(user_id),
+            room_id=uuid.UUID(room_id),
+            attachment_id=attachment.id if attachment else None,
+            seq=count,
+        )
+        .returning(Message.id, Message.content, Message.created_at, Message.seq)
+    )
+    try:
+        result = await db.execute(stmt)
+    except IntegrityError as e:
+        # ux_messages_attachment_id: each upload is posted by one message
+        await db.rollback()
+        if attachment is not None and "ux_messages_attachment_id" in str(e.orig):
+            raise HTTPException(status_code=409, detail="Attachment already posted")
+        raise
+    message = result.one()
     await db.commit()
-    await db.refresh(message)
+    chat_state.message_created(room_id, message.id, message.created_at, count)
+    # Keep the room history validator current
+    recent_writers.mark(user_id)
+    # The author's next history reads go to the primary (read-your-writes)
+    read_watermarks.mark(user_id, room_id, count)
+    # The author has read everything up to their own message
     return message
\ No newline at end of file
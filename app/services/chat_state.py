@@ -0,0 +1,168 @@
+from datetime import datetime
+from time import monotonic
+from typing import Dict, Optional
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal, is_replica
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+
+
+class DirectoryState:
+    """Validator for the room list: how many rooms, the newest one and the
+    total number of messages (the page shows unread counts)."""
+
+    __slots__ = ("count", "last_created_at", "message_total", "loaded_at")
+
+    def __init__(self, count: int, last_created_at: Optional[datetime], message_total: int) -> None:
+        self.count = count
+        self.last_created_at = last_created_at
+        self.message_total = message_total
+        self.loaded_at = monotonic()
+
+
+class RoomState:
+    """Validator for one room's history: message count, newest message and
+    oldest message still stored (retention deletes from the old end)."""
+
+    __slots__ = ("count", "last_message_id", "last_modified", "first_seq", "loaded_at")
+
+    def __init__(self, count: int, last_message_id, last_modified: Optional[datetime],
+                 first_seq: Optional[int] = None) -> None:
+        self.count = count
+        self.last_message_id = last_message_id
+        self.last_modified = last_modified
+        self.first_seq = first_seq
+        self.loaded_at = monotonic()
+
+
+class ChatState:
+    """In-memory validators for the chat pages.
+
+    Loaded lazily from the database on first use and then kept up to date
+    by the write paths (create_room_service / create_message), so
+    conditional GETs can be answered without touching the database.
+    With several workers, writes made elsewhere are only picked up after
+    HTTP_VALIDATOR_TTL_SECONDS. 0 keeps the state until restart, which is
+    only correct when a single process serves every write.
+
+    The cached state is always loaded from the primary, even when the
+    request reads from a replica: a lagging replica must not make an old
+    state look current. Pages rendered from a replica take their
+    validators from ``load_*_state`` on the same session instead.
+    """
+
+    def __init__(self) -> None:
+        self.directory: Optional[DirectoryState] = None
+        self.rooms: Dict[str, RoomState] = {}
+
+    def _expired(self, state) -> bool:
+        ttl = settings.HTTP_VALIDATOR_TTL_SECONDS
+        return ttl > 0 and monotonic() - state.loaded_at > ttl
+
+    async def load_directory_state(self, db: AsyncSession) -> DirectoryState:
+        """Room list validator as seen by ``db``, never cached."""
+        result = await db.execute(select(
+            func.count(),
+            func.max(ChatRoom.created_at),
+            func.coalesce(func.sum(ChatRoom.message_count), 0),
+        ))
+        count, last_created_at, message_total = result.one()
+        return DirectoryState(count, last_created_at, int(message_total))
+
+    async def directory_state(self, db: AsyncSession) -> DirectoryState:
+        if self.directory is None or self._expired(self.directory):
+            if is_replica(db):
+                async with AsyncSessionLocal() as primary:
+                    self.directory = await self.load_directory_state(primary)
+            else:
+                self.directory = await self.load_directory_state(db)
+        return self.directory
+
+    async def load_room_state(self, db: AsyncSession, room_id: str) -> Optional[RoomState]:
+        """Room validator as seen by ``db``, never cached (None if no such room)."""
+        try:
+            key = uuid.UUID(room_id)
+        except ValueError:
+            return None
+
+        room = (await db.execute(
+            select(ChatRoom.created_at, ChatRoom.message_count)
+            .where(ChatRoom.id == key)
+        )).first()
+        if room is None:
+            return None
+
+        last = (await db.execute(
+            select(Message.id, Message.created_at)
+            .where(Message.room_id == key)
+            .order_by(Message.created_at.desc())
+            .limit(1)
+        )).first()
+
+        first_seq = await db.scalar(
+            select(func.min(Message.seq)).where(Message.room_id == key)
+        )
+        # On ux_messages_room_id_seq; moves forward when retention prunes
+
+        return RoomState(
+            room.message_count,
+            last.id if last else None,
+            last.created_at if last else room.created_at,
+            first_seq,
+        )
+
+    async def room_state(self, db: AsyncSession, room_id: str) -> Optional[RoomState]:
+        """Validator for a room, or None if the room does not exist."""
+        try:
+            key = str(uuid.UUID(room_id))
+        except ValueError:
+            return None
+
+        state = self.rooms.get(key)
+        if state is not None and not self._expired(state):
+            return state
+
+        if is_replica(db):
+            async with AsyncSessionLocal() as primary:
+                state = await self.load_room_state(primary, key)
+        else:
+            state = await self.load_room_state(db, key)
+        if state is not None:
+            self.rooms[key] = state
+        return state
+
+    def cached_room_state(self, room_id: str) -> Optional[RoomState]:
+        # In-memory only, never queries (None if not loaded)
+        return self.rooms.get(str(uuid.UUID(room_id)))
+
+    def room_created(self, room: ChatRoom) -> None:
+        if self.directory is not None:
+            self.directory.count += 1
+            if self.directory.last_created_at is None or room.created_at > self.directory.last_created_at:
+                self.directory.last_created_at = room.created_at
+
+    def message_created(self, room_id: str, message_id, created_at: datetime, count: int) -> None:
+        # count: the room's message_count after the insert
+        if self.directory is not None:
+            self.directory.message_total += 1
+        state = self.rooms.get(str(uuid.UUID(room_id)))
+        if state is not None:
+            state.count = count
+            state.last_message_id = message_id
+            if state.first_seq is None:
+                state.first_seq = count
+            if state.last_modified is None or created_at > state.last_modified:
+                state.last_modified = created_at
+
+    def forget_room(self, room_id: str) -> None:
+        # Force a reload, e.g. after messages were deleted (first_seq moves
+        # on, which changes every page validator of the room)
+        self.rooms.pop(str(uuid.UUID(room_id)), None)
+
+
+chat_state = ChatState()
@@ -0,0 +1,121 @@
+"""Room ownership across worker processes (opt-in, CLUSTER_ENABLED).
+
+Broadcasts only reach sockets of the worker that handles the message,
+so every socket of a room has to live on the same worker. Each worker
+registers itself in ``cluster_members`` with the URL clients can reach
+it on and refreshes a heartbeat; the live members form a consistent
+hash ring over room ids. A handshake for a room owned by another worker
+is answered with a redirect frame to the owner, and when membership
+changes (a worker joins, leaves or stops heartbeating) sockets of rooms
+that moved are redirected to their new owner.
+
+The page validators (``chat_state``) and resync buffers of a room are
+only kept current by the writes of the worker that owns it. When a room
+changes owner both are dropped, so the new owner reloads them instead of
+serving a state cached before it owned the room. HTTP pages can be served
+by any worker, so validators of rooms owned elsewhere must expire: the
+cluster refuses to start with HTTP_VALIDATOR_TTL_SECONDS = 0.
+"""
+from datetime import timedelta
+from typing import Dict, Optional
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.cluster_member import ClusterMember
+from app.services.chat_state import chat_state
+from app.utils.hash_ring import HashRing
+from app.utils.metrics import CLUSTER_MEMBERS
+from app.websocket.manager import manager
+from app.websocket.resync import recent_messages
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterMembership:
+    def __init__(self) -> None:
+        self.member_id = uuid.uuid4().hex
+        self.ring = HashRing()
+        self.urls: Dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+
+    def owner_url(self, room_id: str) -> Optional[str]:
+        """URL of the worker owning ``room_id``, None if it is this one.
+
+        Also None while the membership view is empty, so a worker that
+        can't reach the table keeps serving rooms itself.
+        """
+        owner = self.ring.owner(room_id)
+        if owner is None or owner == self.member_id:
+            return None
+        return self.urls.get(owner)
+
+    async def heartbeat(self) -> None:
+        """Refresh our row, reload live members and rebalance on changes."""
+        async with AsyncSessionLocal() as db:
+            stmt = pg_insert(ClusterMember).values(
+                member_id=self.member_id,
+                url=settings.CLUSTER_ADVERTISE_URL,
+            )
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[ClusterMember.member_id],
+                set_={"url": stmt.excluded.url, "heartbeat_at": func.now()},
+            ))
+            cutoff = func.now() - timedelta(seconds=settings.CLUSTER_MEMBER_TTL_SECONDS)
+            rows = (await db.execute(
+                select(ClusterMember.member_id, ClusterMember.url)
+                .where(ClusterMember.heartbeat_at > cutoff)
+            )).all()
+            await db.commit()
+
+        urls = {row.member_id: row.url for row in rows}
+        CLUSTER_MEMBERS.set(len(urls))
+        if set(urls) != self.ring.members:
+            logger.info("Cluster membership changed: %d members", len(urls))
+            ring = HashRing(urls, settings.CLUSTER_VIRTUAL_NODES)
+            self._forget_moved(self.ring, ring)
+            self.ring = ring
+            self.urls = urls
+            await manager.rehome(self.owner_url)
+        else:
+            self.urls = urls
+
+    def _forget_moved(self, old: HashRing, new: HashRing) -> None:
+        # Cached state of rooms that changed owner (gained or lost) is stale
+        for room_id in set(chat_state.rooms) | set(recent_messages.rooms):
+            if old.owner(room_id) != new.owner(room_id):
+                chat_state.rooms.pop(room_id, None)
+                recent_messages.forget(room_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CLUSTER_HEARTBEAT_SECONDS)
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception("Cluster heartbeat failed")
+
+    async def start(self) -> None:
+        if not settings.CLUSTER_ADVERTISE_URL:
+            raise RuntimeError("CLUSTER_ENABLED requires CLUSTER_ADVERTISE_URL")
+        if settings.HTTP_VALIDATOR_TTL_SECONDS <= 0:
+            raise RuntimeError("CLUSTER_ENABLED requires HTTP_VALIDATOR_TTL_SECONDS > 0")
+        await self.heartbeat()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Leave right away instead of waiting for the heartbeat to go stale
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ClusterMember).where(ClusterMember.member_id == self.member_id))
+            await db.commit()
+
+
+cluster = ClusterMembership()
@@ -0,0 +1,123 @@
+"""Blocklist filter for message text, applied before messages are stored.
+
+The blocklist is a text file (CONTENT_FILTER_FILE) with one term per line;
+blank lines and lines starting with ``#`` are ignored. Domains work as
+terms too (``spam.example`` catches links to it). The whole list is
+compiled into one ``TermMatcher`` (Aho-Corasick), so checking a message
+costs one pass over its text however long the list is.
+
+Matches are masked with ``*`` (CONTENT_FILTER_ACTION=mask) or the message
+is refused with a 400 (``reject``). The file is checked for changes every
+CONTENT_FILTER_RELOAD_SECONDS and recompiled in a worker thread; the new
+matcher replaces the old one in a single assignment, so messages are never
+checked against a half-built list. If the file goes missing or cannot be
+read the current list stays in force.
+"""
+from typing import Optional, Tuple
+import asyncio
+import logging
+import os
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.utils.metrics import CONTENT_FILTER_MATCHES, CONTENT_FILTER_RELOADS, CONTENT_FILTER_TERMS
+from app.utils.term_matcher import TermMatcher
+
+logger = logging.getLogger(__name__)
+
+
+def read_terms(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [
+            line.strip() for line in f
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+
+class ContentFilter:
+    """The compiled blocklist, reloaded in the background when the file changes."""
+
+    def __init__(self) -> None:
+        self._matcher: Optional[TermMatcher] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        # (mtime_ns, size) of the file the matcher was built from
+        self._task: asyncio.Task | None = None
+
+    @property
+    def terms(self) -> int:
+        matcher = self._matcher
+        return len(matcher) if matcher is not None else 0
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """(Re)compile the blocklist if the file changed; True when it was reloaded."""
+        path = path or settings.CONTENT_FILTER_FILE
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            terms = read_terms(path)
+        except OSError as e:
+            if self._signature is not None:
+                logger.warning("Cannot read content filter list %s, keeping the current one: %s", path, e)
+                self._signature = None
+            return False
+
+        self._matcher = TermMatcher(terms)
+        self._signature = signature
+        CONTENT_FILTER_RELOADS.inc()
+        logger.info("Content filter loaded %d terms from %s", len(self._matcher), path)
+        return True
+
+    def apply(self, text: str) -> str:
+        """Return ``text`` with blocked terms masked, or raise 400 in reject mode."""
+        matcher = self._matcher
+        if matcher is None or not text:
+            return text
+
+        if settings.CONTENT_FILTER_ACTION == "reject":
+            if matcher.search(text) is None:
+                return text
+            CONTENT_FILTER_MATCHES.labels("reject").inc()
+            raise HTTPException(status_code=400, detail="Message contains blocked content")
+
+        spans = matcher.spans(text)
+        if not spans:
+            return text
+        CONTENT_FILTER_MATCHES.labels("mask").inc()
+        parts = []
+        last = 0
+        for start, end in spans:
+            parts.append(text[last:start])
+            parts.append("*" * (end - start))
+            last = end
+        parts.append(text[last:])
+        return "".join(parts)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CONTENT_FILTER_RELOAD_SECONDS)
+            try:
+                await asyncio.to_thread(self.load)
+                # Compiling a large list takes a while, keep it off the loop
+            except Exception:
+                logger.exception("Content filter reload failed")
+
+    def start(self) -> None:
+        if not settings.CONTENT_FILTER_FILE:
+            return
+        if not self.load():
+            logger.warning("Content filter list %s not found, messages are not filtered until it appears",
+                           settings.CONTENT_FILTER_FILE)
+        if settings.CONTENT_FILTER_RELOAD_SECONDS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+content_filter = ContentFilter()
+CONTENT_FILTER_TERMS.set_function(lambda: content_filter.terms)
@@ -0,0 +1,303 @@
+"""Direct messages between two users, with a per-user inbox.
+
+A message is one ``direct_messages`` row. Sending it also upserts an
+``inbox_entries`` row for each of the two users (latest message, preview,
+unread count), so an inbox page is a range scan of
+``(user_id, last_message_at)``, however many conversations and messages
+the user has. A conversation is read through the functional index on
+``(least(sender, recipient), greatest(sender, recipient), created_at, id)``.
+
+Delivery is user-targeted: the frame goes to every open socket of the
+recipient, and to the sender's sockets so their other tabs stay in step,
+through ``ConnectionManager.user_connections``. With CLUSTER_ENABLED a
+user's sockets can be on any worker (rooms are spread over them), so the
+ids of the message and of both users are published with NOTIFY instead,
+sent on commit. A worker holding sockets of either user loads the message
+and delivers it to them; the others skip it without touching the
+database. Only ids go through NOTIFY: its payload is capped at 8000
+bytes, less than a full frame can take. The relay's LISTEN connection is
+re-established when it drops (app/database/listener.py); messages sent
+in between are not pushed live but are in the inbox and conversation.
+"""
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import logging
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, insert, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.listener import ChannelListener
+from app.database.session import AsyncSessionLocal
+from app.models.direct_message import DirectMessage
+from app.models.inbox import InboxEntry
+from app.services.content_filter import content_filter
+from app.services.user_cache import get_user_identity, get_usernames
+from app.utils.metrics import DIRECT_MESSAGES_SENT
+from app.websocket.manager import manager
+
+logger = logging.getLogger(__name__)
+
+DIRECT_CHANNEL = "direct_messages"
+# NOTIFY channel carrying "<message id>:<sender id>:<recipient id>" of new
+# direct messages between workers
+
+PREVIEW_LENGTH = 200
+
+
+class InboxConversation(NamedTuple):
+    # One row of an inbox page
+    peer_id: uuid.UUID
+    peer_username: str
+    last_message_id: uuid.UUID
+    last_sender_id: uuid.UUID
+    preview: str
+    last_message_at: datetime
+    unread: int
+
+
+def direct_frame(message: Row, sender_username: str) -> dict:
+    """The JSON frame a direct message is delivered as."""
+    return {
+        "type": "direct",
+        "id": str(message.id),
+        "sender_id": str(message.sender_id),
+        "sender_username": sender_username,
+        "recipient_id": str(message.recipient_id),
+        "content": message.content,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+    }
+
+
+def _pair(user_id: uuid.UUID, peer_id: uuid.UUID):
+    # Same expressions as ix_direct_messages_pair_created_at
+    low, high = sorted((user_id, peer_id))
+    # uuid.UUID orders like Postgres' uuid (byte-wise)
+    return and_(
+        func.least(DirectMessage.sender_id, DirectMessage.recipient_id) == low,
+        func.greatest(DirectMessage.sender_id, DirectMessage.recipient_id) == high,
+    )
+
+
+async def send_direct_message(
+        db: AsyncSession,
+        sender_id: str,
+        recipient_id: str,
+        content: str) -> Tuple[Row, dict]:
+    """Store a direct message, update both inboxes and deliver it.
+
+    Returns the message row and the frame it was delivered as.
+    """
+    content = (content or "").strip()
+    if not content:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    if len(content) > 1000:
+        raise HTTPException(status_code=400, detail="Message too long")
+    content = content_filter.apply(content)
+
+    recipient = await get_user_identity(db, recipient_id)
+    if recipient is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if recipient.id == str(sender_id):
+        raise HTTPException(status_code=400, detail="Cannot send a direct message to yourself")
+    sender = await get_user_identity(db, sender_id)
+    if sender is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    message = (await db.execute(
+        insert(DirectMessage)
+        .values(sender_id=uuid.UUID(sender.id), recipient_id=uuid.UUID(recipient.id), content=content)
+        .returning(
+            DirectMessage.id,
+            DirectMessage.sender_id,
+            DirectMessage.recipient_id,
+            DirectMessage.content,
+            DirectMessage.created_at,
+        )
+    )).one()
+
+    # Both sides of the conversation move to the top of their inbox; only
+    # the recipient gets an unread message
+    entry = {
+        "last_message_id": message.id,
+        "last_sender_id": message.sender_id,
+        "preview": content[:PREVIEW_LENGTH],
+        "last_message_at": message.created_at,
+    }
+    rows = sorted([
+        {"user_id": message.sender_id, "peer_id": message.recipient_id, "unread": 0, **entry},
+        {"user_id": message.recipient_id, "peer_id": message.sender_id, "unread": 1, **entry},
+    ], key=lambda row: (row["user_id"], row["peer_id"]))
+    # Rows are upserted (and locked) in VALUES order: A writing to B and B
+    # to A at the same time must lock the two rows in the same order
+    stmt = pg_insert(InboxEntry).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[InboxEntry.user_id, InboxEntry.peer_id],
+        set_={
+            "last_message_id": stmt.excluded.last_message_id,
+            "last_sender_id": stmt.excluded.last_sender_id,
+            "preview": stmt.excluded.preview,
+            "last_message_at": stmt.excluded.last_message_at,
+            "unread": InboxEntry.unread + stmt.excluded.unread,
+        },
+    ))
+
+    frame = direct_frame(message, sender.username)
+    if settings.CLUSTER_ENABLED:
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": DIRECT_CHANNEL, "payload": f"{message.id}:{message.sender_id}:{message.recipient_id}"},
+        )
+        # Delivered by every worker's relay (this one included) on commit
+    await db.commit()
+    DIRECT_MESSAGES_SENT.inc()
+    if not settings.CLUSTER_ENABLED:
+        await deliver(frame)
+    return message, frame
+
+
+async def deliver(frame: dict) -> int:
+    """Send a direct message frame to this worker's sockets of both users."""
+    sent = await manager.send_to_user(frame["recipient_id"], frame)
+    sent += await manager.send_to_user(frame["sender_id"], frame)
+    return sent
+
+
+async def load_frame(db: AsyncSession, message_id: uuid.UUID) -> Optional[dict]:
+    """Frame of a stored direct message, None if it no longer exists."""
+    message = (await db.execute(
+        select(
+            DirectMessage.id,
+            DirectMessage.sender_id,
+            DirectMessage.recipient_id,
+            DirectMessage.content,
+            DirectMessage.created_at,
+        )
+        .where(DirectMessage.id == message_id)
+    )).first()
+    if message is None:
+        return None
+    sender = await get_user_identity(db, str(message.sender_id))
+    return direct_frame(message, sender.username if sender else "Unknown")
+
+
+async def get_inbox(
+        db: AsyncSession,
+        user_id: str,
+        before: Optional[Tuple[datetime, uuid.UUID]] = None,
+        limit: int = 50) -> List[InboxConversation]:
+    # One page of conversations, most recently active first, older than the
+    # (last_message_at, peer_id) cursor
+    stmt = (
+        select(
+            InboxEntry.peer_id,
+            InboxEntry.last_message_id,
+            InboxEntry.last_sender_id,
+            InboxEntry.preview,
+            InboxEntry.last_message_at,
+            InboxEntry.unread,
+        )
+        .where(InboxEntry.user_id == uuid.UUID(user_id))
+        .order_by(InboxEntry.last_message_at.desc(), InboxEntry.peer_id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(InboxEntry.last_message_at, InboxEntry.peer_id) < tuple_(*before))
+    rows = (await db.execute(stmt)).all()
+
+    usernames = await get_usernames(db, {row.peer_id for row in rows})
+    return [
+        InboxConversation(row.peer_id, usernames.get(str(row.peer_id), "Unknown"), row.last_message_id,
+                          row.last_sender_id, row.preview, row.last_message_at, row.unread)
+        for row in rows
+    ]
+
+
+async def get_conversation(
+        db: AsyncSession,
+        user_id: str,
+        peer_id: str,
+        before: Optional[Tuple[datetime, uuid.UUID]] = None,
+        limit: int = 50) -> List[Row]:
+    # One page of the messages between two users older than the
+    # (created_at, id) cursor, returned oldest first
+    try:
+        pair = _pair(uuid.UUID(user_id), uuid.UUID(peer_id))
+    except ValueError:
+        return []
+    stmt = (
+        select(
+            DirectMessage.id,
+            DirectMessage.sender_id,
+            DirectMessage.recipient_id,
+            DirectMessage.content,
+            DirectMessage.created_at,
+        )
+        .where(pair)
+        .order_by(DirectMessage.created_at.desc(), DirectMessage.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(DirectMessage.created_at, DirectMessage.id) < tuple_(*before))
+    rows = (await db.execute(stmt)).all()
+    rows.reverse()
+    return rows
+
+
+async def mark_conversation_read(db: AsyncSession, user_id: str, peer_id: str) -> None:
+    # Reset the unread count of one conversation in the user's inbox
+    try:
+        key = (uuid.UUID(user_id), uuid.UUID(peer_id))
+    except ValueError:
+        return
+    await db.execute(
+        update(InboxEntry)
+        .where(InboxEntry.user_id == key[0], InboxEntry.peer_id == key[1], InboxEntry.unread > 0)
+        .values(unread=0)
+    )
+    await db.commit()
+
+
+class DirectMessageRelay:
+    """Dedicated asyncpg connection LISTENing for direct messages (cluster mode)."""
+
+    def __init__(self) -> None:
+        self._listener = ChannelListener(DIRECT_CHANNEL, self._on_notify)
+        self._deliveries: Set[asyncio.Task] = set()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message_id, sender_id, recipient_id = (uuid.UUID(part) for part in payload.split(":"))
+        except ValueError:
+            logger.warning("Ignoring malformed direct message notification: %r", payload)
+            return
+        if str(sender_id) not in manager.user_connections and str(recipient_id) not in manager.user_connections:
+            return
+            # Neither user has a socket on this worker: nothing to load
+        task = asyncio.create_task(self._deliver(message_id))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, message_id: uuid.UUID) -> None:
+        frame = None
+        try:
+            async with AsyncSessionLocal() as db:
+                frame = await load_frame(db, message_id)
+        except Exception:
+            logger.exception("Failed to load direct message %s", message_id)
+        if frame is not None:
+            await deliver(frame)
+
+    async def start(self) -> None:
+        await self._listener.start()
+
+    async def stop(self) -> None:
+        await self._listener.stop()
+
+
+direct_relay = DirectMessageRelay()
@@ -0,0 +1,135 @@
+"""Per-user, per-room read watermarks.
+
+A watermark is the room's ``message_count`` at the moment the user last
+read it, so ``unread = chatrooms.message_count - read_count`` needs no
+``COUNT(*)`` over ``messages``. Reads happen on the hot paths (opening a
+room, joining or leaving its WebSocket, posting), so ``mark`` only
+records the new position in memory; a background task writes all pending
+watermarks every READ_STATE_FLUSH_SECONDS as one batched upsert.
+"""
+from typing import Dict, List
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.read_state import RoomReadState
+from app.utils.metrics import READ_STATE_FLUSHED, READ_STATE_PENDING
+
+logger = logging.getLogger(__name__)
+
+FLUSH_CHUNK = 5000
+# Rows per INSERT (3 bind parameters each, Postgres allows 32767)
+
+
+class ReadWatermarks:
+    """Pending watermarks, grouped by user so one user's are cheap to overlay."""
+
+    def __init__(self) -> None:
+        self.pending: Dict[str, Dict[str, int]] = {}
+        self._flushing: Dict[str, Dict[str, int]] = {}
+        # Batch currently being written, still visible to overlay()
+        self._versions: Dict[str, int] = {}
+        # Users with marks not yet flushed -> clock value of their last mark
+        self._clock = 0
+        self._floor = 0
+        # Version of every other user: the newest version dropped at a flush
+        self._task: asyncio.Task | None = None
+
+    def mark(self, user_id, room_id, read_count: int | None) -> None:
+        """Record that ``user_id`` has read ``room_id`` up to ``read_count``."""
+        if read_count is None:
+            return
+        user_key, room_key = str(user_id), str(room_id)
+        rooms = self.pending.setdefault(user_key, {})
+        if read_count > rooms.get(room_key, -1):
+            rooms[room_key] = read_count
+            self._clock += 1
+            self._versions[user_key] = self._clock
+
+    def overlay(self, user_id) -> Dict[str, int]:
+        """Watermarks of ``user_id`` that may not be in the database yet."""
+        user_key = str(user_id)
+        flushing = self._flushing.get(user_key)
+        pending = self.pending.get(user_key)
+        if not flushing:
+            return pending or {}
+        merged = dict(flushing)
+        for room_key, read_count in (pending or {}).items():
+            merged[room_key] = max(read_count, merged.get(room_key, -1))
+        return merged
+
+    def version(self, user_id) -> int:
+        # Part of the room list's ETag: changes on every mark and never goes
+        # back to a value the user has seen, also after the entry is dropped
+        return self._versions.get(str(user_id), self._floor)
+
+    def pending_count(self) -> int:
+        return sum(len(rooms) for rooms in self.pending.values())
+
+    async def flush(self) -> int:
+        """Write every pending watermark, return the number of rows."""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        self._flushing = batch
+
+        rows: List[dict] = [
+            {"user_id": uuid.UUID(user_key), "room_id": uuid.UUID(room_key), "read_count": read_count}
+            for user_key, rooms in batch.items()
+            for room_key, read_count in rooms.items()
+        ]
+        rows.sort(key=lambda row: (row["user_id"], row["room_id"]))
+        # Same lock order on every worker, so concurrent flushes can't deadlock
+        try:
+            async with AsyncSessionLocal() as db:
+                for start in range(0, len(rows), FLUSH_CHUNK):
+                    stmt = pg_insert(RoomReadState).values(rows[start:start + FLUSH_CHUNK])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[RoomReadState.user_id, RoomReadState.room_id],
+                        set_={
+                            # Never move a watermark backwards (stale counts, other workers)
+                            "read_count": func.greatest(RoomReadState.read_count, stmt.excluded.read_count),
+                            "updated_at": func.now(),
+                        },
+                    )
+                    await db.execute(stmt)
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to flush %d read watermarks, will retry", len(rows))
+            for user_key, rooms in batch.items():
+                for room_key, read_count in rooms.items():
+                    self.mark(user_key, room_key, read_count)
+            return 0
+        finally:
+            self._flushing = {}
+
+        for user_key in batch:
+            if user_key not in self.pending:
+                # Written and not marked since: the entry is no longer needed
+                self._floor = max(self._floor, self._versions.pop(user_key, 0))
+        READ_STATE_FLUSHED.inc(len(rows))
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.READ_STATE_FLUSH_SECONDS)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        # Don't lose the last few seconds of reads on shutdown
+
+
+read_watermarks = ReadWatermarks()
+READ_STATE_PENDING.set_function(read_watermarks.pending_count)
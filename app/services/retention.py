@@ -0,0 +1,233 @@
+"""Per-room message retention.
+
+Rooms opt in with ``retention_days`` (maximum age) and/or
+``retention_max_messages`` (maximum count) on ``chatrooms``. A background
+task prunes every RETENTION_INTERVAL_SECONDS: each room's expired
+messages are walked oldest first in ``(created_at, id)`` order on the
+``(room_id, created_at)`` index and deleted RETENTION_BATCH_SIZE at a time,
+one short transaction per batch with a pause in between, so pruning a
+large room never holds locks for long or ships one huge burst of WAL to
+the replicas. With RETENTION_DRY_RUN the expired messages are only
+counted. Run once by hand with ``python -m app.services.retention
+[--dry-run]``.
+
+A room's policy is chosen when it is created (the create-room form) and
+changed by an operator with ``python -m app.services.retention --room
+NAME [--days N] [--max-messages N]`` (0 removes that limit).
+
+``chatrooms.message_count`` counts messages ever posted (unread counts are
+derived from it), so pruning leaves it alone.
+"""
+from datetime import timedelta
+from time import perf_counter
+from typing import List, Optional
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import and_, delete, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database.session import engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+from app.models.user import User  # noqa: F401 (registers the mapper for the CLI)
+from app.services.chat_state import chat_state
+from app.utils.metrics import RETENTION_BATCH_DURATION, RETENTION_DELETED, RETENTION_LAST_RUN_ROWS
+from app.websocket.resync import recent_messages
+
+logger = logging.getLogger(__name__)
+
+RETENTION_LOCK_KEY = 0x5245544E
+# Session advisory lock: with several workers only one prunes at a time
+
+
+class RetentionReport:
+    """Outcome of one run; ``rows`` are deleted messages (or expired ones, in dry-run)."""
+
+    __slots__ = ("dry_run", "rooms", "rows", "batches", "seconds")
+
+    def __init__(self, dry_run: bool) -> None:
+        self.dry_run = dry_run
+        self.rooms = 0
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        verb = "would delete" if self.dry_run else "deleted"
+        return (f"retention {verb} {self.rows} messages in {self.rooms} rooms "
+                f"({self.batches} batches, {self.seconds:.2f}s)")
+
+
+async def _expired_condition(conn: AsyncConnection, room):
+    """WHERE clause matching the room's expired messages, None if nothing expires."""
+    conditions = []
+    if room.retention_days is not None:
+        conditions.append(Message.created_at < func.now() - timedelta(days=room.retention_days))
+    if room.retention_max_messages is not None:
+        # Newest message past the limit; it and everything older goes
+        boundary = (await conn.execute(
+            select(Message.created_at, Message.id)
+            .where(Message.room_id == room.id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .offset(room.retention_max_messages)
+            .limit(1)
+        )).first()
+        if boundary is not None:
+            conditions.append(tuple_(Message.created_at, Message.id) <= tuple_(*boundary))
+    if not conditions:
+        return None
+    return and_(Message.room_id == room.id, or_(*conditions))
+
+
+async def _prune_room(conn: AsyncConnection, room, report: RetentionReport) -> int:
+    async with conn.begin():
+        expired = await _expired_condition(conn, room)
+        if expired is None:
+            return 0
+        if report.dry_run:
+            return (await conn.execute(select(func.count()).select_from(Message).where(expired))).scalar_one()
+
+    removed = 0
+    after = None  # (created_at, id) of the last deleted message
+    while True:
+        batch = select(Message.id).where(expired)
+        if after is not None:
+            batch = batch.where(tuple_(Message.created_at, Message.id) > tuple_(*after))
+        batch = batch.order_by(Message.created_at, Message.id).limit(settings.RETENTION_BATCH_SIZE)
+
+        start = perf_counter()
+        async with conn.begin():
+            rows = (await conn.execute(
+                delete(Message)
+                .where(Message.id.in_(batch))
+                .returning(Message.created_at, Message.id)
+            )).all()
+        RETENTION_BATCH_DURATION.labels().observe(perf_counter() - start)
+
+        if not rows:
+            return removed
+        removed += len(rows)
+        report.batches += 1
+        RETENTION_DELETED.inc(len(rows))
+        after = max(tuple(row) for row in rows)
+        if len(rows) < settings.RETENTION_BATCH_SIZE:
+            return removed
+        await asyncio.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+
+
+async def prune(dry_run: bool | None = None) -> Optional[RetentionReport]:
+    """Apply every room's retention policy, None if another worker is pruning."""
+    if dry_run is None:
+        dry_run = settings.RETENTION_DRY_RUN
+    report = RetentionReport(dry_run)
+    start = perf_counter()
+
+    async with engine.connect() as conn:
+        async with conn.begin():
+            locked = (await conn.execute(select(func.pg_try_advisory_lock(RETENTION_LOCK_KEY)))).scalar_one()
+            if not locked:
+                return None
+            rooms: List = (await conn.execute(
+                select(ChatRoom.id, ChatRoom.retention_days, ChatRoom.retention_max_messages)
+                .where(or_(ChatRoom.retention_days.is_not(None), ChatRoom.retention_max_messages.is_not(None)))
+            )).all()
+        try:
+            for room in rooms:
+                removed = await _prune_room(conn, room, report)
+                if removed:
+                    report.rooms += 1
+                    report.rows += removed
+                    if not dry_run:
+                        chat_state.forget_room(str(room.id))
+                        recent_messages.forget(str(room.id))
+                        # Reload the room's page validators, and don't replay
+                        # deleted messages to reconnecting clients
+        finally:
+            async with conn.begin():
+                await conn.execute(select(func.pg_advisory_unlock(RETENTION_LOCK_KEY)))
+
+    report.seconds = perf_counter() - start
+    RETENTION_LAST_RUN_ROWS.set(report.rows)
+    logger.info("%s", report)
+    return report
+
+
+async def set_retention(name: str, days: int | None, max_messages: int | None) -> bool:
+    """Change a room's policy; None leaves a limit as it is, 0 removes it.
+
+    Returns False when there is no room with that name.
+    """
+    values = {}
+    if days is not None:
+        values["retention_days"] = days or None
+    if max_messages is not None:
+        values["retention_max_messages"] = max_messages or None
+    async with engine.begin() as conn:
+        room_id = (await conn.execute(select(ChatRoom.id).where(ChatRoom.name == name))).scalar_one_or_none()
+        if room_id is None:
+            return False
+        if values:
+            await conn.execute(update(ChatRoom).where(ChatRoom.id == room_id).values(**values))
+            logger.info("Retention of room %s set to %s", name, values)
+    return True
+
+
+class RetentionPruner:
+    """Runs ``prune`` every RETENTION_INTERVAL_SECONDS in the background."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+            try:
+                await prune()
+            except Exception:
+                logger.exception("Retention run failed")
+
+    def start(self) -> None:
+        if settings.RETENTION_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+pruner = RetentionPruner()
+
+
+async def _main(args: argparse.Namespace) -> bool:
+    try:
+        if args.room is not None:
+            return await set_retention(args.room, args.days, args.max_messages)
+        await prune(args.dry_run or None)
+        return True
+    finally:
+        await engine.dispose()
+
+
+def _limit(value: str) -> int:
+    limit = int(value)
+    if limit < 0:
+        raise argparse.ArgumentTypeError("must be 0 (no limit) or more")
+    return limit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply per-room message retention once, or set a room's policy.")
+    parser.add_argument("--dry-run", action="store_true", help="only count expired messages")
+    parser.add_argument("--room", help="set the policy of the room with this name instead of pruning")
+    parser.add_argument("--days", type=_limit, help="with --room: maximum message age in days (0 = no limit)")
+    parser.add_argument("--max-messages", type=_limit, help="with --room: messages kept (0 = no limit)")
+    args = parser.parse_args()
+    if args.room is None and (args.days is not None or args.max_messages is not None):
+        parser.error("--days and --max-messages need --room")
+    logging.basicConfig(level=logging.INFO)
+    if not asyncio.run(_main(args)):
+        parser.exit(1, f"No room named {args.room!r}\n")
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Iterable, Optional, Tuple
+import json
+import logging
+import uuid
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.listener import ChannelListener
+from app.models.user import User
+from app.utils.metrics import USER_CACHE_LOOKUPS, USER_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "user_cache_invalidate"
+# Postgres NOTIFY channel used to share invalidations between workers
+
+_ID_HIT = USER_CACHE_LOOKUPS.labels("id", "hit")
+_ID_MISS = USER_CACHE_LOOKUPS.labels("id", "miss")
+_USERNAME_HIT = USER_CACHE_LOOKUPS.labels("username", "hit")
+_USERNAME_MISS = USER_CACHE_LOOKUPS.labels("username", "miss")
+# Pre-bound counters, lookups are on the message hot path
+
+
+class UserIdentity:
+    """The public part of a user: everything except the password hash."""
+
+    __slots__ = ("id", "username")
+
+    def __init__(self, id: str, username: str) -> None:
+        self.id = id
+        self.username = username
+
+
+class UserIdentityCache:
+    """Bounded id/username -> UserIdentity cache with TTL and LRU eviction.
+
+    Entries are keyed by the user id (as a string); a secondary index maps
+    usernames to ids so both lookups share one entry and one expiry.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[UserIdentity, float]]" = OrderedDict()
+        self._ids_by_username: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, user_id: str) -> Optional[UserIdentity]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        identity, expires_at = entry
+        if expires_at < monotonic():
+            self._remove(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return identity
+
+    def get_by_id(self, user_id: str) -> Optional[UserIdentity]:
+        identity = self._lookup(user_id)
+        (_ID_HIT if identity is not None else _ID_MISS).inc()
+        return identity
+
+    def get_by_username(self, username: str) -> Optional[UserIdentity]:
+        user_id = self._ids_by_username.get(username)
+        identity = self._lookup(user_id) if user_id else None
+        (_USERNAME_HIT if identity is not None else _USERNAME_MISS).inc()
+        return identity
+
+    def put(self, identity: UserIdentity) -> None:
+        self._remove(identity.id)
+        self._entries[identity.id] = (identity, monotonic() + self.ttl)
+        self._ids_by_username[identity.username] = identity.id
+        while len(self._entries) > self.max_size:
+            oldest_id = next(iter(self._entries))
+            self._remove(oldest_id)
+
+    def _remove(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None and self._ids_by_username.get(entry[0].username) == user_id:
+            del self._ids_by_username[entry[0].username]
+
+    def invalidate(self, user_id: Optional[str] = None, username: Optional[str] = None) -> None:
+        if username is not None and user_id is None:
+            user_id = self._ids_by_username.get(username)
+        if user_id is not None:
+            self._remove(user_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._ids_by_username.clear()
+
+
+user_cache = UserIdentityCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+USER_CACHE_SIZE.set_function(user_cache.__len__)
+
+
+def _identity(user_id, username: str) -> UserIdentity:
+    return UserIdentity(str(user_id), username)
+
+
+async def get_user_identity(db: AsyncSession, user_id: str) -> UserIdentity | None:
+    """Resolve a user id to its identity, querying only on a cache miss."""
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except (ValueError, AttributeError, TypeError):
+        # Invalid UUID format or empty user_id
+        return None
+
+    identity = user_cache.get_by_id(str(user_uuid))
+    if identity is not None:
+        return identity
+
+    result = await db.execute(select(User.id, User.username).where(User.id == user_uuid))
+    row = result.first()
+    if row is None:
+        return None
+    identity = _identity(row.id, row.username)
+    user_cache.put(identity)
+    return identity
+
+
+async def get_usernames(db: AsyncSession, user_ids: Iterable) -> Dict[str, str]:
+    """Map many user ids to usernames with at most one query for the misses."""
+    usernames: Dict[str, str] = {}
+    missing = []
+    for user_id in {str(user_id) for user_id in user_ids}:
+        identity = user_cache.get_by_id(user_id)
+        if identity is not None:
+            usernames[user_id] = identity.username
+        else:
+            missing.append(user_id)
+
+    if missing:
+        stmt = select(User.id, User.username).where(
+            User.id.in_([uuid.UUID(user_id) for user_id in missing]))
+        result = await db.execute(stmt)
+        for row in result:
+            identity = _identity(row.id, row.username)
+            user_cache.put(identity)
+            usernames[identity.id] = identity.username
+    return usernames
+
+
+async def publish_invalidation(db: AsyncSession, user_id: str | None = None, username: str | None = None) -> None:
+    """Invalidate a user locally and, when shared, on every other worker.
+
+    The NOTIFY is transactional: other workers only see it once the
+    caller's transaction commits.
+    """
+    user_cache.invalidate(user_id=user_id, username=username)
+    if settings.USER_CACHE_SHARED:
+        payload = json.dumps({"id": user_id, "username": username})
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": INVALIDATION_CHANNEL, "payload": payload},
+        )
+
+
+class InvalidationListener:
+    """Dedicated asyncpg connection LISTENing for invalidations from peers.
+
+    Invalidations published while the connection was down are lost, so
+    the whole cache is dropped whenever it reconnects.
+    """
+
+    def __init__(self) -> None:
+        self._listener = ChannelListener(INVALIDATION_CHANNEL, self._on_notify, on_reconnect=user_cache.clear)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed user cache invalidation: %r", payload)
+            return
+        user_cache.invalidate(user_id=data.get("id"), username=data.get("username"))
+
+    async def start(self) -> None:
+        await self._listener.start()
+
+    async def stop(self) -> None:
+        await self._listener.stop()
+
+
+invalidation_listener = InvalidationListener()
@@ -1,10 +1,26 @@
 let socket = null;
 let heartbeatInterval = null;
 let reconnectAttempts = 0;
-const maxReconnectAttempts = 5;
-const reconnectDelay = 3000;
+const maxReconnectAttempts = 10;
+const reconnectBaseDelay = 1000;
+const reconnectMaxDelay = 30000;
+let reconnectHintMs = null; // delay sent by the server before a restart
+let wsBase = null; // base URL of the worker owning the room, set by a redirect
+const REDIRECT_CLOSE_CODE = 4001;
+let redirectsInARow = 0; // guards against bouncing while workers disagree
+let messageFormReady = false;
+const typingSendInterval = 2000; // matches the server's per-user throttle
+const typingDisplayTime = 3000;
+let lastTypingSent = 0;
+let lastSentContent = "";
+let typingTimeout = null;
 let currentUserId = null;
 let currentUsername = null;
+let currentRoomId = null;
+let lastSeq = 0; // seq of the newest message shown, sent as last_seq on (re)connect
+const pendingMessages = new Map(); // seq -> message waiting for a gap to fill
+const gapWaitMs = 1000;
+let gapTimer = null;
 
 const WS_STATE = {
     CONNECTING: 0,
@@ -16,21 +32,34 @@ const WS_STATE = {
 function connectWebSocket(roomId, userId, username) {
     currentUserId = userId;
     currentUsername = username;
+    currentRoomId = roomId;
     
     if (socket && socket.readyState === WS_STATE.OPEN) {
         return;
     }
 
     const protocol = window.location.protocol === "https:" ? "wss" : "ws";
-    const wsUrl = `${protocol}://${window.location.host}/ws/chat/${roomId}?user_id=${userId}`;
+    const base = wsBase || `${protocol}://${window.location.host}`;
+    const wsUrl = `${base}/ws/chat/${roomId}?user_id=${userId}&last_seq=${lastSeq}`;
 
     socket = new WebSocket(wsUrl);
-    reconnectAttempts = 0;
 
     setupWebSocketHandlers(roomId, userId);
     setupMessageForm();
 }
 
+// Delay before the next reconnect: the server's hint if it sent one,
+// otherwise exponential backoff with jitter so clients don't retry in step
+function nextReconnectDelay() {
+    if (reconnectHintMs !== null) {
+        const hint = reconnectHintMs;
+        reconnectHintMs = null;
+        return hint;
+    }
+    const ceiling = Math.min(reconnectMaxDelay, reconnectBaseDelay * 2 ** reconnectAttempts);
+    return ceiling / 2 + Math.random() * ceiling / 2;
+}
+
 function setupWebSocketHandlers(roomId, userId) {
     socket.onopen = () => {
         console.log("✅ WebSocket connected");
@@ -52,16 +81,69 @@ function setupWebSocketHandlers(roomId, userId) {
         try {
             const jsonData = JSON.parse(data);
             
+            // Room is served by another worker: reconnect there
+            if (jsonData.type === "redirect") {
+                wsBase = jsonData.url;
+                redirectsInARow++;
+                return;
+            }
+            
+            // Server is restarting: remember when to come back
+            if (jsonData.type === "reconnect") {
+                reconnectHintMs = jsonData.after_ms;
+                return;
+            }
+            
+            // Sending too fast: the last message was not delivered
+            if (jsonData.type === "slow_down") {
+                showSlowDown(jsonData.retry_after_ms);
+                // A dropped resync is asked for again once allowed
+                setTimeout(flushPendingMessages, jsonData.retry_after_ms);
+                return;
+            }
+            
+            // Someone else is typing (coalesced by the server)
+            if (jsonData.type === "typing") {
+                showTyping(jsonData.users || []);
+                return;
+            }
+            
             // Handle system messages
             if (jsonData.type === "system" && jsonData.message) {
+                redirectsInARow = 0; // joined the room
                 showSystemMessage(jsonData.message);
                 return;
             }
             
             // Handle chat messages
-            if (jsonData.type === "message" && jsonData.content) {
-                const isOwnMessage = jsonData.user_id === currentUserId;
-                addMessageToList(jsonData.username, jsonData.content, jsonData.created_at, isOwnMessage);
+            if (jsonData.type === "message" && (jsonData.content || jsonData.attachment)) {
+                clearTyping();
+                receiveMessage(jsonData);
+                return;
+            }
+            
+            // Direct message to this user (also echoed to the sender's tabs)
+            if (jsonData.type === "direct") {
+                if (jsonData.sender_id !== currentUserId) {
+                    showSystemMessage(`Direct message from ${jsonData.sender_username}: ${jsonData.content}`);
+                }
+                return;
+            }
+
+            // Replay after a reconnect starts later than asked (too many
+            // missed, or older messages were pruned)
+            if (jsonData.type === "resync") {
+                if (jsonData.truncated) {
+                    showSystemMessage("Some older messages were skipped, reload the page to see them");
+                }
+                lastSeq = Math.max(lastSeq, jsonData.after_seq);
+                flushPendingMessages();
+                return;
+            }
+            
+            // Server refused a frame (e.g. an attachment that can't be posted)
+            if (jsonData.type === "error") {
+                showMessageError(jsonData.message);
                 return;
             }
             
@@ -100,15 +182,24 @@ function setupWebSocketHandlers(roomId, userId) {
     socket.onclose = (event) => {
         console.log(`WebSocket closed: ${event.code} - ${event.reason}`);
         stopHeartbeat();
+        
+        if (event.code === REDIRECT_CLOSE_CODE && wsBase && redirectsInARow <= 3) {
+            connectWebSocket(roomId, currentUserId, currentUsername);
+            return;
+        }
+        // Any other close: the owner may be gone or the ring may have
+        // changed, so reconnect through the host the page came from
+        wsBase = null;
         updateConnectionStatus(false);
         showSystemMessage("Disconnected from chat");
         
         if (event.code !== 1000 && reconnectAttempts < maxReconnectAttempts) {
+            const delay = nextReconnectDelay();
             setTimeout(() => {
                 reconnectAttempts++;
                 console.log(`Reconnecting... Attempt ${reconnectAttempts}`);
                 connectWebSocket(roomId, currentUserId, currentUsername);
-            }, reconnectDelay);
+            }, delay);
         }
     };
 
@@ -120,13 +211,55 @@ function setupWebSocketHandlers(roomId, userId) {
     };
 }
 
+// Show messages in seq order: repeats (a replay overlapping live
+// broadcasts) are dropped, and a message after a gap waits for the gap to
+// be filled; if it isn't soon, ask the server for what is missing
+function receiveMessage(message) {
+    if (typeof message.seq !== "number") {
+        showMessage(message);
+        return;
+    }
+    if (message.seq <= lastSeq) {
+        return;
+    }
+    pendingMessages.set(message.seq, message);
+    flushPendingMessages();
+}
+
+function flushPendingMessages() {
+    for (const seq of pendingMessages.keys()) {
+        if (seq <= lastSeq) pendingMessages.delete(seq);
+    }
+    while (pendingMessages.has(lastSeq + 1)) {
+        const message = pendingMessages.get(lastSeq + 1);
+        pendingMessages.delete(lastSeq + 1);
+        lastSeq++;
+        showMessage(message);
+    }
+    if (pendingMessages.size && !gapTimer) {
+        gapTimer = setTimeout(() => {
+            gapTimer = null;
+            if (pendingMessages.size && socket && socket.readyState === WS_STATE.OPEN) {
+                socket.send(JSON.stringify({ type: "resync", last_seq: lastSeq }));
+            }
+        }, gapWaitMs);
+    }
+}
+
+function showMessage(message) {
+    const isOwnMessage = message.user_id === currentUserId;
+    addMessageToList(message.username, message.content, message.created_at, isOwnMessage, message.attachment);
+}
+
 function setupMessageForm() {
     const messageForm = document.getElementById('messageForm');
     const messageInput = document.getElementById('messageInput');
     const sendButton = document.getElementById('sendButton');
     const messageError = document.getElementById('messageError');
     
-    if (!messageForm || !messageInput) return;
+    // Listeners are attached once, not again on every reconnect
+    if (!messageForm || !messageInput || messageFormReady) return;
+    messageFormReady = true;
     
     messageForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -145,6 +278,16 @@ function setupMessageForm() {
         }
     });
     
+    const attachmentInput = document.getElementById('attachmentInput');
+    if (attachmentInput) {
+        attachmentInput.addEventListener('change', function() {
+            if (attachmentInput.files.length) {
+                uploadAttachment(attachmentInput.files[0]);
+            }
+            attachmentInput.value = '';
+        });
+    }
+    
     messageInput.addEventListener('input', function() {
         if (messageError.textContent) {
             messageError.textContent = '';
@@ -153,6 +296,9 @@ function setupMessageForm() {
         
         const hasContent = messageInput.value.trim().length > 0;
         sendButton.disabled = !hasContent;
+        if (hasContent) {
+            sendTyping();
+        }
     });
 }
 
@@ -185,6 +331,7 @@ function sendMessage() {
     try {
         // Send a plain-text message
         socket.send(content);
+        lastSentContent = content;
         
         // Clear the input field
         messageInput.value = '';
@@ -208,6 +355,104 @@ function sendMessage() {
     }
 }
 
+// Stream the file to the server as the request body, then post its id
+// (with whatever is in the input as a caption) over the WebSocket
+async function uploadAttachment(file) {
+    const messageInput = document.getElementById('messageInput');
+    if (!socket || socket.readyState !== WS_STATE.OPEN) {
+        showMessageError('Not connected to chat server');
+        return;
+    }
+    showSystemMessage(`Uploading ${file.name}...`);
+    try {
+        const response = await fetch(
+            `/chat/room/${currentRoomId}/attachments?filename=${encodeURIComponent(file.name)}`,
+            {
+                method: 'POST',
+                body: file,
+                headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            }
+        );
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            showMessageError(error.detail || 'Upload failed');
+            return;
+        }
+        const attachment = await response.json();
+        socket.send(JSON.stringify({
+            type: "attachment",
+            attachment_id: attachment.id,
+            content: messageInput ? messageInput.value.trim() : "",
+        }));
+        if (messageInput) messageInput.value = '';
+    } catch (error) {
+        console.error("Failed to upload attachment:", error);
+        showMessageError('Upload failed');
+    }
+}
+
+function showMessageError(message) {
+    const messageError = document.getElementById('messageError');
+    if (!messageError) return;
+    messageError.textContent = message;
+    messageError.classList.add('error');
+}
+
+function formatSize(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let value = bytes;
+    let unit = 0;
+    while (value >= 1000 && unit < units.length - 1) {
+        value /= 1000;
+        unit++;
+    }
+    return `${unit ? value.toFixed(1) : value} ${units[unit]}`;
+}
+
+function showSlowDown(retryAfterMs) {
+    const messageError = document.getElementById('messageError');
+    if (!messageError) return;
+    const messageInput = document.getElementById('messageInput');
+    if (messageInput && !messageInput.value) {
+        messageInput.value = lastSentContent; // give the dropped text back
+    }
+    const seconds = Math.max(1, Math.ceil(retryAfterMs / 1000));
+    messageError.textContent = `You're sending messages too fast, message not sent. Try again in ${seconds}s.`;
+    messageError.classList.add('error');
+}
+
+function sendTyping() {
+    const now = Date.now();
+    if (now - lastTypingSent < typingSendInterval) {
+        return;
+    }
+    if (socket && socket.readyState === WS_STATE.OPEN) {
+        socket.send(JSON.stringify({ type: "typing" }));
+        lastTypingSent = now;
+    }
+}
+
+function showTyping(users) {
+    const indicator = document.getElementById("typingIndicator");
+    if (!indicator) return;
+
+    const others = users.filter((name) => name !== currentUsername);
+    if (others.length === 0) return;
+
+    indicator.textContent = others.length === 1
+        ? `${others[0]} is typing...`
+        : `${others.slice(0, 3).join(", ")} are typing...`;
+
+    clearTimeout(typingTimeout);
+    typingTimeout = setTimeout(() => { indicator.textContent = ""; }, typingDisplayTime);
+}
+
+function clearTyping() {
+    const indicator = document.getElementById("typingIndicator");
+    if (indicator) indicator.textContent = "";
+    clearTimeout(typingTimeout);
+}
+
 function startHeartbeat() {
     stopHeartbeat();
     
@@ -226,7 +471,7 @@ function stopHeartbeat() {
     }
 }
 
-function addMessageToList(username, content, timestamp = null, isOwnMessage = false) {
+function addMessageToList(username, content, timestamp = null, isOwnMessage = false, attachment = null) {
     const list = document.getElementById("messageList");
     if (!list) return;
 
@@ -263,6 +508,11 @@ function addMessageToList(username, content, timestamp = null, isOwnMessage = fa
         usernameHtml = `<strong class="message-username">${escapeHtml(username)}</strong>`;
     }
     
+    let attachmentHtml = '';
+    if (attachment) {
+        attachmentHtml = `<a class="message-attachment" href="${escapeHtml(attachment.url)}">📎 ${escapeHtml(attachment.filename)} (${formatSize(attachment.size)})</a>`;
+    }
+    
     li.innerHTML = `
         <div class="message-bubble">
             <div class="message-header">
@@ -270,7 +520,8 @@ function addMessageToList(username, content, timestamp = null, isOwnMessage = fa
                 <span class="message-time">${timeString}</span>
                 ${isOwnMessage ? usernameHtml : ''}
             </div>
-            <div class="message-content">${escapeHtml(content)}</div>
+            <div class="message-content">${escapeHtml(content || '')}</div>
+            ${attachmentHtml}
         </div>
     `;
 
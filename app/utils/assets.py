@@ -0,0 +1,171 @@
+"""Fingerprinted, precompressed static assets.
+
+``build_assets`` copies every file under ``app/static`` to
+``app/static/dist`` with a content hash in its name
+(``css/style.css`` -> ``css/style.3f2a9c1b7d4e.css``), writes gzip and
+brotli variants next to it and records the mapping in ``manifest.json``.
+Templates resolve URLs through ``static_url`` and ``PrecompressedStaticFiles``
+serves the best encoding the client accepts with an immutable
+``Cache-Control``, so browsers never revalidate a hashed asset.
+
+Run at image build time with ``python -m app.utils.assets`` (and again
+after editing a static file). With ``ASSET_BUILD_ON_STARTUP`` the app
+builds on startup only when there is no manifest yet: every worker runs
+the lifespan, and rebuilding would delete files other workers are serving.
+"""
+from hashlib import sha256
+from pathlib import Path
+from stat import S_ISREG
+from typing import Dict, Optional
+import gzip
+import json
+import logging
+import shutil
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always produced
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path("app/static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+STATIC_URL = "/static"
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".html", ".json", ".txt", ".map"}
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+_manifest: Optional[Dict[str, str]] = None
+# Logical path -> fingerprinted path, loaded lazily from dist/manifest.json
+
+
+def _fingerprint(path: Path) -> str:
+    return sha256(path.read_bytes()).hexdigest()[:12]
+
+
+def _compress(path: Path) -> None:
+    data = path.read_bytes()
+    # mtime=0 keeps the .gz output byte-identical between builds
+    with open(path.with_name(path.name + ".gz"), "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=raw, mtime=0) as gz:
+            gz.write(data)
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(
+            brotli.compress(data, quality=11))
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """Fingerprint and precompress every static file, return the manifest."""
+    global _manifest
+
+    dist_dir = static_dir / DIST_DIRNAME
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir(parents=True)
+
+    manifest: Dict[str, str] = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist_dir in source.parents:
+            continue
+        logical = source.relative_to(static_dir).as_posix()
+        hashed = source.relative_to(static_dir).with_name(
+            f"{source.stem}.{_fingerprint(source)}{source.suffix}")
+        target = dist_dir / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+        if source.suffix in COMPRESSIBLE:
+            _compress(target)
+        manifest[logical] = f"{DIST_DIRNAME}/{hashed.as_posix()}"
+
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    _manifest = manifest
+    logger.info("Built %d static assets (brotli: %s)", len(manifest), brotli is not None)
+    return manifest
+
+
+def ensure_assets(static_dir: Path = STATIC_DIR) -> None:
+    """Build the assets unless a manifest already exists (startup hook)."""
+    if not (static_dir / DIST_DIRNAME / MANIFEST_NAME).exists():
+        build_assets(static_dir)
+
+
+def _load_manifest() -> Dict[str, str]:
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads((STATIC_DIR / DIST_DIRNAME / MANIFEST_NAME).read_text())
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def static_url(path: str) -> str:
+    """Template helper: URL of the fingerprinted copy of a static file.
+
+    Falls back to the plain path when the assets have not been built.
+    """
+    path = path.lstrip("/")
+    return f"{STATIC_URL}/{_load_manifest().get(path, path)}"
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Content coding -> quality from an Accept-Encoding header."""
+    qualities: Dict[str, float] = {}
+    for token in header.lower().split(","):
+        coding, _, params = token.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def accepts_encoding(qualities: Dict[str, float], coding: str) -> bool:
+    # A coding the header does not name falls back to "*"; q=0 refuses it
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br/.gz siblings and caches hashed files forever."""
+
+    async def get_response(self, path: str, scope):
+        immutable = path.startswith(DIST_DIRNAME + "/")
+        response = None
+
+        if immutable:
+            qualities = parse_accept_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if not accepts_encoding(qualities, encoding):
+                    continue
+                full_path, stat_result = self.lookup_path(path + suffix)
+                if stat_result is not None and S_ISREG(stat_result.st_mode):
+                    response = self.file_response(full_path, stat_result, scope)
+                    response.headers["content-encoding"] = encoding
+                    break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers["vary"] = "Accept-Encoding"
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        return response
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_assets()
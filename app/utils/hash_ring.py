@@ -0,0 +1,34 @@
+"""Consistent hash ring with virtual nodes.
+
+Each member is placed on the ring at ``vnodes`` pseudo-random points and
+a key belongs to the first point clockwise from its own hash. Adding or
+removing a member only moves the keys of the arcs it gains or loses
+(about 1/N of them), everything else keeps its owner.
+"""
+from bisect import bisect
+from hashlib import blake2b
+from typing import Iterable, List, Optional, Tuple
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, members: Iterable[str] = (), vnodes: int = 64) -> None:
+        self.vnodes = vnodes
+        self.members = frozenset(members)
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Member that owns ``key``, None while the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect(self._hashes, _hash(key))
+        return self._owners[index % len(self._owners)]
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+REVALIDATE = "private, no-cache"
+# Pages that may change: the browser keeps a copy but must revalidate it
+
+IMMUTABLE = "private, max-age=31536000, immutable"
+# Content that never changes once served (e.g. closed history pages)
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from the values the representation depends on."""
+    digest = blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # TIMESTAMP columns are naive and written in UTC by the database
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _opaque(tag: str) -> str:
+    # Weak comparison (RFC 9110 8.8.3.2): ignore the W/ prefix
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the validators.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the client did not send an entity tag.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _opaque(etag)
+        return any(_opaque(tag) == current for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(
+    etag: Optional[str],
+    last_modified: Optional[datetime] = None,
+    cache_control: str = REVALIDATE,
+) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control, "Vary": "Cookie"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def not_modified(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = REVALIDATE,
+) -> Response:
+    """Empty 304 response carrying the same validators as a 200 would."""
+    return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
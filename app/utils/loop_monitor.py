@@ -0,0 +1,143 @@
+"""Event-loop health: scheduling lag and callbacks that block the loop.
+
+Every worker serves all of its WebSockets from one event loop, so any
+synchronous stretch in a handler (password hashing, rendering a large
+page, a big JSON dump) delays every other socket on the worker by as long.
+
+* **Lag** is sampled continuously: a task asks to wake up every
+  LOOP_LAG_INTERVAL_SECONDS and records how late it actually ran, into
+  the ``event_loop_lag_seconds`` histogram and p50/p99/max gauges over the
+  last LOOP_LAG_WINDOW samples.
+* **Slow callbacks** (opt-in, LOOP_SLOW_CALLBACK_MS > 0): every callback the
+  loop runs is timed, and one that runs longer than the threshold is
+  logged with the request (method and route template) or WebSocket route
+  it ran for and the coroutine it belongs to, and counted per source.
+  Costs two clock reads per callback; it works with the default asyncio
+  loop, not uvloop.
+"""
+from collections import deque
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Deque, Optional
+import asyncio
+import logging
+
+from app.config import settings
+from app.utils.metrics import EVENT_LOOP_LAG, EVENT_LOOP_LAG_RECENT, EVENT_LOOP_SLOW_CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+_current_scope: ContextVar[Optional[dict]] = ContextVar("loop_monitor_scope", default=None)
+# ASGI scope of the request or socket a task is serving (set by LoopMonitorMiddleware)
+
+_handle_run = asyncio.events.Handle._run
+
+
+def _timed_run(handle: asyncio.Handle) -> None:
+    # Replaces Handle._run while slow-callback detection is on
+    start = perf_counter()
+    _handle_run(handle)
+    elapsed = perf_counter() - start
+    if elapsed >= loop_monitor.slow_callback_seconds:
+        loop_monitor.report_slow(handle, elapsed)
+
+
+def _scope_source(scope: dict) -> str:
+    route = scope.get("route")
+    path = route.path if route is not None else scope.get("path", "")
+    if scope["type"] == "websocket":
+        return f"WS {path}"
+    return f"{scope.get('method', '')} {path}"
+
+
+def _callback_source(handle: asyncio.Handle) -> tuple:
+    """(request or coroutine, where it went on to wait) for a handle that ran."""
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return getattr(callback, "__qualname__", repr(callback)), ""
+
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", repr(coro))
+    while getattr(coro, "cr_await", None) is not None and hasattr(coro.cr_await, "cr_frame"):
+        coro = coro.cr_await
+        # Innermost coroutine: the await the task reached after blocking
+    frame = getattr(coro, "cr_frame", None)
+    where = f"next await at {frame.f_code.co_filename}:{frame.f_lineno}" if frame is not None else ""
+
+    context = getattr(handle, "_context", None)
+    scope = context.get(_current_scope) if context is not None else None
+    if scope is not None:
+        return _scope_source(scope), f"{name}, {where}" if where else name
+    return name, where
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        self.recent: Deque[float] = deque(maxlen=settings.LOOP_LAG_WINDOW)
+        self.slow_callback_seconds = settings.LOOP_SLOW_CALLBACK_MS / 1000
+        self._task: asyncio.Task | None = None
+
+    def percentile(self, fraction: float) -> float:
+        # Lag at ``fraction`` (0-1) over the recent samples, 0 before the first
+        if not self.recent:
+            return 0.0
+        samples = sorted(self.recent)
+        return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+    def report_slow(self, handle: asyncio.Handle, elapsed: float) -> None:
+        source, where = _callback_source(handle)
+        EVENT_LOOP_SLOW_CALLBACKS.labels(source).inc()
+        logger.warning(
+            "Event loop blocked for %.0f ms by %s%s",
+            elapsed * 1000, source, f" ({where})" if where else "",
+        )
+
+    async def _run(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - expected, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+            self.recent.append(lag)
+
+    def start(self) -> None:
+        if settings.LOOP_LAG_INTERVAL_SECONDS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(settings.LOOP_LAG_INTERVAL_SECONDS))
+        if self.slow_callback_seconds > 0:
+            asyncio.events.Handle._run = _timed_run
+
+    async def stop(self) -> None:
+        asyncio.events.Handle._run = _handle_run
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+loop_monitor = LoopMonitor()
+
+EVENT_LOOP_LAG_RECENT.labels("0.5").set_function(lambda: loop_monitor.percentile(0.5))
+EVENT_LOOP_LAG_RECENT.labels("0.99").set_function(lambda: loop_monitor.percentile(0.99))
+EVENT_LOOP_LAG_RECENT.labels("1").set_function(lambda: loop_monitor.percentile(1.0))
+
+
+class LoopMonitorMiddleware:
+    """Pure ASGI middleware tagging each request's tasks with its scope.
+
+    Slow-callback reports read it back from the blocked task's context to
+    name the route responsible.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
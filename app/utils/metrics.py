@@ -0,0 +1,440 @@
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Default latency buckets (seconds), tuned for a chat app where most
+# requests should finish in a few milliseconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    # Prometheus text format: integers without a trailing ".0"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # Value is read from the callback at scrape time (e.g. pool gauges)
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return float(self.function())
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Non-cumulative counts; they are accumulated only when scraped
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    """Base class for a metric family, optionally split by labels.
+
+    Children are created on first use and cached, so callers on hot paths
+    can keep a reference to ``metric.labels(...)`` and skip the lookup.
+    Everything runs on the worker's event loop thread, so no locking is done.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._unlabelled = self._new_child()
+            self._children[()] = self._unlabelled
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values: str) -> None:
+        # Drop a label set so per-room series don't accumulate forever
+        self._children.pop(values, None)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.value += amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._unlabelled.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabelled.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._unlabelled.set_function(function)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled.observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames + ("le",), values + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """Holds all metric families and renders them in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        return "\n".join(metric.expose() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()# Process-wide metrics registry
+
+
+# HTTP
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route template and status code",
+    ("method", "route", "status"),
+))
+
+# WebSocket
+WS_ACTIVE_CONNECTIONS = registry.register(Gauge(
+    "ws_active_connections",
+    "Open WebSocket connections per room",
+    ("room_id",),
+))
+WS_MESSAGES_RECEIVED = registry.register(Counter(
+    "ws_messages_received_total",
+    "Chat messages received from WebSocket clients",
+))
+WS_MESSAGES_BROADCAST = registry.register(Counter(
+    "ws_messages_broadcast_total",
+    "Messages broadcast to a room",
+))
+WS_FRAMES_SENT = registry.register(Counter(
+    "ws_frames_sent_total",
+    "Frames delivered to individual sockets by broadcasts",
+))
+WS_SEND_FAILURES = registry.register(Counter(
+    "ws_send_failures_total",
+    "Failed sends to WebSocket clients",
+))
+WS_BROADCAST_DURATION = registry.register(Histogram(
+    "ws_broadcast_duration_seconds",
+    "Time to fan a broadcast out to every socket in a room",
+))
+WS_TYPING_EVENTS = registry.register(Counter(
+    "ws_typing_events_total",
+    "Typing events received from clients by outcome (accepted/throttled)",
+    ("result",),
+))
+WS_EPHEMERAL_DROPPED = registry.register(Counter(
+    "ws_ephemeral_frames_dropped_total",
+    "Ephemeral frames (typing) skipped because the socket was busy",
+))
+WS_RATE_LIMITED = registry.register(Counter(
+    "ws_rate_limited_total",
+    "Chat messages rejected by the token-bucket limiter, by scope (user/room)",
+    ("scope",),
+))
+WS_RATE_LIMIT_BUCKETS = registry.register(Gauge(
+    "ws_rate_limit_buckets",
+    "Token buckets currently tracked, by scope (user/room)",
+    ("scope",),
+))
+WS_RESYNCS = registry.register(Counter(
+    "ws_resyncs_total",
+    "Reconnect resyncs by where the missed messages came from (memory/database/current)",
+    ("source",),
+))
+WS_RESYNC_MESSAGES = registry.register(Counter(
+    "ws_resync_messages_total",
+    "Missed messages replayed to reconnecting clients",
+))
+DIRECT_MESSAGES_SENT = registry.register(Counter(
+    "direct_messages_sent_total",
+    "Direct messages stored and handed to delivery",
+))
+WS_REDIRECTS = registry.register(Counter(
+    "ws_redirects_total",
+    "Sockets sent to the worker that owns their room (cluster mode)",
+))
+CLUSTER_MEMBERS = registry.register(Gauge(
+    "cluster_members",
+    "Live workers in the room ownership ring (cluster mode)",
+))
+
+# Event loop
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer that was due (scheduling lag)",
+))
+EVENT_LOOP_LAG_RECENT = registry.register(Gauge(
+    "event_loop_lag_recent_seconds",
+    "Scheduling lag percentiles over the last LOOP_LAG_WINDOW samples",
+    ("quantile",),
+))
+EVENT_LOOP_SLOW_CALLBACKS = registry.register(Counter(
+    "event_loop_slow_callbacks_total",
+    "Callbacks that blocked the loop past LOOP_SLOW_CALLBACK_MS, by route or coroutine",
+    ("source",),
+))
+
+# Database pool
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the SQLAlchemy pool, by pool (primary/replica)",
+    ("pool",),
+))
+DB_POOL_OVERFLOW = registry.register(Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is filling), by pool",
+    ("pool",),
+))
+DB_POOL_WAIT = registry.register(Histogram(
+    "db_pool_wait_seconds",
+    "Time spent acquiring a connection from the SQLAlchemy pool, by pool",
+    ("pool",),
+))
+DB_READ_SESSIONS = registry.register(Counter(
+    "db_read_sessions_total",
+    "Read-only request sessions by the database they were routed to (primary/replica)",
+    ("target",),
+))
+LISTEN_RECONNECTS = registry.register(Counter(
+    "db_listen_reconnects_total",
+    "Times a LISTEN connection was lost and re-established, by channel",
+    ("channel",),
+))
+
+# Caches
+USER_CACHE_LOOKUPS = registry.register(Counter(
+    "user_cache_lookups_total",
+    "User identity cache lookups by key type and result (hit/miss)",
+    ("key", "result"),
+))
+USER_CACHE_SIZE = registry.register(Gauge(
+    "user_cache_size",
+    "Entries currently held in the user identity cache",
+))
+
+# Read state
+READ_STATE_PENDING = registry.register(Gauge(
+    "read_state_pending",
+    "Read watermarks waiting for the next batched flush",
+))
+READ_STATE_FLUSHED = registry.register(Counter(
+    "read_state_rows_flushed_total",
+    "Read watermark rows written to room_read_states",
+))
+
+# Content filter
+CONTENT_FILTER_TERMS = registry.register(Gauge(
+    "content_filter_terms",
+    "Terms in the compiled content filter blocklist",
+))
+CONTENT_FILTER_MATCHES = registry.register(Counter(
+    "content_filter_matches_total",
+    "Messages that matched the content filter, by action (mask/reject)",
+    ("action",),
+))
+CONTENT_FILTER_RELOADS = registry.register(Counter(
+    "content_filter_reloads_total",
+    "Times the content filter blocklist was (re)compiled",
+))
+
+# Attachments
+ATTACHMENT_UPLOADS = registry.register(Counter(
+    "attachment_uploads_total",
+    "Attachment uploads by outcome (stored/deduplicated)",
+    ("result",),
+))
+ATTACHMENT_UPLOAD_BYTES = registry.register(Counter(
+    "attachment_upload_bytes_total",
+    "Bytes received in attachment uploads, deduplicated ones included",
+))
+
+# Retention
+RETENTION_DELETED = registry.register(Counter(
+    "retention_messages_deleted_total",
+    "Messages deleted by the retention pruner",
+))
+RETENTION_LAST_RUN_ROWS = registry.register(Gauge(
+    "retention_last_run_rows",
+    "Messages deleted by the last retention run (would be deleted, in dry-run)",
+))
+RETENTION_BATCH_DURATION = registry.register(Histogram(
+    "retention_batch_duration_seconds",
+    "Duration of one retention delete batch (one transaction)",
+))
+
+
+def _route_label(scope) -> str:
+    # Use the route template (/chat/room/{room_id}) rather than the raw path
+    # so the number of series stays bounded.
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route HTTP latency.
+
+    Written against the raw ASGI interface instead of BaseHTTPMiddleware so
+    it adds only a couple of function calls per request.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], _route_label(scope), str(status_code)
+            ).observe(perf_counter() - start)
@@ -0,0 +1,9 @@
+from fastapi.templating import Jinja2Templates
+
+from app.utils.assets import static_url
+
+templates = Jinja2Templates(directory="app/templates")
+# Shared Jinja2 environment for every router, so templates are compiled once
+
+templates.env.globals["static_url"] = static_url
+# {{ static_url('css/style.css') }} -> fingerprinted, long-cached URL
@@ -0,0 +1,107 @@
+"""Multi-term matching with an Aho-Corasick automaton.
+
+All terms are compiled into one trie with failure links, so a text is
+scanned once, one transition per character (amortised), whatever the
+number of terms; a list of regexes tried one after the other costs a pass
+per term instead. Matching is case-insensitive and respects word
+boundaries where the term itself starts or ends with a word character:
+``spam`` matches "Spam!" but not "spammer", ``spam.example`` matches
+"http://www.spam.example/x" but not "notspam.example".
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _fold(text: str) -> str:
+    # Lower-case without changing the length, so positions map back to text
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+def _word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TermMatcher:
+    def __init__(self, terms: Iterable[str]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out = [0]
+        # out[state]: length of the term ending at state (0 = none)
+        self.terms = 0
+        for term in terms:
+            term = _fold(term.strip())
+            if not term:
+                continue
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            if not out[state]:
+                self.terms += 1
+            out[state] = len(term)
+
+        fail = [0] * len(goto)
+        link = [0] * len(goto)
+        # link[state]: nearest state on the failure chain that ends a term
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                back = fail[state]
+                while back and ch not in goto[back]:
+                    back = fail[back]
+                back = goto[back].get(ch, 0)
+                fail[nxt] = back
+                link[nxt] = back if out[back] else link[back]
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._link = link
+
+    def __len__(self) -> int:
+        return self.terms
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        # (start, end) of the longest term ending at each position that sits
+        # on word boundaries
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        folded = _fold(text)
+        size = len(folded)
+        state = 0
+        for i, ch in enumerate(folded):
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            match = state if out[state] else link[state]
+            while match:
+                start, end = i + 1 - out[match], i + 1
+                if ((start == 0 or not (_word(folded[start]) and _word(folded[start - 1])))
+                        and (end == size or not (_word(ch) and _word(folded[end])))):
+                    yield start, end
+                    break
+                match = link[match]
+
+    def search(self, text: str) -> Optional[Tuple[int, int]]:
+        """Span of the first match in ``text``, None when nothing matches."""
+        return next(self._matches(text), None)
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """Spans of all matches in ``text``, overlapping ones merged, in order."""
+        merged: List[Tuple[int, int]] = []
+        for start, end in self._matches(text):
+            # Ends only grow, so a new match can only overlap the last span
+            while merged and merged[-1][1] > start:
+                start = min(start, merged.pop()[0])
+            merged.append((start, end))
+        return merged
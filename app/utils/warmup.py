@@ -0,0 +1,82 @@
+from time import perf_counter
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from sqlalchemy import select, text
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.services.chat_state import chat_state
+from app.utils.templating import templates
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_pool(count: int) -> int:
+    """Open ``count`` pool connections concurrently and return them to the pool.
+
+    Pays TCP/TLS setup, authentication and the first pre-ping now instead
+    of on the first requests after a deploy.
+    """
+    count = min(count, engine.sync_engine.pool.size())
+    connections = await asyncio.gather(*(engine.connect() for _ in range(count)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections))
+    return count
+
+
+def precompile_templates() -> int:
+    """Compile every template into the shared Jinja2 environment's cache."""
+    names = templates.env.list_templates()
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+
+async def warm_room_cache(limit: int) -> int:
+    """Load the room list validator and the newest rooms' page validators."""
+    async with AsyncSessionLocal() as db:
+        await chat_state.directory_state(db)
+        result = await db.execute(
+            select(ChatRoom.id).order_by(ChatRoom.created_at.desc()).limit(limit))
+        room_ids = [str(room_id) for room_id in result.scalars()]
+        for room_id in room_ids:
+            await chat_state.room_state(db, room_id)
+    return len(room_ids)
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Run the startup warm-up and flip the app to ready when it is done.
+
+    Runs as a background task so the server accepts connections (and
+    answers /ready with 503) while warming; failures are retried with
+    backoff rather than crashing the worker.
+    """
+    delay = 1.0
+    while True:
+        start = perf_counter()
+        try:
+            if settings.TEMPLATE_PRECOMPILE:
+                templates_compiled = precompile_templates()
+            else:
+                templates_compiled = 0
+            connections = 0
+            if settings.DB_POOL_WARM_CONNECTIONS > 0:
+                connections = await warm_pool(settings.DB_POOL_WARM_CONNECTIONS)
+            rooms = await warm_room_cache(settings.WARM_ROOM_STATES)
+        except Exception:
+            logger.exception("Warm-up failed, retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+
+        app.state.ready = True
+        logger.info(
+            "Ready in %.0f ms (%d pool connections, %d templates, %d rooms warmed)",
+            (perf_counter() - start) * 1000, connections, templates_compiled, rooms,
+        )
+        return
@@ -1,21 +1,66 @@
 import json
-import uuid
 from datetime import datetime
 import logging
+import uuid
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.websockets import WebSocketState
 
+from app.config import settings
 from app.database.session import get_db
 from app.websocket.manager import manager
+from app.websocket.rate_limit import message_limits
+from app.websocket.resync import message_frame, recent_messages, replay
+from app.websocket.typing_indicators import typing_coalescer
+from app.services.attachments import AttachmentRef, get_attachment
 from app.services.chat_service import create_message
-from app.models.user import User
+from app.services.chat_state import chat_state
+from app.services.cluster import cluster
+from app.services.read_state import read_watermarks
+from app.services.user_cache import get_user_identity
+from app.utils.metrics import WS_MESSAGES_RECEIVED
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _control_frame(data: str) -> dict | None:
+    # A JSON control frame ({"type": ...}), None for anything else (plain
+    # messages that merely start with "{" are still chat messages)
+    if not data.startswith("{"):
+        return None
+    try:
+        frame = json.loads(data)
+    except ValueError:
+        return None
+    return frame if isinstance(frame, dict) and "type" in frame else None
+
+
+def _seq(value) -> int | None:
+    # A non-negative seq from a query parameter or control frame
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seq if seq >= 0 else None
+
+
+async def _own_attachment(db: AsyncSession, frame: dict, user_id: str, room_id: str) -> AttachmentRef | None:
+    # Only files the sender uploaded to this room can be posted in it
+    attachment = await get_attachment(db, str(frame.get("attachment_id")))
+    if attachment is None or str(attachment.user_id) != user_id or str(attachment.room_id) != room_id:
+        return None
+    return AttachmentRef(attachment.id, attachment.filename, attachment.size, attachment.content_type)
+
+
+def _mark_read(user_id: str, room_id: str) -> None:
+    # Everything broadcast while the socket was open has been seen
+    state = chat_state.cached_room_state(room_id)
+    if state is not None:
+        read_watermarks.mark(user_id, room_id, state.count)
+
+
 @router.websocket("/ws/chat/{room_id}")
 async def websocket_chat(
     websocket: WebSocket,
@@ -33,28 +78,58 @@ async def websocket_chat(
 
     3. db: Database session (has a default value, use Depends)
     """
+    # Worker is shutting down: hand the client a jittered reconnect delay
+    if not manager.accepting:
+        await manager.reject(
+            websocket,
+            settings.DRAIN_RECONNECT_MIN_MS,
+            settings.DRAIN_RECONNECT_WINDOW_MS,
+        )
+        return
+
+    # One spelling per room: the id keys the broadcast sets, ownership
+    # hashing, caches and metric labels (/ws/chat/<UPPERCASE> is the same room)
+    try:
+        room_id = str(uuid.UUID(room_id))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    # Room owned by another worker: send the client there
+    if settings.CLUSTER_ENABLED:
+        owner_url = cluster.owner_url(room_id)
+        if owner_url is not None:
+            await manager.redirect(websocket, owner_url)
+            return
+
     # Get user ID
     user_id = websocket.query_params.get("user_id")
+    last_seq = _seq(websocket.query_params.get("last_seq"))
+    # Last message the client has (reconnects), None for a fresh join
     
     if not user_id:
         await websocket.close(code=1008)
         return
 
-    try:
-        user_uuid = uuid.UUID(user_id)
-    except ValueError:
+    # Validate user (served from the identity cache after the first lookup)
+    user = await get_user_identity(db, user_id)
+    if not user:
         await websocket.close(code=1008)
         return
 
-    # Validate user
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user = result.scalars().first()
-    if not user:
+    # Validate room (its message count is the user's read watermark)
+    room_state = await chat_state.room_state(db, room_id)
+    if room_state is None:
         await websocket.close(code=1008)
         return
+    read_watermarks.mark(user_id, room_id, room_state.count)
+
+    # End the lookup's transaction so the socket doesn't hold a pooled
+    # connection while it idles; create_message checks one out per message
+    await db.close()
 
     # Connection manager
-    await manager.connect(room_id, websocket)
+    await manager.connect(room_id, websocket, user_id)
     
     # Send a welcome message to the connected user
     await manager.send_personal_json(websocket, {
@@ -70,6 +145,11 @@ async def websocket_chat(
         "timestamp": datetime.now().isoformat()
     }, exclude_websocket=websocket)
 
+    # Messages posted while the client was away, after it is registered
+    # so nothing broadcast in between is lost (the client drops repeats)
+    if last_seq is not None:
+        await replay(websocket, db, room_id, last_seq)
+
     try:
         while True:
             data = await websocket.receive_text()
@@ -85,31 +165,106 @@ async def websocket_chat(
             # Skip system message formats
             if data.startswith("[System]"): # or data.startswith("{") 
                 continue
-            
-            # Create a message record
-            msg = await create_message(db, room_id, user_id, data)
-
-            # Broadcast to all users
-            broadcast_data = {
-                "type": "message",
-                "user_id": str(user.id),
-                "username": user.username,
-                "content": msg.content,
-                "created_at": msg.created_at.isoformat() if msg.created_at else None,
-            }
-            
-            await manager.broadcast_json(room_id, broadcast_data)
+
+            # Ephemeral control frames ({"type": "typing"}) are never stored
+            frame = _control_frame(data)
+            kind = frame["type"] if frame else None
+            if kind == "typing":
+                typing_coalescer.typing(room_id, user_id, user.username)
+                continue
+
+            # Client noticed a gap in seq numbers: send what it is missing.
+            # Each replay is a range query plus up to RESYNC_MAX_MESSAGES
+            # frames, so it costs a token from the sender's bucket
+            if kind == "resync":
+                last_seq = _seq(frame.get("last_seq"))
+                if last_seq is None:
+                    continue
+                limited = message_limits.check_user(user_id)
+                if limited is None:
+                    await replay(websocket, db, room_id, last_seq)
+                    continue
+            else:
+                WS_MESSAGES_RECEIVED.inc()
+
+                # Token buckets per user and per room, before any DB work
+                limited = message_limits.check(room_id, user_id)
+
+            if limited is not None:
+                scope, retry_after = limited
+                if message_limits.should_warn(user_id, retry_after):
+                    await manager.send_personal_json(websocket, {
+                        "type": "slow_down",
+                        "scope": scope,
+                        "retry_after_ms": int(retry_after * 1000) + 1,
+                    })
+                continue
+
+            # A JSON frame of a type this server doesn't know (a newer
+            # client, or someone typing JSON) is refused, not stored as text
+            if kind not in (None, "attachment"):
+                await manager.send_personal_json(websocket, {
+                    "type": "error",
+                    "message": "Unsupported frame type",
+                })
+                continue
+
+            typing_coalescer.stopped(room_id, user_id)
+
+            # {"type": "attachment", "attachment_id": ..., "content": caption}
+            # posts a file uploaded to /chat/room/{room_id}/attachments
+            attachment = None
+            if kind == "attachment":
+                attachment = await _own_attachment(db, frame, user_id, room_id)
+                if attachment is None:
+                    await manager.send_personal_json(websocket, {
+                        "type": "error",
+                        "message": "Unknown attachment",
+                    })
+                    continue
+                caption = frame.get("content")
+                data = caption if isinstance(caption, str) else ""
+
+            # Tracked as in flight so a drain lets it finish before closing
+            async with manager.write():
+                # Create a message record; a refused one (blocked content,
+                # too long) gets an error frame rather than closing the socket
+                try:
+                    msg = await create_message(db, room_id, user_id, data, attachment)
+                except HTTPException as e:
+                    await manager.send_personal_json(websocket, {
+                        "type": "error",
+                        "message": e.detail,
+                    })
+                    continue
+
+                # Broadcast to all users, and keep the frame for clients
+                # that reconnect having missed it
+                broadcast_data = message_frame(
+                    user.id, user.username, msg.content, msg.created_at, msg.seq, attachment)
+                recent_messages.remember(room_id, broadcast_data)
+                
+                await manager.broadcast_json(room_id, broadcast_data)
 
     except WebSocketDisconnect:
         manager.disconnect(room_id, websocket)
+        _mark_read(user_id, room_id)
+        typing_coalescer.stopped(room_id, user_id)
         
-        # Notify other users that someone has left
-        await manager.broadcast_json(room_id, {
-            "type": "system",
-            "message": f"{user.username} has left the chat",
-            "timestamp": datetime.now().isoformat()
-        })
+        # Notify other users that someone has left (not when this server
+        # closed the socket: a drain, where everyone is being disconnected
+        # anyway, or a redirect to the room's new owner)
+        if manager.accepting and websocket.application_state != WebSocketState.DISCONNECTED:
+            await manager.broadcast_json(room_id, {
+                "type": "system",
+                "message": f"{user.username} has left the chat",
+                "timestamp": datetime.now().isoformat()
+            })
         
     except Exception as e:
         manager.disconnect(room_id, websocket)
-        await websocket.close(code=1011)
\ No newline at end of file
+        _mark_read(user_id, room_id)
+        typing_coalescer.stopped(room_id, user_id)
+        # Already closed by the server side (e.g. drain), nothing to send
+        if websocket.application_state != WebSocketState.DISCONNECTED:
+            await websocket.close(code=1011)
\ No newline at end of file
@@ -1,77 +1,313 @@
+from contextlib import asynccontextmanager
 from typing import Dict, Set
-from datetime import datetime
+from time import monotonic, perf_counter
+import asyncio
+import json
+import logging
+import random
+import sys
+
 from fastapi import WebSocket
 
+from app.utils.metrics import (
+    WS_ACTIVE_CONNECTIONS,
+    WS_BROADCAST_DURATION,
+    WS_EPHEMERAL_DROPPED,
+    WS_FRAMES_SENT,
+    WS_MESSAGES_BROADCAST,
+    WS_REDIRECTS,
+    WS_SEND_FAILURES,
+)
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_CLOSE_CODE = 4001
+# Close code sent after a {"type": "redirect"} frame (room owned elsewhere)
+
+
+class Connection:
+    """What the manager keeps per socket.
+
+    Slotted (no per-instance dict) and with monotonic-clock floats instead
+    of datetimes, since a worker may hold 100k of these.
+    """
+
+    __slots__ = ("room_id", "user_id", "connected_at", "last_active")
+
+    def __init__(self, room_id: str, user_id: str | None, now: float) -> None:
+        self.room_id = room_id
+        self.user_id = user_id
+        self.connected_at = now  # time.monotonic() seconds, for durations only
+        self.last_active = now
+
+
 class ConnectionManager:
     def __init__(self) -> None:
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        self.connection_info: Dict[WebSocket, dict] = {}
+        self.connection_info: Dict[WebSocket, Connection] = {}
+        self.user_connections: Dict[str, Set[WebSocket]] = {}
+        # Every open socket of a user, whatever room it joined (direct messages)
+        self.accepting = True  # False once the worker starts draining
+        self._in_flight = 0  # Message writes (DB insert + broadcast) in progress
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._sending: Dict[WebSocket, int] = {}  # Sends in progress per socket (absent = none)
+        self._ephemeral_sends: Set[asyncio.Task] = set()
 
-    async def connect(self, room_id: str, websocket: WebSocket) -> None:
+    async def connect(self, room_id: str, websocket: WebSocket, user_id: str | None = None) -> None:
         await websocket.accept()
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = set()
-        self.active_connections[room_id].add(websocket)
-        
-        self.connection_info[websocket] = {
-            'room_id': room_id,
-            'connected_at': datetime.now(),
-            'last_active': datetime.now(),
-        }
+        room_id = sys.intern(room_id)
+        # Every handshake builds its own copy of the (canonical) id; keep
+        # one string per room however many sockets joined it
+        room_conns = self.active_connections.get(room_id)
+        if room_conns is None:
+            room_conns = self.active_connections[room_id] = set()
+        room_conns.add(websocket)
+
+        if user_id is not None:
+            user_id = sys.intern(str(user_id))
+            user_conns = self.user_connections.get(user_id)
+            if user_conns is None:
+                user_conns = self.user_connections[user_id] = set()
+            user_conns.add(websocket)
 
-        print(f"User connected to room {room_id}")
+        self.connection_info[websocket] = Connection(room_id, user_id, monotonic())
+
+        WS_ACTIVE_CONNECTIONS.labels(room_id).inc()
+        logger.debug("User connected to room %s", room_id)
 
     def disconnect(self, room_id: str, websocket: WebSocket) -> None:
         room_conns = self.active_connections.get(room_id)
-        if room_conns:
+        if room_conns and websocket in room_conns:
             room_conns.discard(websocket)
-            if not room_conns:
+            if room_conns:
+                WS_ACTIVE_CONNECTIONS.labels(room_id).dec()
+            else:
                 del self.active_connections[room_id]
-        
-        if websocket in self.connection_info:
-            del self.connection_info[websocket]
+                WS_ACTIVE_CONNECTIONS.remove(room_id)
+
+        info = self.connection_info.pop(websocket, None)
+        if info is not None and info.user_id is not None:
+            user_conns = self.user_connections.get(info.user_id)
+            if user_conns is not None:
+                user_conns.discard(websocket)
+                if not user_conns:
+                    del self.user_connections[info.user_id]
 
-        print(f"User disconnected from room {room_id}")
+        logger.debug("User disconnected from room %s", room_id)
 
     async def send_personal_message(self, websocket: WebSocket, message: str) -> None:
         try:
             await websocket.send_text(message)
         except Exception as e:
-            print(f"Failed to send personal message: {e}")
+            WS_SEND_FAILURES.inc()
+            logger.warning("Failed to send personal message: %s", e)
 
     async def send_personal_json(self, websocket: WebSocket, data: dict) -> None:
         try:
             await websocket.send_json(data)
         except Exception as e:
-            print(f"Failed to send personal JSON: {e}")
+            WS_SEND_FAILURES.inc()
+            logger.warning("Failed to send personal JSON: %s", e)
 
     async def broadcast(self, room_id: str, message: str, exclude_websocket: WebSocket = None) -> None:
         """Broadcast a text message to a room; can exclude a specific connection."""
         connections = list(self.active_connections.get(room_id, set()))
-        
+        start = perf_counter()
+        sent = 0
+
         for connection in connections:
             if exclude_websocket and connection == exclude_websocket:
                 continue
+            self._begin_send(connection)
             try:
                 await connection.send_text(message)
+                sent += 1
             except Exception:
+                WS_SEND_FAILURES.inc()
                 self.disconnect(room_id, connection)
+            finally:
+                self._end_send(connection)
+
+        WS_MESSAGES_BROADCAST.inc()
+        WS_FRAMES_SENT.inc(sent)
+        WS_BROADCAST_DURATION.observe(perf_counter() - start)
 
     async def broadcast_json(self, room_id: str, data: dict, exclude_websocket: WebSocket = None) -> None:
         """Broadcast JSON data to a room; can exclude a specific connection."""
         connections = list(self.active_connections.get(room_id, set()))
-        
+        start = perf_counter()
+        sent = 0
+
         for connection in connections:
             if exclude_websocket and connection == exclude_websocket:
                 continue
+            self._begin_send(connection)
             try:
                 await connection.send_json(data)
+                sent += 1
             except Exception:
+                WS_SEND_FAILURES.inc()
                 self.disconnect(room_id, connection)
+            finally:
+                self._end_send(connection)
+
+        WS_MESSAGES_BROADCAST.inc()
+        WS_FRAMES_SENT.inc(sent)
+        WS_BROADCAST_DURATION.observe(perf_counter() - start)
+
+    async def send_to_user(self, user_id: str, data: dict) -> int:
+        """Send JSON data to every socket of a user; returns how many got it."""
+        sent = 0
+        for connection in list(self.user_connections.get(str(user_id), ())):
+            self._begin_send(connection)
+            try:
+                await connection.send_json(data)
+                sent += 1
+            except Exception:
+                WS_SEND_FAILURES.inc()
+                info = self.connection_info.get(connection)
+                if info is not None:
+                    self.disconnect(info.room_id, connection)
+            finally:
+                self._end_send(connection)
+        WS_FRAMES_SENT.inc(sent)
+        return sent
+
+    def _begin_send(self, websocket: WebSocket) -> None:
+        # Counted, not a set: a chat frame and a typing frame can be in
+        # flight on the same socket, and the first to finish must not mark
+        # the socket idle while the other is still being sent
+        self._sending[websocket] = self._sending.get(websocket, 0) + 1
+
+    def _end_send(self, websocket: WebSocket) -> None:
+        remaining = self._sending.pop(websocket, 1) - 1
+        if remaining > 0:
+            self._sending[websocket] = remaining
+
+    def send_ephemeral(self, room_id: str, data: dict) -> None:
+        """Best-effort fan-out for ephemeral events (typing indicators).
+
+        The frame is encoded once and sent to every socket concurrently
+        without waiting. Sockets still busy with an earlier send are
+        skipped, so a slow client drops these frames before chat messages
+        queue up behind them.
+        """
+        message = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        for connection in self.active_connections.get(room_id, ()):
+            if connection in self._sending:
+                WS_EPHEMERAL_DROPPED.inc()
+                continue
+            self._begin_send(connection)
+            task = asyncio.create_task(self._send_ephemeral(connection, message))
+            self._ephemeral_sends.add(task)
+            task.add_done_callback(self._ephemeral_sends.discard)
+
+    async def _send_ephemeral(self, websocket: WebSocket, message: str) -> None:
+        try:
+            await websocket.send_text(message)
+            WS_FRAMES_SENT.inc()
+        except Exception:
+            WS_SEND_FAILURES.inc()
+        finally:
+            self._end_send(websocket)
 
     def update_activity(self, websocket: WebSocket):
-        if websocket in self.connection_info:
-            self.connection_info[websocket]['last_active'] = datetime.now()
+        info = self.connection_info.get(websocket)
+        if info is not None:
+            info.last_active = monotonic()
+
+    @asynccontextmanager
+    async def write(self):
+        """Mark a message write in progress so drain() can wait for it."""
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    @staticmethod
+    def reconnect_hint(min_delay_ms: int, window_ms: int) -> dict:
+        """Control frame telling a client when to reconnect.
+
+        Each client gets its own random delay in the window so a restart
+        spreads reconnects out instead of having them arrive in lock-step.
+        """
+        return {
+            "type": "reconnect",
+            "after_ms": random.randint(min_delay_ms, max(min_delay_ms, window_ms)),
+        }
+
+    async def reject(self, websocket: WebSocket, min_delay_ms: int, window_ms: int) -> None:
+        """Turn away a handshake while draining, with a reconnect hint."""
+        await websocket.accept()
+        await self.send_personal_json(websocket, self.reconnect_hint(min_delay_ms, window_ms))
+        await websocket.close(code=1013)  # Try Again Later
+
+    async def redirect(self, websocket: WebSocket, url: str, accept: bool = True) -> None:
+        """Send the client to the worker that owns its room."""
+        if accept:
+            await websocket.accept()
+        WS_REDIRECTS.inc()
+        await self.send_personal_json(websocket, {"type": "redirect", "url": url})
+        try:
+            await websocket.close(code=REDIRECT_CLOSE_CODE)
+        except Exception:
+            pass
+
+    async def rehome(self, owner_url) -> int:
+        """Redirect sockets of rooms now owned by another worker.
+
+        ``owner_url(room_id)`` returns the owner's URL, or None for rooms
+        this worker still owns. Returns the number of sockets moved.
+        """
+        moved = []
+        for room_id in list(self.active_connections):
+            url = owner_url(room_id)
+            if url is not None:
+                moved.extend((room_id, websocket, url) for websocket in self.active_connections[room_id])
+
+        async def move(room_id: str, websocket: WebSocket, url: str) -> None:
+            await self.redirect(websocket, url, accept=False)
+            self.disconnect(room_id, websocket)
+
+        await asyncio.gather(*(move(*entry) for entry in moved))
+        if moved:
+            logger.info("Redirected %d sockets to their rooms' new owners", len(moved))
+        return len(moved)
+
+    async def drain(self, min_delay_ms: int, window_ms: int, timeout: float) -> None:
+        """Shut the worker's sockets down gracefully.
+
+        1. Stop accepting new sockets (handshakes get a reconnect hint).
+        2. Wait up to ``timeout`` seconds for in-flight message writes.
+        3. Send every client a jittered reconnect hint and close it with
+           1012 (Service Restart).
+        """
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Drain timed out with %d message writes in flight", self._in_flight)
+
+        async def close(room_id: str, websocket: WebSocket) -> None:
+            await self.send_personal_json(websocket, self.reconnect_hint(min_delay_ms, window_ms))
+            try:
+                await websocket.close(code=1012)
+            except Exception:
+                pass
+            self.disconnect(room_id, websocket)
+
+        sockets = [
+            (room_id, websocket)
+            for room_id, websockets in self.active_connections.items()
+            for websocket in websockets
+        ]
+        await asyncio.gather(*(close(room_id, websocket) for room_id, websocket in sockets))
+        logger.info("Drained %d WebSocket connections", len(sockets))
 
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -0,0 +1,119 @@
+"""In-memory token buckets for chat messages, per user and per room.
+
+Each bucket refills at ``rate`` tokens per second up to ``burst``; a chat
+message costs one token from the sender's bucket and one from the room's.
+Checked in the WebSocket receive loop before ``create_message``, so a
+client flooding frames gets ``{"type": "slow_down", ...}`` back instead of
+a database write and a room-wide broadcast per frame.
+"""
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import WS_RATE_LIMITED, WS_RATE_LIMIT_BUCKETS
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    """Token buckets keyed by an id; ``rate`` <= 0 disables the limiter."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._prune_at = 1024
+        # Full buckets are dropped once the dict grows past this size
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self._prune_at:
+                self._prune(now)
+            bucket = self.buckets[key] = TokenBucket(self.burst, now)
+            return bucket
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely is the same as no bucket
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if bucket.tokens + (now - bucket.updated) * self.rate < self.burst
+        }
+        self._prune_at = max(1024, 2 * len(self.buckets))
+
+    def wait_time(self, key: str, now: float) -> float:
+        """Seconds until ``key`` has a token (0 if it has one now)."""
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._bucket(key, now)
+        return 0.0 if bucket.tokens >= 1 else (1 - bucket.tokens) / self.rate
+
+    def take(self, key: str) -> None:
+        if self.rate > 0:
+            self.buckets[key].tokens -= 1
+
+
+class MessageRateLimits:
+    """Sender and room limits checked together for each chat message."""
+
+    def __init__(self, user: RateLimiter, room: RateLimiter) -> None:
+        self.user = user
+        self.room = room
+        self.warned_until: Dict[str, float] = {}
+        # Per user, slow_down already sent until then (whichever limit hit)
+        self._prune_at = 1024
+
+    def check(self, room_id: str, user_id: str) -> Optional[Tuple[str, float]]:
+        """Take a token from both buckets, or return (scope, retry_after).
+
+        Tokens are only taken when both buckets have one, so a message
+        rejected by the room limit doesn't also cost the sender.
+        """
+        now = monotonic()
+        for scope, limiter, key in (("user", self.user, user_id), ("room", self.room, room_id)):
+            wait = limiter.wait_time(key, now)
+            if wait > 0:
+                WS_RATE_LIMITED.labels(scope).inc()
+                return scope, wait
+        self.user.take(user_id)
+        self.room.take(room_id)
+        return None
+
+    def check_user(self, user_id: str) -> Optional[Tuple[str, float]]:
+        """Like ``check`` with the sender's bucket only, for requests that
+        cost a query and frames back to the sender but no room broadcast
+        (resyncs)."""
+        wait = self.user.wait_time(user_id, monotonic())
+        if wait > 0:
+            WS_RATE_LIMITED.labels("user").inc()
+            return "user", wait
+        self.user.take(user_id)
+        return None
+
+    def should_warn(self, user_id: str, retry_after: float) -> bool:
+        """True once per empty period, so a flood gets one slow_down frame."""
+        now = monotonic()
+        if now < self.warned_until.get(user_id, 0.0):
+            return False
+        if len(self.warned_until) >= self._prune_at:
+            self.warned_until = {key: until for key, until in self.warned_until.items() if until > now}
+            self._prune_at = max(1024, 2 * len(self.warned_until))
+        self.warned_until[user_id] = now + retry_after
+        return True
+
+
+message_limits = MessageRateLimits(
+    RateLimiter(settings.RATE_LIMIT_USER_PER_SECOND, settings.RATE_LIMIT_USER_BURST),
+    RateLimiter(settings.RATE_LIMIT_ROOM_PER_SECOND, settings.RATE_LIMIT_ROOM_BURST),
+)
+WS_RATE_LIMIT_BUCKETS.labels("user").set_function(lambda: len(message_limits.user.buckets))
+WS_RATE_LIMIT_BUCKETS.labels("room").set_function(lambda: len(message_limits.room.buckets))
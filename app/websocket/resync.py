@@ -0,0 +1,128 @@
+"""Replay of messages a reconnecting client missed.
+
+Every message has a per-room ``seq`` (1, 2, 3, ... from the room's
+``message_count``). A client passes the last seq it has as ``last_seq``
+when it joins (or sends ``{"type": "resync", "last_seq": n}`` when it
+notices a gap), and gets only the newer messages, as ordinary message
+frames. They come from the last RESYNC_BUFFER_SIZE frames broadcast in
+the room when those cover the whole gap, otherwise from one range query
+on ``(room_id, seq)``, so a reconnect costs O(missed) rather than a reload
+of the full history.
+
+When the replay doesn't continue right after ``last_seq`` (more than
+RESYNC_MAX_MESSAGES were missed, or old messages were pruned) a
+``{"type": "resync", "after_seq": n, "truncated": ...}`` frame comes
+first, telling the client where the replay starts.
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from fastapi import WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.attachments import AttachmentRef
+from app.services.chat_service import get_messages_after
+from app.services.chat_state import chat_state
+from app.utils.metrics import WS_RESYNC_MESSAGES, WS_RESYNCS
+from app.websocket.manager import manager
+
+
+def message_frame(
+        user_id,
+        username: str,
+        content: str,
+        created_at: Optional[datetime],
+        seq: int,
+        attachment: Optional[AttachmentRef] = None) -> dict:
+    """The JSON frame a chat message is broadcast (and replayed) as."""
+    frame = {
+        "type": "message",
+        "user_id": str(user_id),
+        "username": username,
+        "content": content,
+        "created_at": created_at.isoformat() if created_at else None,
+        "seq": seq,
+    }
+    if attachment is not None:
+        frame["attachment"] = attachment.as_json()
+        # Metadata and a URL only; clients fetch the file over HTTP
+    return frame
+
+
+class RecentMessages:
+    """The last ``size`` message frames of the most recently active rooms."""
+
+    def __init__(self, size: int, max_rooms: int) -> None:
+        self.size = size
+        self.max_rooms = max_rooms
+        self.rooms: "OrderedDict[str, Deque[dict]]" = OrderedDict()
+
+    def remember(self, room_id: str, frame: dict) -> None:
+        frames = self.rooms.get(room_id)
+        if frames is None:
+            if len(self.rooms) >= self.max_rooms:
+                self.rooms.popitem(last=False)
+            frames = self.rooms[room_id] = deque(maxlen=self.size)
+        else:
+            self.rooms.move_to_end(room_id)
+        frames.append(frame)
+
+    def since(self, room_id: str, after_seq: int, latest_seq: int) -> Optional[List[dict]]:
+        """Frames after ``after_seq`` up to ``latest_seq``, None unless all are buffered.
+
+        Concurrent writers may broadcast slightly out of seq order, and
+        messages written through another worker are never buffered here,
+        so the frames are sorted and must form an unbroken run.
+        """
+        frames = self.rooms.get(room_id)
+        if not frames:
+            return None
+        missed = sorted((frame for frame in frames if frame["seq"] > after_seq), key=lambda f: f["seq"])
+        latest_seq = max(latest_seq, missed[-1]["seq"] if missed else 0)
+        if [frame["seq"] for frame in missed] != list(range(after_seq + 1, latest_seq + 1)):
+            return None
+        return missed
+
+    def forget(self, room_id: str) -> None:
+        self.rooms.pop(room_id, None)
+
+
+recent_messages = RecentMessages(settings.RESYNC_BUFFER_SIZE, settings.RESYNC_BUFFER_ROOMS)
+
+
+async def missed_frames(db: AsyncSession, room_id: str, after_seq: int) -> Tuple[List[dict], bool]:
+    """Frames of the messages after ``after_seq`` and whether older ones were cut."""
+    state = await chat_state.room_state(db, room_id)
+    latest_seq = state.count if state is not None else 0
+
+    frames = recent_messages.since(room_id, after_seq, latest_seq)
+    if frames is None and after_seq >= latest_seq:
+        frames = []  # nothing missed, whatever the buffer holds
+    if frames is not None and len(frames) <= settings.RESYNC_MAX_MESSAGES:
+        WS_RESYNCS.labels("memory" if frames else "current").inc()
+        return frames, False
+
+    messages, truncated = await get_messages_after(db, room_id, after_seq, settings.RESYNC_MAX_MESSAGES)
+    WS_RESYNCS.labels("database").inc()
+    return [
+        message_frame(m.user_id, m.username, m.content, m.created_at, m.seq, m.attachment)
+        for m in messages
+    ], truncated
+
+
+async def replay(websocket: WebSocket, db: AsyncSession, room_id: str, after_seq: int) -> None:
+    """Send ``websocket`` every message of the room after ``after_seq``."""
+    frames, truncated = await missed_frames(db, room_id, after_seq)
+    await db.close()
+    # Back to not holding a pool connection while the socket idles
+    if frames and frames[0]["seq"] != after_seq + 1:
+        await manager.send_personal_json(websocket, {
+            "type": "resync",
+            "after_seq": frames[0]["seq"] - 1,
+            "truncated": truncated,
+        })
+    for frame in frames:
+        await manager.send_personal_json(websocket, frame)
+    WS_RESYNC_MESSAGES.inc(len(frames))
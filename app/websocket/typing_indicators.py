@@ -0,0 +1,99 @@
+"""Ephemeral "user is typing" events.
+
+Typing events never touch the database. Each user is throttled to one
+accepted event per TYPING_THROTTLE_SECONDS per room, and a room's typers
+are coalesced into a single ``{"type": "typing", "users": [...]}`` frame
+at most once per TYPING_INTERVAL_SECONDS. Every connection therefore
+receives at most one typing frame per interval however many people are
+typing. The frame goes out through ``ConnectionManager.send_ephemeral``,
+which skips sockets that are still busy with an earlier send, so typing
+frames are the first thing dropped under backpressure.
+"""
+from time import monotonic
+from typing import Dict
+import asyncio
+
+from app.config import settings
+from app.utils.metrics import WS_TYPING_EVENTS
+from app.websocket.manager import ConnectionManager, manager
+
+_ACCEPTED = WS_TYPING_EVENTS.labels("accepted")
+_THROTTLED = WS_TYPING_EVENTS.labels("throttled")
+
+
+class TypingCoalescer:
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        interval: float,
+        throttle: float,
+    ) -> None:
+        self.connections = connections
+        self.interval = interval
+        self.throttle = throttle
+        self._last_accepted: Dict[str, Dict[str, float]] = {}
+        # room_id -> user_id -> when that user's last typing event was accepted
+        self._typing: Dict[str, Dict[str, str]] = {}
+        # room_id -> user_id -> username, typers waiting for the next frame
+        self._flushes: Dict[str, asyncio.TimerHandle] = {}
+        # One scheduled flush per room with pending typers
+        self._prunes: Dict[str, asyncio.TimerHandle] = {}
+        # One scheduled prune per room with throttle entries
+
+    def typing(self, room_id: str, user_id: str, username: str) -> bool:
+        """Record a typing event, return False if it was throttled."""
+        now = monotonic()
+        last = self._last_accepted.setdefault(room_id, {})
+        if now - last.get(user_id, float("-inf")) < self.throttle:
+            _THROTTLED.inc()
+            return False
+        last[user_id] = now
+        _ACCEPTED.inc()
+
+        self._typing.setdefault(room_id, {})[user_id] = username
+        if room_id not in self._flushes:
+            loop = asyncio.get_running_loop()
+            self._flushes[room_id] = loop.call_later(self.interval, self._flush, room_id)
+        return True
+
+    def stopped(self, room_id: str, user_id: str) -> None:
+        """The user sent their message (or left): don't report them as typing."""
+        typers = self._typing.get(room_id)
+        if typers:
+            typers.pop(user_id, None)
+
+    def _flush(self, room_id: str) -> None:
+        self._flushes.pop(room_id, None)
+        typers = self._typing.pop(room_id, None)
+        self._prune(room_id)
+
+        if typers:
+            self.connections.send_ephemeral(room_id, {
+                "type": "typing",
+                "users": sorted(typers.values()),
+            })
+
+    def _prune(self, room_id: str) -> None:
+        # Forget throttle entries that have expired and come back when the
+        # rest have, so a room that goes quiet doesn't keep them forever
+        handle = self._prunes.pop(room_id, None)
+        if handle is not None:
+            handle.cancel()
+        last = self._last_accepted.get(room_id)
+        if not last:
+            return
+        cutoff = monotonic() - self.throttle
+        for user_id in [u for u, t in last.items() if t <= cutoff]:
+            del last[user_id]
+        if not last:
+            del self._last_accepted[room_id]
+            return
+        loop = asyncio.get_running_loop()
+        self._prunes[room_id] = loop.call_later(max(last.values()) - cutoff, self._prune, room_id)
+
+
+typing_coalescer = TypingCoalescer(
+    manager,
+    settings.TYPING_INTERVAL_SECONDS,
+    settings.TYPING_THROTTLE_SECONDS,
+)
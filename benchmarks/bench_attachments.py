@@ -0,0 +1,146 @@
+"""Server memory while large attachments stream in and out.
+
+Starts ``app.server`` and has CONCURRENT clients upload a FILE_SIZE file
+each at the same time (streamed, chunked request bodies), then download
+them all concurrently, checking every byte through its SHA-256. The
+server's resident memory is sampled throughout; with uploads written to
+the store as they arrive and downloads read back in 64 KiB pieces it stays
+flat, while buffering a single body would already take FILE_SIZE.
+Finishes with one re-upload of the same content (deduplicated, nothing new
+on disk) and a Range request.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import List
+
+import httpx
+
+from benchmarks.common import Report, free_port, start_server
+
+CONCURRENT = 4
+FILE_SIZE = 1024 ** 3
+BLOCK = 1024 * 1024
+SAMPLE_EVERY = 0.02  # seconds
+
+
+def _rss(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+async def _sample(pid: int, samples: List[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        samples.append(_rss(pid))
+        await asyncio.sleep(SAMPLE_EVERY)
+
+
+async def _body(block: bytes):
+    for _ in range(FILE_SIZE // BLOCK):
+        yield block
+
+
+async def _phase(pid: int, work) -> tuple:
+    samples: List[int] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample(pid, samples, stop))
+    start = time.perf_counter()
+    result = await work
+    seconds = time.perf_counter() - start
+    stop.set()
+    await sampler
+    return result, max(samples), seconds
+
+
+async def _upload(client: httpx.AsyncClient, room_path: str, block: bytes) -> dict:
+    response = await client.post(
+        f"{room_path}/attachments?filename=bench.bin",
+        content=_body(block),
+        headers={"content-type": "application/octet-stream"},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _download(client: httpx.AsyncClient, url: str) -> str:
+    digest = hashlib.sha256()
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _run(report: Report, store_dir: str) -> bool:
+    port = free_port()
+    process = start_server(["app.server"], port, {
+        "ATTACHMENT_DIR": store_dir,
+        "ATTACHMENT_MAX_BYTES": str(2 * FILE_SIZE),
+        "ASSET_BUILD_ON_STARTUP": "false",
+    })
+    ok = True
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            name = "bench-" + uuid.uuid4().hex[:8]
+            await client.post("/auth/register", data={"username": name, "password": "secret1"})
+            await client.post("/auth/login", data={"username": name, "password": "secret1"})
+            await client.post("/chat/create-room", data={"name": name})
+            rooms = (await client.get("/chat/rooms")).text
+            room_id = rooms.split("/chat/room/")[-1][:36]
+            room_path = f"/chat/room/{room_id}"
+
+            blocks = [os.urandom(BLOCK) for _ in range(CONCURRENT)]
+            expected = []
+            for block in blocks:
+                digest = hashlib.sha256()
+                for _ in range(FILE_SIZE // BLOCK):
+                    digest.update(block)
+                expected.append(digest.hexdigest())
+
+            baseline = _rss(process.pid)
+            uploads, upload_peak, upload_seconds = await _phase(process.pid, asyncio.gather(
+                *(_upload(client, room_path, block) for block in blocks)))
+            digests, download_peak, download_seconds = await _phase(process.pid, asyncio.gather(
+                *(_download(client, upload["url"]) for upload in uploads)))
+            ok &= digests == expected
+
+            before = sum(len(files) for _, _, files in os.walk(store_dir))
+            await _upload(client, room_path, blocks[0])
+            ok &= sum(len(files) for _, _, files in os.walk(store_dir)) == before
+
+            response = await client.get(uploads[0]["url"], headers={"range": f"bytes={BLOCK}-{BLOCK + 99}"})
+            ok &= response.status_code == 206 and response.content == blocks[0][:100]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    total = CONCURRENT * FILE_SIZE
+    report.add("server RSS before", baseline / 2 ** 20, "MiB")
+    report.add("peak RSS growth while uploading", (upload_peak - baseline) / 2 ** 20, "MiB")
+    report.add("peak RSS growth while downloading", (download_peak - baseline) / 2 ** 20, "MiB")
+    report.add("bytes transferred per direction", total / 2 ** 20, "MiB")
+    report.add("upload throughput", total / upload_seconds / 2 ** 20, "MiB/s")
+    report.add("download throughput", total / download_seconds / 2 ** 20, "MiB/s")
+    return ok
+
+
+def main() -> None:
+    report = Report(f"Attachments, {CONCURRENT} concurrent x {FILE_SIZE / 2 ** 30:.0f} GiB")
+    store_dir = tempfile.mkdtemp(prefix="bench-attachments-")
+    try:
+        ok = asyncio.run(_run(report, store_dir))
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    report.print()
+    print(f"\n  content intact, re-upload deduplicated, range served: {'yes' if ok else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Room placement across worker processes.
+
+Starts WORKERS ``app.server`` processes and connects CLIENTS_PER_ROOM
+sockets to each of ROOMS rooms, each socket to a random worker, then
+sends MESSAGES_PER_ROOM chat messages per room. Without ownership a
+room's sockets end up spread over several workers, and a broadcast only
+reaches the ones on the sender's worker; reports the cross-process
+forwards each message would need (workers holding the room minus one)
+and the share of room members that actually got it. With
+CLUSTER_ENABLED the handshake is redirected to the room's owner, so
+every room lives on one worker.
+"""
+import asyncio
+import json
+import random
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+import httpx
+from sqlalchemy import select
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message  # noqa: F401 (registers the mapper)
+from app.models.user import User
+
+from benchmarks.common import Report, free_port, start_server
+
+WORKERS = 3
+ROOMS = 30
+CLIENTS_PER_ROOM = 6
+MESSAGES_PER_ROOM = 5
+
+
+async def _seed() -> Tuple[str, List[str]]:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+        if user is None:
+            user = User(username="bench-user", password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        rooms = []
+        for i in range(ROOMS):
+            name = f"bench-cluster-{i}"
+            room = (await db.execute(select(ChatRoom).where(ChatRoom.name == name))).scalars().first()
+            if room is None:
+                room = ChatRoom(name=name)
+                db.add(room)
+                await db.commit()
+                await db.refresh(room)
+            rooms.append(str(room.id))
+    await engine.dispose()
+    return str(user.id), rooms
+
+
+async def _wait_for_members(ports: List[int]) -> None:
+    async with httpx.AsyncClient(timeout=5) as client:
+        for port in ports:
+            while True:
+                text = (await client.get(f"http://127.0.0.1:{port}/metrics")).text
+                if f"\ncluster_members {WORKERS}\n" in text:
+                    break
+                await asyncio.sleep(0.1)
+
+
+class Client:
+    def __init__(self, base: str, path: str) -> None:
+        self.base = base
+        self.path = path
+        self.received = 0
+        self.redirects = 0
+        self.ready = asyncio.Event()
+        self.ws = None
+
+    async def run(self) -> None:
+        while True:
+            redirect = None
+            async with connect(self.base + self.path, max_queue=None) as ws:
+                self.ws = ws
+                try:
+                    async for frame in ws:
+                        if not frame.startswith("{"):
+                            continue
+                        data = json.loads(frame)
+                        if data.get("type") == "redirect":
+                            redirect = data["url"]
+                        elif data.get("type") == "system":
+                            self.ready.set()
+                        elif data.get("type") == "message":
+                            self.received += 1
+                except ConnectionClosed:
+                    pass
+            if redirect is None:
+                return
+            self.redirects += 1
+            self.base = redirect
+
+
+async def _placement(cluster: bool, user_id: str, rooms: List[str]) -> dict:
+    ports = [free_port() for _ in range(WORKERS)]
+    processes = []
+    for port in ports:
+        processes.append(start_server(["app.server"], port, {
+            "CLUSTER_ENABLED": str(cluster).lower(),
+            "CLUSTER_ADVERTISE_URL": f"ws://127.0.0.1:{port}",
+            "METRICS_ENDPOINT": "true",
+            "CLUSTER_HEARTBEAT_SECONDS": "0.5",
+            "RATE_LIMIT_USER_PER_SECOND": "0",
+        }))
+    rng = random.Random(42)
+    try:
+        if cluster:
+            await _wait_for_members(ports)
+        clients: Dict[str, List[Client]] = defaultdict(list)
+        tasks = []
+        for room_id in rooms:
+            for _ in range(CLIENTS_PER_ROOM):
+                client = Client(f"ws://127.0.0.1:{rng.choice(ports)}", f"/ws/chat/{room_id}?user_id={user_id}")
+                clients[room_id].append(client)
+                tasks.append(asyncio.create_task(client.run()))
+        everyone = [client for members in clients.values() for client in members]
+        await asyncio.wait_for(asyncio.gather(*(client.ready.wait() for client in everyone)), 60)
+
+        forwards = sent = 0
+        for room_id, members in clients.items():
+            workers: Set[str] = {client.base for client in members}
+            for i in range(MESSAGES_PER_ROOM):
+                await rng.choice(members).ws.send(f"bench message {i}")
+                forwards += len(workers) - 1
+                sent += 1
+        await asyncio.sleep(1.0)  # let the broadcasts arrive
+
+        received = sum(client.received for client in everyone)
+        redirects = sum(client.redirects for client in everyone)
+        for client in everyone:
+            await client.ws.close()
+        await asyncio.gather(*tasks)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {
+        "forwards": forwards / sent,
+        "delivery": received / (sent * CLIENTS_PER_ROOM),
+        "redirects": redirects / len(everyone),
+    }
+
+
+async def _run(report: Report) -> None:
+    user_id, rooms = await _seed()
+    for label, cluster in (("random worker", False), ("owner worker", True)):
+        result = await _placement(cluster, user_id, rooms)
+        report.add(f"{label}: cross-process forwards per message", result["forwards"], "msgs")
+        report.add(f"{label}: room members reached", result["delivery"] * 100, "%")
+        report.add(f"{label}: redirects per client", result["redirects"], "")
+
+
+def main() -> None:
+    report = Report(f"Room placement, {WORKERS} workers, {ROOMS} rooms x {CLIENTS_PER_ROOM} clients")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time-to-first-fast-response after a (re)start.
+
+Starts ``uvicorn app.main:app`` twice against the configured database,
+once with the startup warm-up disabled and once with it enabled, and
+measures how long it takes until the server answers a typical
+DB-backed, template-rendering request (a failed login) as fast as it
+does in steady state.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import Report
+
+STEADY_SAMPLES = 30
+FAST_FACTOR = 2.0  # "fast" = within 2x the steady-state median
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _probe(client: httpx.Client) -> float:
+    start = time.perf_counter()
+    client.post("/auth/login", data={"username": "nobody", "password": "wrong-password"})
+    return time.perf_counter() - start
+
+
+def _run_server(env_overrides: dict, use_ready: bool) -> dict:
+    port = _free_port()
+    env = {**os.environ, **env_overrides}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            while True:
+                try:
+                    response = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                listening = time.perf_counter() - started
+                if not use_ready or response.status_code == 200:
+                    break
+                time.sleep(0.005)
+            ready = time.perf_counter() - started
+
+            first_latencies = [_probe(client) for _ in range(5)]
+            steady = statistics.median(_probe(client) for _ in range(STEADY_SAMPLES))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    # First probe that was already "fast", measured from process start
+    elapsed = ready
+    first_fast = None
+    for latency in first_latencies:
+        elapsed += latency
+        if latency <= steady * FAST_FACTOR:
+            first_fast = elapsed
+            break
+
+    return {
+        "listening": listening,
+        "ready": ready,
+        "first_request": first_latencies[0],
+        "steady": steady,
+        "first_fast": first_fast if first_fast is not None else float("nan"),
+    }
+
+
+def main() -> None:
+    report = Report("Cold start")
+    modes = {
+        "no warm-up": ({"DB_POOL_WARM_CONNECTIONS": "0", "TEMPLATE_PRECOMPILE": "false", "WARM_ROOM_STATES": "0"}, False),
+        "warm-up + /ready": ({}, True),
+    }
+    for label, (overrides, use_ready) in modes.items():
+        result = _run_server(overrides, use_ready)
+        report.add(f"{label}: accepting connections", result["listening"] * 1000, "ms")
+        report.add(f"{label}: serving traffic", result["ready"] * 1000, "ms")
+        report.add(f"{label}: first request latency", result["first_request"] * 1000, "ms")
+        report.add(f"{label}: steady-state latency", result["steady"] * 1000, "ms")
+        report.add(f"{label}: time to first fast response", result["first_fast"] * 1000, "ms")
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Memory per registered WebSocket in ConnectionManager.
+
+Registers 10k and 100k fake sockets spread over ROOMS rooms, each
+handshake bringing its own copy of the room id string (as parsed from the
+URL), and measures with tracemalloc what the registry holds on to: room
+sets, per-socket records, room id strings and the per-room gauge. The
+sockets themselves are allocated before tracing starts, they cost the
+same either way. Compares the current manager with the previous layout
+(a dict with two datetimes per socket, room ids kept as given) and times
+a connect + disconnect round trip with each.
+"""
+import asyncio
+import tracemalloc
+import uuid
+from datetime import datetime
+from time import perf_counter
+
+from app.utils.metrics import WS_ACTIVE_CONNECTIONS
+from app.websocket.manager import ConnectionManager, logger
+
+from benchmarks.common import FakeWebSocket, Report
+
+SIZES = (10_000, 100_000)
+ROOMS = 1_000
+
+
+class LegacyManager(ConnectionManager):
+    """connect/disconnect as they were before the compact registry."""
+
+    async def connect(self, room_id: str, websocket) -> None:
+        await websocket.accept()
+        if room_id not in self.active_connections:
+            self.active_connections[room_id] = set()
+        self.active_connections[room_id].add(websocket)
+        self.connection_info[websocket] = {
+            'room_id': room_id,
+            'connected_at': datetime.now(),
+            'last_active': datetime.now(),
+        }
+        WS_ACTIVE_CONNECTIONS.labels(room_id).inc()
+        logger.debug("User connected to room %s", room_id)
+
+    def disconnect(self, room_id: str, websocket) -> None:
+        room_conns = self.active_connections.get(room_id)
+        if room_conns and websocket in room_conns:
+            room_conns.discard(websocket)
+            if room_conns:
+                WS_ACTIVE_CONNECTIONS.labels(room_id).dec()
+            else:
+                del self.active_connections[room_id]
+                WS_ACTIVE_CONNECTIONS.remove(room_id)
+        if websocket in self.connection_info:
+            del self.connection_info[websocket]
+        logger.debug("User disconnected from room %s", room_id)
+
+
+async def _round_trip(manager, sockets: list, rooms: list) -> None:
+    for i, websocket in enumerate(sockets):
+        await manager.connect(str(rooms[i % ROOMS]), websocket)
+        # str(UUID) makes a new string per handshake, like the URL parser
+    for i, websocket in enumerate(sockets):
+        manager.disconnect(str(rooms[i % ROOMS]), websocket)
+
+
+async def _measure(manager_class, sockets: list, rooms: list) -> tuple:
+    manager = manager_class()
+    tracemalloc.start()
+    for i, websocket in enumerate(sockets):
+        await manager.connect(str(rooms[i % ROOMS]), websocket)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for i, websocket in enumerate(sockets):
+        manager.disconnect(str(rooms[i % ROOMS]), websocket)
+
+    best = float("inf")
+    for _ in range(3):
+        # Timed separately (best of 3), tracemalloc slows every allocation down
+        start = perf_counter()
+        await _round_trip(manager_class(), sockets, rooms)
+        best = min(best, perf_counter() - start)
+    return held / len(sockets), best / len(sockets)
+
+
+async def _run(report: Report) -> None:
+    rooms = [uuid.uuid4() for _ in range(ROOMS)]
+    for size in SIZES:
+        sockets = [FakeWebSocket() for _ in range(size)]
+        for label, manager_class in (("before", LegacyManager), ("after", ConnectionManager)):
+            per_socket, seconds = await _measure(manager_class, sockets, rooms)
+            report.add(f"{size:,} sockets, {label}: memory per socket", per_socket, "bytes")
+            report.add(f"{size:,} sockets, {label}: connect + disconnect", seconds * 1e9)
+
+
+def main() -> None:
+    report = Report(f"Connection registry, {ROOMS:,} rooms")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Content filter: one automaton versus regexes, with a 10k-term blocklist.
+
+Generates TERMS blocked terms (words and domains) and MESSAGES chat
+messages of about 100 characters, one in a hundred containing a blocked
+term, then measures
+
+* compiling the list and the memory the compiled matcher holds;
+* filter throughput for the ``TermMatcher`` behind ``content_filter``,
+  for one combined regex alternation, and for a loop over one regex per
+  term (sampled, it is too slow to run on every message), at 100, 1k and
+  10k terms: the matcher's cost per message should not grow with the list;
+* ingest throughput: ``create_message`` against the configured database
+  (``DATABASE_URL``; use a throwaway database, messages go to a
+  ``bench-filter`` room) with the filter off and with 10k terms.
+"""
+import asyncio
+import random
+import re
+import string
+import time
+import tracemalloc
+
+from sqlalchemy import delete, insert, select, update
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+from app.models.user import User
+from app.services.chat_service import create_message
+from app.services.content_filter import content_filter
+from app.utils.term_matcher import TermMatcher
+
+from benchmarks.common import Report, measure
+
+TERMS = 10_000
+LIST_SIZES = (100, 1_000, 10_000)
+MESSAGES = 1_000
+REGEX_LOOP_SAMPLE = 20
+INGEST_MESSAGES = 500
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+
+
+def _data() -> tuple:
+    rng = random.Random(42)
+    terms = [_word(rng) if i % 5 else f"{_word(rng)}.example" for i in range(TERMS)]
+    vocabulary = [_word(rng) for _ in range(2_000)]
+    messages = []
+    for i in range(MESSAGES):
+        words = [rng.choice(vocabulary) for _ in range(12)]
+        if i % 100 == 0:
+            words[rng.randrange(len(words))] = rng.choice(terms)
+        messages.append(" ".join(words).capitalize() + ".")
+    return terms, messages
+
+
+def _throughput(check, messages: list) -> float:
+    # Messages per second, best of 3 passes
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for message in messages:
+            check(message)
+        best = min(best, time.perf_counter() - start)
+    return len(messages) / best
+
+
+def _filters(report: Report, terms: list, messages: list) -> None:
+    start = time.perf_counter()
+    TermMatcher(terms)
+    report.add(f"compile {TERMS:,} terms", (time.perf_counter() - start) * 1000, "ms")
+    tracemalloc.start()
+    matcher = TermMatcher(terms)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report.add(f"compiled matcher, {TERMS:,} terms", held / 2**20, "MiB")
+    report.add("masked messages", sum(1 for message in messages if matcher.spans(message)), "")
+
+    characters = sum(len(message) for message in messages) / len(messages)
+    for size in LIST_SIZES:
+        subset = terms[:size]
+        matcher = TermMatcher(subset)
+        combined = re.compile(r"\b(?:" + "|".join(map(re.escape, subset)) + r")\b", re.IGNORECASE)
+        per_term = [re.compile(r"\b" + re.escape(term) + r"\b", re.IGNORECASE) for term in subset]
+
+        rate = _throughput(matcher.spans, messages)
+        report.add(f"{size:>6,} terms: automaton", rate, "msgs/s")
+        report.add(f"{size:>6,} terms: automaton per character", 1e9 / rate / characters, "ns")
+        report.add(f"{size:>6,} terms: combined regex", _throughput(combined.findall, messages), "msgs/s")
+        report.add(f"{size:>6,} terms: regex per term", _throughput(
+            lambda message: [pattern.search(message) for pattern in per_term], messages[:REGEX_LOOP_SAMPLE],
+        ), "msgs/s")
+
+    content_filter._matcher = TermMatcher(terms)
+    report.add(f"content_filter.apply, {TERMS:,} terms", measure(lambda: content_filter.apply(messages[1]), 10_000))
+
+
+async def _ingest(report: Report, terms: list, messages: list) -> None:
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(select(User.id).where(User.username == "bench-user"))
+        if user_id is None:
+            user_id = await db.scalar(insert(User).values(username="bench-user", password="x").returning(User.id))
+        room_id = await db.scalar(select(ChatRoom.id).where(ChatRoom.name == "bench-filter"))
+        if room_id is None:
+            room_id = await db.scalar(insert(ChatRoom).values(name="bench-filter").returning(ChatRoom.id))
+        await db.execute(delete(Message).where(Message.room_id == room_id))
+        await db.execute(update(ChatRoom).where(ChatRoom.id == room_id).values(message_count=0))
+        await db.commit()
+
+    for label, matcher in (("filter off", None), (f"{TERMS:,} terms", TermMatcher(terms))):
+        content_filter._matcher = matcher
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            for message in messages[:INGEST_MESSAGES]:
+                async with AsyncSessionLocal() as db:
+                    await create_message(db, str(room_id), str(user_id), message)
+            best = min(best, time.perf_counter() - start)
+        report.add(f"create_message, {label}", INGEST_MESSAGES / best, "msgs/s")
+    content_filter._matcher = None
+    await engine.dispose()
+
+
+def main() -> None:
+    terms, messages = _data()
+    report = Report(f"Content filter, {MESSAGES:,} messages of ~{sum(map(len, messages)) // MESSAGES} characters")
+    _filters(report, terms, messages)
+    asyncio.run(_ingest(report, terms, messages))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""History read path: ORM + selectinload versus column-only rows.
+
+Seeds rooms with 1k, 10k and 100k messages in the configured database
+(``DATABASE_URL``; use a throwaway database) and compares the legacy
+query, which hydrates Message and User objects, with the lean
+``get_messages_for_room`` read path. Reports latency and peak
+traced memory per message.
+"""
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import selectinload
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+from app.models.user import User
+from app.services.chat_service import get_messages_for_room
+
+from benchmarks.common import Report
+
+ROOM_SIZES = (1_000, 10_000, 100_000)
+SEED_BATCH = 5_000
+
+
+async def _seed_room(db, user_id: uuid.UUID, size: int) -> str:
+    name = f"bench-history-{size}"
+    room = (await db.execute(select(ChatRoom).where(ChatRoom.name == name))).scalars().first()
+    if room is None:
+        room = ChatRoom(name=name)
+        db.add(room)
+        await db.commit()
+        await db.refresh(room)
+
+    existing = await db.scalar(select(func.count()).where(Message.room_id == room.id))
+    for offset in range(existing, size, SEED_BATCH):
+        rows = [
+            {"content": f"benchmark message {i}", "user_id": user_id, "room_id": room.id, "seq": i + 1}
+            for i in range(offset, min(offset + SEED_BATCH, size))
+        ]
+        await db.execute(insert(Message), rows)
+        await db.commit()
+    return str(room.id)
+
+
+async def _legacy_history(db, room_id: str):
+    stmt = (
+        select(Message)
+        .options(selectinload(Message.user))
+        .where(Message.room_id == uuid.UUID(room_id))
+        .order_by(Message.created_at)
+    )
+    messages = (await db.execute(stmt)).scalars().all()
+    # Touch what the template renders
+    return [(m.user.username, m.content, m.created_at) for m in messages]
+
+
+async def _lean_history(db, room_id: str):
+    messages = await get_messages_for_room(db, room_id)
+    return [(m.username, m.content, m.created_at) for m in messages]
+
+
+async def _timed(fn, room_id: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await fn(db, room_id)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def _peak_memory(fn, room_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        await fn(db, room_id)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+async def _run(report: Report) -> None:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+        if user is None:
+            user = User(username="bench-user", password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        rooms = {size: await _seed_room(db, user.id, size) for size in ROOM_SIZES}
+
+    for size, room_id in rooms.items():
+        for label, fn in (("orm+selectinload", _legacy_history), ("core rows", _lean_history)):
+            await _timed(fn, room_id, repeat=1)  # warm statement caches
+            latency = await _timed(fn, room_id)
+            peak = await _peak_memory(fn, room_id)
+            report.add(f"{size:>7} msgs {label} latency", latency * 1000, "ms")
+            report.add(f"{size:>7} msgs {label} peak memory/msg", peak / size, "bytes")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    report = Report("Room history read path")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
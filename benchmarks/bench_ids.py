@@ -0,0 +1,84 @@
+"""Primary keys: random (uuid4) vs time-ordered (uuid7) inserts.
+
+Inserts ROWS message-like rows, in batches of BATCH with keys generated in
+the app, into a fresh table for each scheme in the configured database
+(``DATABASE_URL``; use a throwaway database). Reports insert throughput
+overall and over the last tenth of the rows (once the index has outgrown
+the cache, random keys make most inserts read and dirty a different leaf
+page), WAL written, and the size of the primary-key index. Also times key
+generation on its own.
+"""
+import asyncio
+import uuid
+from time import perf_counter
+
+from sqlalchemy import text
+
+from app.database.session import engine
+from app.utils.ids import uuid7
+
+from benchmarks.common import Report, measure
+
+ROWS = 3_000_000
+BATCH = 10_000
+SCHEMES = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+async def _insert(name: str, make_id) -> dict:
+    table = f"bench_ids_{name}"
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(text(
+            f"CREATE TABLE {table} (id uuid PRIMARY KEY, room_id uuid NOT NULL, "
+            "content varchar NOT NULL, created_at timestamp NOT NULL DEFAULT now())"
+        ))
+    insert = text(
+        f"INSERT INTO {table} (id, room_id, content) "
+        "SELECT unnest(CAST(:ids AS uuid[])), :room, 'benchmark message'"
+    )
+    room_id = uuid.uuid4()
+    batch_seconds = []
+    async with engine.connect() as conn:
+        await conn.execute(text("CHECKPOINT"))
+        wal = (await conn.execute(text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"))).scalar_one()
+        await conn.commit()
+        for _ in range(ROWS // BATCH):
+            ids = [make_id() for _ in range(BATCH)]
+            start = perf_counter()
+            await conn.execute(insert, {"ids": ids, "room": room_id})
+            await conn.commit()
+            batch_seconds.append(perf_counter() - start)
+        wal = (await conn.execute(text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"))).scalar_one() - wal
+        index = (await conn.execute(text(f"SELECT pg_relation_size('{table}_pkey')"))).scalar_one()
+        await conn.commit()
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {table}"))
+
+    tail = batch_seconds[-len(batch_seconds) // 10:]
+    return {
+        "rows/s": ROWS / sum(batch_seconds),
+        "tail rows/s": len(tail) * BATCH / sum(tail),
+        "wal": wal,
+        "index": index,
+    }
+
+
+async def _run(report: Report) -> None:
+    for name, make_id in SCHEMES.items():
+        report.add(f"{name}: generate one key", measure(make_id, 100_000))
+    for name, make_id in SCHEMES.items():
+        result = await _insert(name, make_id)
+        report.add(f"{name}: insert throughput", result["rows/s"], "rows/s")
+        report.add(f"{name}: insert throughput, last 10%", result["tail rows/s"], "rows/s")
+        report.add(f"{name}: WAL written", result["wal"] / 2 ** 20, "MiB")
+        report.add(f"{name}: primary key index", result["index"] / 2 ** 20, "MiB")
+    report.print()
+    await engine.dispose()
+
+
+def main() -> None:
+    asyncio.run(_run(Report(f"Primary keys, {ROWS:,} inserts in batches of {BATCH:,}")))
+
+
+if __name__ == "__main__":
+    main()
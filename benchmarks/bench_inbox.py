@@ -0,0 +1,150 @@
+"""Direct message inbox: ``inbox_entries`` versus grouping the messages.
+
+Grows the configured database (``DATABASE_URL``; use a throwaway
+database) so that one user has 1000 and then 5000 conversations of
+MESSAGES_PER_PEER messages each, and times
+
+* ``get_inbox``: a range scan of ``(user_id, last_message_at)``, for the
+  first page and for a page deep in the inbox (keyset cursor);
+* the naive query: every message the user sent or received, grouped by
+  the other user, sorted by the latest one.
+
+The first should stay flat as conversations and messages grow, the second
+grows with the number of messages. Also prints the plan of the first page
+query to show it runs on ``ix_inbox_entries_user_id_last_message_at``.
+"""
+from datetime import datetime, timedelta
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import case, func, insert, or_, select, text
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom  # noqa: F401 (registers the mapper)
+from app.models.direct_message import DirectMessage
+from app.models.inbox import InboxEntry
+from app.models.message import Message  # noqa: F401 (registers the mapper)
+from app.models.user import User
+from app.services.direct_messages import get_inbox
+
+from benchmarks.common import Report
+
+PEER_COUNTS = (1000, 5000)
+MESSAGES_PER_PEER = 20
+PAGE = 50
+PREFIX = "bench-dm-peer-"
+START = datetime(2026, 1, 1)
+
+
+async def _user(db) -> uuid.UUID:
+    user_id = await db.scalar(select(User.id).where(User.username == "bench-dm-user"))
+    if user_id is None:
+        user_id = await db.scalar(insert(User).values(username="bench-dm-user", password="x").returning(User.id))
+        await db.commit()
+    return user_id
+
+
+async def _grow(db, user_id: uuid.UUID, peers: int) -> None:
+    existing = await db.scalar(select(func.count()).where(User.username.startswith(PREFIX)))
+    for i in range(existing, peers):
+        peer_id = await db.scalar(insert(User).values(username=f"{PREFIX}{i}", password="x").returning(User.id))
+        messages = []
+        for n in range(MESSAGES_PER_PEER):
+            # Conversations interleave in time, like a real inbox
+            sent = n % 2 == 0
+            messages.append({
+                "sender_id": user_id if sent else peer_id,
+                "recipient_id": peer_id if sent else user_id,
+                "content": f"benchmark message {n}",
+                "created_at": START + timedelta(seconds=n * PEER_COUNTS[-1] + i),
+            })
+        await db.execute(insert(DirectMessage), messages)
+        last = messages[-1]
+        await db.execute(insert(InboxEntry).values(
+            user_id=user_id, peer_id=peer_id, last_message_id=uuid.uuid4(), last_sender_id=last["sender_id"],
+            preview=last["content"], last_message_at=last["created_at"], unread=1,
+        ))
+        if i % 500 == 499:
+            await db.commit()
+    await db.commit()
+
+
+async def _naive(db, user_id: str, before=None):
+    # What the page would cost without inbox rows: group every message
+    me = uuid.UUID(user_id)
+    peer = case((DirectMessage.sender_id == me, DirectMessage.recipient_id), else_=DirectMessage.sender_id)
+    last = func.max(DirectMessage.created_at)
+    stmt = (
+        select(peer, last)
+        .where(or_(DirectMessage.sender_id == me, DirectMessage.recipient_id == me))
+        .group_by(peer)
+        .order_by(last.desc())
+        .limit(PAGE)
+    )
+    if before is not None:
+        stmt = stmt.having(last < before[0])
+    return (await db.execute(stmt)).all()
+
+
+async def _timed(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat + 1):
+        # The first run only warms statement caches
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await fn(db, *args)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def _deep_cursor(user_id: str, depth: int):
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(InboxEntry.last_message_at, InboxEntry.peer_id)
+            .where(InboxEntry.user_id == uuid.UUID(user_id))
+            .order_by(InboxEntry.last_message_at.desc(), InboxEntry.peer_id.desc())
+            .offset(depth)
+            .limit(1)
+        )).one()
+    return row.last_message_at, row.peer_id
+
+
+async def _plan(user_id: str) -> str:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text(
+            "EXPLAIN SELECT peer_id, last_message_at FROM inbox_entries WHERE user_id = :user_id "
+            "ORDER BY last_message_at DESC, peer_id DESC LIMIT :limit"
+        ), {"user_id": user_id, "limit": PAGE})
+        return "\n".join(f"    {row[0]}" for row in rows)
+
+
+async def _run(report: Report) -> str:
+    async with AsyncSessionLocal() as db:
+        user_id = str(await _user(db))
+
+    for peers in PEER_COUNTS:
+        async with AsyncSessionLocal() as db:
+            await _grow(db, uuid.UUID(user_id), peers)
+        deep = await _deep_cursor(user_id, peers * 9 // 10)
+
+        label = f"{peers:>5} conversations / {peers * MESSAGES_PER_PEER:>6} msgs"
+        report.add(f"{label} inbox, first page", await _timed(get_inbox, user_id, None, PAGE) * 1000, "ms")
+        report.add(f"{label} inbox, 90% deep", await _timed(get_inbox, user_id, deep, PAGE) * 1000, "ms")
+        report.add(f"{label} GROUP BY, first page", await _timed(_naive, user_id) * 1000, "ms")
+        report.add(f"{label} GROUP BY, 90% deep", await _timed(_naive, user_id, deep) * 1000, "ms")
+
+    plan = await _plan(user_id)
+    await engine.dispose()
+    return plan
+
+
+def main() -> None:
+    report = Report(f"Direct message inbox, {PAGE} conversations per page")
+    plan = asyncio.run(_run(report))
+    report.print()
+    print(f"\n  first page plan:\n{plan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Event-loop monitor: overhead, and catching a blocking handler.
+
+First times a bare event-loop callback with slow-callback detection off
+and on (the patched ``Handle._run`` adds two clock reads per callback).
+Then runs SOCKETS tasks that each wake every HEARTBEAT seconds, like
+connections waiting on pings, with the lag sampler on, while one
+"request" hashes a password synchronously on the loop. Reports the
+heartbeat delays the hash caused, what the lag gauges showed, and
+whether the slow callback was logged against the request that blocked.
+"""
+import asyncio
+import logging
+from time import perf_counter
+
+from app.config import settings
+from app.utils import loop_monitor as monitor_module
+from app.utils.loop_monitor import LoopMonitor, _current_scope
+from app.utils.security import hash_password
+
+from benchmarks.common import Report
+
+CALLBACKS = 200_000
+SOCKETS = 500
+HEARTBEAT = 0.05
+RUN_SECONDS = 3.0
+SLOW_CALLBACK_MS = 50
+
+
+class Captured(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+async def _callbacks() -> float:
+    # Best of three, nanoseconds per call_soon callback
+    return min([await _callback_run() for _ in range(3)])
+
+
+async def _callback_run() -> float:
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    remaining = CALLBACKS
+
+    def tick() -> None:
+        nonlocal remaining
+        remaining -= 1
+        if remaining:
+            loop.call_soon(tick)
+        else:
+            done.set_result(None)
+
+    start = perf_counter()
+    loop.call_soon(tick)
+    await done
+    return (perf_counter() - start) / CALLBACKS * 1e9
+
+
+async def _heartbeat(delays: list, stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        due = loop.time() + HEARTBEAT
+        await asyncio.sleep(HEARTBEAT)
+        delays.append(loop.time() - due)
+
+
+async def _login_request() -> float:
+    _current_scope.set({"type": "http", "method": "POST", "path": "/auth/login"})
+    await asyncio.sleep(RUN_SECONDS / 2)
+    start = perf_counter()
+    hash_password("benchmark-password")
+    # What a handler calling bcrypt directly does to the loop
+    return perf_counter() - start
+
+
+async def _run(report: Report) -> bool:
+    monitor = LoopMonitor()
+    monitor_module.loop_monitor = monitor
+    # _timed_run reports through the module's singleton
+
+    report.add("callback, detection off", await _callbacks())
+    monitor.slow_callback_seconds = SLOW_CALLBACK_MS / 1000
+    settings.LOOP_LAG_INTERVAL_SECONDS = HEARTBEAT
+    monitor.start()
+    report.add("callback, detection on", await _callbacks())
+
+    captured = Captured()
+    logging.getLogger("app.utils.loop_monitor").addHandler(captured)
+    delays: list = []
+    stop = asyncio.Event()
+    sockets = [asyncio.create_task(_heartbeat(delays, stop)) for _ in range(SOCKETS)]
+    blocked = await asyncio.create_task(_login_request())
+    await asyncio.sleep(RUN_SECONDS / 2)
+    stop.set()
+    await asyncio.gather(*sockets)
+    await monitor.stop()
+
+    late = [delay for delay in delays if delay > SLOW_CALLBACK_MS / 1000]
+    report.add("password hash blocked the loop for", blocked * 1000, "ms")
+    report.add("heartbeats", len(delays), "")
+    report.add(f"heartbeats over {SLOW_CALLBACK_MS} ms late", len(late), "")
+    report.add("worst heartbeat delay", max(delays) * 1000, "ms")
+    report.add("lag gauge p50", monitor.percentile(0.5) * 1000, "ms")
+    report.add("lag gauge max", monitor.percentile(1.0) * 1000, "ms")
+    return any("POST /auth/login" in message and "_login_request" in message for message in captured.messages)
+
+
+def main() -> None:
+    report = Report(f"Event-loop monitor, {SOCKETS} sockets with a {HEARTBEAT * 1000:.0f} ms heartbeat")
+    found = asyncio.run(_run(report))
+    report.print()
+    print(f"\n  blocking call logged with its route and coroutine: {'yes' if found else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
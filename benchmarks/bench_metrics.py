@@ -0,0 +1,60 @@
+"""Overhead of the in-process metrics on the hot paths.
+
+Compares bare metric operations and ``ConnectionManager.broadcast_json``
+with the instruments in place against the same loop without them.
+"""
+import asyncio
+from time import perf_counter
+
+from app.utils.metrics import Counter, Histogram, registry
+from app.websocket.manager import ConnectionManager
+
+from benchmarks.common import FakeWebSocket, Report, measure, measure_async
+
+
+async def _broadcast_uninstrumented(manager: ConnectionManager, room_id: str, data: dict) -> None:
+    # Same loop as ConnectionManager.broadcast_json minus the metric calls
+    for connection in list(manager.active_connections.get(room_id, set())):
+        try:
+            await connection.send_json(data)
+        except Exception:
+            manager.disconnect(room_id, connection)
+
+
+async def _run(report: Report) -> None:
+    counter = Counter("bench_counter_total", "benchmark counter")
+    labelled = Counter("bench_labelled_total", "benchmark counter", ("route",))
+    histogram = Histogram("bench_histogram_seconds", "benchmark histogram")
+    child = labelled.labels("/chat/room/{room_id}")
+
+    report.add("counter.inc()", measure(counter.inc, 1_000_000))
+    report.add("counter.labels(...).inc()", measure(lambda: labelled.labels("/chat/room/{room_id}").inc(), 500_000))
+    report.add("bound child.inc()", measure(child.inc, 1_000_000))
+    report.add("histogram.observe()", measure(lambda: histogram.observe(0.0042), 1_000_000))
+    report.add("perf_counter() pair", measure(lambda: perf_counter() - perf_counter(), 1_000_000))
+
+    data = {"type": "message", "username": "bench", "content": "hello world", "created_at": None}
+    for room_size in (10, 100, 1000):
+        manager = ConnectionManager()
+        room_id = f"room-{room_size}"
+        for _ in range(room_size):
+            await manager.connect(room_id, FakeWebSocket())
+
+        number = max(10, 20_000 // room_size)
+        bare = await measure_async(lambda: _broadcast_uninstrumented(manager, room_id, data), number)
+        instrumented = await measure_async(lambda: manager.broadcast_json(room_id, data), number)
+        report.add(f"broadcast_json x{room_size} bare", bare)
+        report.add(f"broadcast_json x{room_size} instrumented", instrumented)
+        report.add(f"broadcast_json x{room_size} overhead", (instrumented - bare) / bare * 100, "%")
+
+    report.add("registry.expose()", measure(registry.expose, 1_000))
+
+
+def main() -> None:
+    report = Report("Metrics overhead")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
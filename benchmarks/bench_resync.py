@@ -0,0 +1,115 @@
+"""Reconnecting to a busy room: full history reload vs seq-based resync.
+
+Fills a room with MESSAGES messages and has a client that missed the last
+MISSED of them catch up three ways: reloading the whole history
+(``get_messages_for_room``, what a page reload did), replaying from the
+per-room buffer of recent frames, and replaying from one ``(room_id, seq)``
+range query when the buffer doesn't cover the gap. Reports time and bytes
+of JSON per reconnect, and checks that each replay is exactly the missed
+messages, in order.
+"""
+import asyncio
+import json
+
+from sqlalchemy import select, text
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.user import User
+from app.services.chat_service import get_messages_after, get_messages_for_room
+from app.websocket.resync import message_frame, missed_frames, recent_messages
+
+from benchmarks.common import Report, measure_async
+
+MESSAGES = 100_000
+MISSED = 20
+BUFFERED = 100
+
+
+async def _seed() -> str:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+        if user is None:
+            user = User(username="bench-user", password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        room = (await db.execute(select(ChatRoom).where(ChatRoom.name == "bench-resync"))).scalars().first()
+        if room is None:
+            room = ChatRoom(name="bench-resync")
+            db.add(room)
+            await db.commit()
+            await db.refresh(room)
+        user_id, room_id = user.id, room.id
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM messages WHERE room_id = :room"), {"room": room_id})
+        await conn.execute(text(
+            "INSERT INTO messages (id, content, created_at, user_id, room_id, seq) "
+            "SELECT gen_random_uuid(), 'benchmark message ' || g, now() - (:n - g) * interval '1 second', "
+            ":user, :room, g FROM generate_series(1, :n) AS g"
+        ), {"n": MESSAGES, "user": user_id, "room": room_id})
+        await conn.execute(text("UPDATE chatrooms SET message_count = :n WHERE id = :room"),
+                           {"n": MESSAGES, "room": room_id})
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+    return str(room_id)
+
+
+async def _fill_buffer(room_id: str) -> None:
+    # What the room's worker would hold after broadcasting the newest messages
+    recent_messages.rooms.pop(room_id, None)
+    async with AsyncSessionLocal() as db:
+        messages, _ = await get_messages_after(db, room_id, MESSAGES - BUFFERED, BUFFERED)
+    for m in messages:
+        recent_messages.remember(room_id, message_frame(m.user_id, m.username, m.content, m.created_at, m.seq))
+
+
+async def _full_history(room_id: str) -> list:
+    async with AsyncSessionLocal() as db:
+        messages = await get_messages_for_room(db, room_id)
+    return [message_frame(m.user_id, m.username, m.content, m.created_at, m.seq) for m in messages]
+
+
+async def _resync(room_id: str) -> list:
+    async with AsyncSessionLocal() as db:
+        frames, _ = await missed_frames(db, room_id, MESSAGES - MISSED)
+    return frames
+
+
+async def _run(report: Report) -> None:
+    room_id = await _seed()
+    expected = list(range(MESSAGES - MISSED + 1, MESSAGES + 1))
+
+    await _fill_buffer(room_id)
+    results = {
+        "full history reload": (await _full_history(room_id),
+                                await measure_async(lambda: _full_history(room_id), 1, 3)),
+        "resync from buffer": (await _resync(room_id),
+                               await measure_async(lambda: _resync(room_id), 200)),
+    }
+    recent_messages.rooms.pop(room_id, None)
+    results["resync from database"] = (await _resync(room_id),
+                                       await measure_async(lambda: _resync(room_id), 200))
+
+    ok = all([frame["seq"] for frame in frames] == expected for frames, _ in list(results.values())[1:])
+    for label, (frames, ns) in results.items():
+        report.add(f"{label}: time", ns / 1e6, "ms")
+        report.add(f"{label}: frames", len(frames), "")
+        report.add(f"{label}: JSON sent", sum(len(json.dumps(frame)) for frame in frames) / 1024, "KiB")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM messages WHERE room_id = :room"), {"room": room_id})
+        await conn.execute(text("UPDATE chatrooms SET message_count = 0 WHERE id = :room"), {"room": room_id})
+    report.print()
+    print(f"\n  replays are exactly the {MISSED} missed messages, in order: {'yes' if ok else 'NO'}")
+    await engine.dispose()
+
+
+def main() -> None:
+    asyncio.run(_run(Report(f"Reconnect after missing {MISSED} of {MESSAGES:,} messages")))
+
+
+if __name__ == "__main__":
+    main()
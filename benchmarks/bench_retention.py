@@ -0,0 +1,162 @@
+"""Pruning a large room: one DELETE vs batched retention.
+
+Fills a room with MESSAGES messages spread over the last 100 days and
+expires everything older than RETENTION_DAYS, first with a single
+``DELETE ... WHERE created_at < cutoff`` and then with
+``app.services.retention.prune`` (after re-filling the room). Reports how
+long transactions hold their row locks and the WAL each one generates
+(what a replica has to replay before it catches up); the batched total
+includes the pauses between batches. Also checks the dry-run estimate
+against what was actually deleted, and that the batch query walks the
+``(room_id, created_at)`` index instead of scanning ``messages``.
+"""
+import asyncio
+import statistics
+from time import perf_counter
+
+from sqlalchemy import select, text
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message  # noqa: F401 (registers the mapper)
+from app.models.user import User
+from app.services import retention
+
+from benchmarks.common import Report
+
+MESSAGES = 200_000
+RETENTION_DAYS = 30
+BATCH_SIZE = 1000
+
+
+class BatchDurations(list):
+    """Stands in for the batch duration histogram to keep every observation."""
+
+    def labels(self) -> "BatchDurations":
+        return self
+
+    def observe(self, seconds: float) -> None:
+        self.append(seconds)
+
+
+async def _seed() -> tuple:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+        if user is None:
+            user = User(username="bench-user", password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        room = (await db.execute(select(ChatRoom).where(ChatRoom.name == "bench-retention"))).scalars().first()
+        if room is None:
+            room = ChatRoom(name="bench-retention")
+            db.add(room)
+            await db.commit()
+            await db.refresh(room)
+        return user.id, room.id
+
+
+async def _fill(user_id, room_id) -> None:
+    # MESSAGES messages, one every ~43s going back 100 days
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM messages WHERE room_id = :room"), {"room": room_id})
+        await conn.execute(text(
+            "INSERT INTO messages (id, content, created_at, user_id, room_id, seq) "
+            "SELECT gen_random_uuid(), 'message ' || g, now() - g * interval '1 second' * :step, :user, :room, "
+            ":n + 1 - g FROM generate_series(1, :n) AS g"
+        ), {"n": MESSAGES, "step": 100 * 86400 / MESSAGES, "user": user_id, "room": room_id})
+        await conn.execute(text("UPDATE chatrooms SET retention_days = NULL WHERE id = :room"), {"room": room_id})
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+
+
+async def _wal_lsn(conn) -> int:
+    return (await conn.execute(text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"))).scalar_one()
+
+
+async def _single_delete(room_id) -> dict:
+    async with engine.connect() as conn:
+        wal = await _wal_lsn(conn)
+        await conn.commit()
+        start = perf_counter()
+        async with conn.begin():
+            deleted = (await conn.execute(text(
+                "DELETE FROM messages WHERE room_id = :room AND created_at < now() - make_interval(days => :days)"
+            ), {"room": room_id, "days": RETENTION_DAYS})).rowcount
+        seconds = perf_counter() - start
+        wal = await _wal_lsn(conn) - wal
+    return {"rows": deleted, "median": seconds, "longest": seconds, "wal": wal, "transactions": 1, "total": seconds}
+
+
+async def _batched(room_id) -> dict:
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE chatrooms SET retention_days = :days WHERE id = :room"),
+                           {"room": room_id, "days": RETENTION_DAYS})
+
+    durations = BatchDurations()
+    histogram, retention.RETENTION_BATCH_DURATION = retention.RETENTION_BATCH_DURATION, durations
+    try:
+        estimate = await retention.prune(dry_run=True)
+        async with engine.connect() as conn:
+            wal = await _wal_lsn(conn)
+        report = await retention.prune(dry_run=False)
+        async with engine.connect() as conn:
+            wal = await _wal_lsn(conn) - wal
+    finally:
+        retention.RETENTION_BATCH_DURATION = histogram
+
+    async with engine.connect() as conn:
+        room = (await conn.execute(
+            select(ChatRoom.id, ChatRoom.retention_days, ChatRoom.retention_max_messages)
+            .where(ChatRoom.id == room_id)
+        )).one()
+        expired = await retention._expired_condition(conn, room)
+        query = select(Message.id).where(expired).order_by(Message.created_at, Message.id).limit(BATCH_SIZE)
+        compiled = query.compile(conn.sync_connection, compile_kwargs={"literal_binds": True})
+        plan = "\n".join(row[0] for row in await conn.execute(text(f"EXPLAIN {compiled}")))
+
+    return {
+        "rows": report.rows,
+        "estimate": estimate.rows,
+        "median": statistics.median(durations),
+        "longest": max(durations),
+        "wal": wal / max(report.batches, 1),
+        "transactions": report.batches,
+        "total": report.seconds,
+        "index": "ix_messages_room_id_created_at" in plan and "Seq Scan" not in plan,
+    }
+
+
+async def _run(report: Report) -> None:
+    settings.RETENTION_BATCH_SIZE = BATCH_SIZE
+    user_id, room_id = await _seed()
+
+    await _fill(user_id, room_id)
+    single = await _single_delete(room_id)
+    await _fill(user_id, room_id)
+    batched = await _batched(room_id)
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM messages WHERE room_id = :room"), {"room": room_id})
+
+    for label, result in (("single DELETE", single), (f"batches of {BATCH_SIZE}", batched)):
+        report.add(f"{label}: messages deleted", result["rows"], "rows")
+        report.add(f"{label}: transactions", result["transactions"], "")
+        report.add(f"{label}: median transaction", result["median"] * 1000, "ms")
+        report.add(f"{label}: longest transaction", result["longest"] * 1000, "ms")
+        report.add(f"{label}: WAL per transaction", result["wal"] / 1024, "KiB")
+        report.add(f"{label}: total time", result["total"] * 1000, "ms")
+    report.add("dry-run estimate", batched["estimate"], "rows")
+    report.print()
+    print(f"\n  dry-run estimate matches: {'yes' if batched['estimate'] == batched['rows'] else 'NO'}")
+    print(f"  batch query uses (room_id, created_at) index: {'yes' if batched['index'] else 'NO'}")
+    await engine.dispose()
+
+
+def main() -> None:
+    asyncio.run(_run(Report(f"Retention, {MESSAGES:,} messages, keep {RETENTION_DAYS} days")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Reconnect storm during a rolling restart.
+
+Starts two servers against the configured database, connects CLIENTS
+WebSocket clients to the first one and stops it with SIGTERM; the
+clients then reconnect to the second server. Run twice:
+
+* plain ``uvicorn``, clients reconnecting after the old fixed 3 s delay
+* ``python -m app.server`` (graceful drain), clients following the
+  jittered ``reconnect`` hint
+
+Reports the peak handshake rate the second server sees (per 100 ms
+bucket), how long the reconnects are spread over and the handshake
+latency.
+"""
+import asyncio
+import json
+import signal
+import statistics
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message  # noqa: F401 (registers the mapper)
+from app.models.user import User
+
+from benchmarks.common import Report, free_port, start_server
+
+CLIENTS = 500
+ROOMS = 50
+BUCKET = 0.1  # seconds
+LEGACY_DELAY = 3.0  # fixed reconnect delay of the old client
+RECONNECT_WINDOW_MS = 5000
+
+
+async def _seed() -> Tuple[str, List[str]]:
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+        if user is None:
+            user = User(username="bench-user", password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+        rooms = []
+        for i in range(ROOMS):
+            name = f"bench-restart-{i}"
+            room = (await db.execute(select(ChatRoom).where(ChatRoom.name == name))).scalars().first()
+            if room is None:
+                room = ChatRoom(name=name)
+                db.add(room)
+                await db.commit()
+                await db.refresh(room)
+            rooms.append(str(room.id))
+    await engine.dispose()
+    return str(user.id), rooms
+
+
+async def _client(url_a: str, url_b: str, follow_hint: bool, connected: asyncio.Event,
+                  handshakes: list, latencies: list) -> None:
+    hint_ms: Optional[int] = None
+    async with connect(url_a, max_queue=None) as ws:
+        connected.set()
+        try:
+            async for frame in ws:
+                if frame.startswith("{"):
+                    data = json.loads(frame)
+                    if data.get("type") == "reconnect":
+                        hint_ms = data["after_ms"]
+        except ConnectionClosed:
+            pass
+
+    delay = hint_ms / 1000 if follow_hint and hint_ms is not None else LEGACY_DELAY
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    handshakes.append(start)
+    async with connect(url_b, open_timeout=30) as ws:
+        latencies.append(time.perf_counter() - start)
+
+
+async def _storm(server: List[str], follow_hint: bool, user_id: str, rooms: List[str]) -> dict:
+    env = {"DRAIN_RECONNECT_WINDOW_MS": str(RECONNECT_WINDOW_MS)}
+    port_a, port_b = free_port(), free_port()
+    proc_a = start_server(server, port_a, env)
+    proc_b = start_server(server, port_b, env)
+    handshakes: List[float] = []
+    latencies: List[float] = []
+    try:
+        events = [asyncio.Event() for _ in range(CLIENTS)]
+        tasks = []
+        for i, event in enumerate(events):
+            path = f"/ws/chat/{rooms[i % len(rooms)]}?user_id={user_id}"
+            tasks.append(asyncio.create_task(_client(
+                f"ws://127.0.0.1:{port_a}{path}", f"ws://127.0.0.1:{port_b}{path}",
+                follow_hint, event, handshakes, latencies)))
+        await asyncio.wait_for(asyncio.gather(*(e.wait() for e in events)), 60)
+
+        proc_a.send_signal(signal.SIGTERM)
+        await asyncio.gather(*tasks)
+    finally:
+        for process in (proc_a, proc_b):
+            process.terminate()
+            process.wait(timeout=30)
+
+    first = min(handshakes)
+    buckets = Counter(int((t - first) / BUCKET) for t in handshakes)
+    return {
+        "peak_rate": max(buckets.values()) / BUCKET,
+        "spread": max(handshakes) - first,
+        "p50": statistics.median(latencies),
+        "p99": statistics.quantiles(latencies, n=100)[98],
+    }
+
+
+async def _run(report: Report) -> None:
+    user_id, rooms = await _seed()
+    modes = {
+        "fixed 3s delay": (["uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", "{port}",
+                            "--log-level", "warning"], False),
+        "drain + jittered hint": (["app.server"], True),
+    }
+    for label, (server, follow_hint) in modes.items():
+        result = await _storm(server, follow_hint, user_id, rooms)
+        report.add(f"{label}: peak handshake rate", result["peak_rate"], "/s")
+        report.add(f"{label}: reconnects spread over", result["spread"] * 1000, "ms")
+        report.add(f"{label}: handshake latency p50", result["p50"] * 1000, "ms")
+        report.add(f"{label}: handshake latency p99", result["p99"] * 1000, "ms")
+
+
+def main() -> None:
+    report = Report(f"Rolling restart, {CLIENTS} clients")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
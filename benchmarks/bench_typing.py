@@ -0,0 +1,85 @@
+"""Typing indicator fan-out as rooms grow.
+
+Every member of a room with 10, 100 and 1000 sockets keeps typing (one
+event per member every TICK) for DURATION seconds. Reports the frames
+each socket receives per second through ``TypingCoalescer`` and what a
+naive broadcast of every event would have sent, and checks the
+per-socket rate stays within one frame per interval. A tenth of the
+sockets are slow (each send takes SLOW_SEND seconds) to show typing
+frames being dropped for them instead of queueing.
+"""
+import asyncio
+
+from app.utils.metrics import WS_EPHEMERAL_DROPPED, WS_TYPING_EVENTS
+from app.websocket.manager import ConnectionManager
+from app.websocket.typing_indicators import TypingCoalescer
+
+from benchmarks.common import FakeWebSocket, Report
+
+ROOM_SIZES = (10, 100, 1000)
+INTERVAL = 0.1  # coalescing interval (TYPING_INTERVAL_SECONDS)
+THROTTLE = 0.2  # per-user throttle (TYPING_THROTTLE_SECONDS)
+TICK = 0.02
+DURATION = 2.0
+SLOW_SEND = 0.35
+
+
+class SlowWebSocket(FakeWebSocket):
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(SLOW_SEND)
+        self.sent += 1
+
+
+async def _room(size: int) -> dict:
+    manager = ConnectionManager()
+    coalescer = TypingCoalescer(manager, INTERVAL, THROTTLE)
+    sockets = [SlowWebSocket() if i % 10 == 0 else FakeWebSocket() for i in range(size)]
+    for websocket in sockets:
+        await manager.connect("room", websocket)
+
+    throttled = WS_TYPING_EVENTS.labels("throttled")
+    dropped_before, throttled_before = WS_EPHEMERAL_DROPPED.labels().value, throttled.value
+    events = 0
+    loop = asyncio.get_running_loop()
+    end = loop.time() + DURATION
+    while loop.time() < end:
+        for user in range(size):
+            coalescer.typing("room", str(user), f"user-{user}")
+            events += 1
+        await asyncio.sleep(TICK)
+    await asyncio.sleep(INTERVAL + SLOW_SEND)  # let the last frames go out
+
+    accepted = events - (throttled.value - throttled_before)
+    fast = [ws.sent for ws in sockets if not isinstance(ws, SlowWebSocket)]
+    return {
+        "per_socket": max(fast) / DURATION,
+        "total": sum(ws.sent for ws in sockets) / DURATION,
+        "naive_total": events * (size - 1) / DURATION,
+        "accepted": accepted / DURATION,
+        "dropped": WS_EPHEMERAL_DROPPED.labels().value - dropped_before,
+    }
+
+
+async def _run(report: Report) -> bool:
+    bounded = True
+    limit = 1 / INTERVAL + 1
+    for size in ROOM_SIZES:
+        result = await _room(size)
+        bounded &= result["per_socket"] <= limit
+        report.add(f"{size:>5} sockets: frames/s per socket", result["per_socket"], "/s")
+        report.add(f"{size:>5} sockets: frames/s total", result["total"], "/s")
+        report.add(f"{size:>5} sockets: frames/s naive broadcast", result["naive_total"], "/s")
+        report.add(f"{size:>5} sockets: events accepted after throttle", result["accepted"], "/s")
+        report.add(f"{size:>5} sockets: frames dropped for slow sockets", result["dropped"], "frames")
+    return bounded
+
+
+def main() -> None:
+    report = Report("Typing indicators")
+    bounded = asyncio.run(_run(report))
+    report.print()
+    print(f"\n  per-socket rate within {1 / INTERVAL + 1:.0f}/s: {'yes' if bounded else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Room list with unread counts: counters + watermarks versus COUNT(*).
+
+Grows the configured database (``DATABASE_URL``; use a throwaway
+database) to 100, 300 and 1000 rooms with MESSAGES_PER_ROOM messages
+each, a user with read watermarks for half of them, and times
+
+* ``get_rooms_with_unread``: one row per room (counter minus watermark)
+* the naive query: join ``messages`` and ``COUNT(*)`` per room
+
+The first should grow with the number of rooms only, the second with the
+number of messages.
+"""
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import func, insert, select
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+from app.models.read_state import RoomReadState
+from app.models.user import User
+from app.services.chat_service import get_rooms_with_unread
+
+from benchmarks.common import Report
+
+ROOM_COUNTS = (100, 300, 1000)
+MESSAGES_PER_ROOM = 100
+PREFIX = "bench-unread-"
+
+
+async def _user(db) -> uuid.UUID:
+    user = (await db.execute(select(User).where(User.username == "bench-user"))).scalars().first()
+    if user is None:
+        user = User(username="bench-user", password="x")
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return user.id
+
+
+async def _grow(db, user_id: uuid.UUID, rooms: int) -> None:
+    existing = await db.scalar(select(func.count()).where(ChatRoom.name.startswith(PREFIX)))
+    for i in range(existing, rooms):
+        room_id = (await db.execute(
+            insert(ChatRoom)
+            .values(name=f"{PREFIX}{i}", message_count=MESSAGES_PER_ROOM)
+            .returning(ChatRoom.id)
+        )).scalar_one()
+        await db.execute(insert(Message), [
+            {"content": f"benchmark message {n}", "user_id": user_id, "room_id": room_id, "seq": n + 1}
+            for n in range(MESSAGES_PER_ROOM)
+        ])
+        if i % 2 == 0:
+            await db.execute(insert(RoomReadState).values(
+                user_id=user_id, room_id=room_id, read_count=MESSAGES_PER_ROOM // 2))
+    await db.commit()
+
+
+async def _naive(db, user_id: str):
+    # What the page would cost without counters: count every room's messages
+    stmt = (
+        select(ChatRoom.id, ChatRoom.name, func.count(Message.id))
+        .outerjoin(Message, Message.room_id == ChatRoom.id)
+        .group_by(ChatRoom.id)
+        .order_by(ChatRoom.created_at)
+    )
+    return (await db.execute(stmt)).all()
+
+
+async def _timed(fn, user_id: str, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await fn(db, user_id)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def _run(report: Report) -> None:
+    async with AsyncSessionLocal() as db:
+        user_id = await _user(db)
+
+    for rooms in ROOM_COUNTS:
+        async with AsyncSessionLocal() as db:
+            await _grow(db, user_id, rooms)
+            total_rooms = await db.scalar(select(func.count()).select_from(ChatRoom))
+            total_messages = await db.scalar(select(func.count()).select_from(Message))
+
+        label = f"{total_rooms:>5} rooms / {total_messages:>7} msgs"
+        for name, fn in (("counters", get_rooms_with_unread), ("COUNT(*)", _naive)):
+            await _timed(fn, str(user_id), repeat=1)  # warm statement caches
+            latency = await _timed(fn, str(user_id))
+            report.add(f"{label} {name}", latency * 1000, "ms")
+            report.add(f"{label} {name} per room", latency * 1e6 / total_rooms, "us")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    report = Report("Room list with unread counts")
+    asyncio.run(_run(report))
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
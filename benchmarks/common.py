@@ -0,0 +1,95 @@
+"""Helpers shared by the benchmark scripts.
+
+Each ``bench_*.py`` module can be run on its own with
+``python -m benchmarks.bench_<name>`` from the repository root.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+import httpx
+
+
+class FakeWebSocket:
+    """Stand-in for starlette's WebSocket that serializes but never does I/O."""
+
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.sent += 1
+
+    async def send_json(self, data: dict) -> None:
+        # Starlette encodes with json.dumps before sending, keep that cost
+        json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        self.sent += 1
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best-of-``repeat`` nanoseconds per call of ``fn``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+async def measure_async(fn: Callable[[], Awaitable[object]], number: int, repeat: int = 5) -> float:
+    """Best-of-``repeat`` nanoseconds per awaited call of ``fn``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            await fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+class Report:
+    """Collects named results and prints them as an aligned table."""
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.results: List[Tuple[str, float, str]] = []
+
+    def add(self, name: str, value: float, unit: str = "ns/op") -> None:
+        self.results.append((name, value, unit))
+
+    def print(self) -> None:
+        print(f"\n{self.title}")
+        width = max((len(name) for name, _, _ in self.results), default=0)
+        for name, value, unit in self.results:
+            print(f"  {name:<{width}}  {value:>14,.1f} {unit}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(module_args: List[str], port: int, env: dict) -> subprocess.Popen:
+    """Run ``python -m <module_args>`` ("{port}" is substituted) and wait for /ready."""
+    env = {**os.environ, "PORT": str(port), "HOST": "127.0.0.1", **env}
+    args = [arg.replace("{port}", str(port)) for arg in module_args]
+    process = subprocess.Popen([sys.executable, "-m", *args], env=env)
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+        while True:
+            try:
+                if client.get("/ready").status_code == 200:
+                    return process
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
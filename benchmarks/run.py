@@ -0,0 +1,300 @@
+"""Microbenchmark suite with machine-readable results and baseline checks.
+
+Runs a fixed set of hot-path cases and prints one line per case (best and
+median time per operation over REPEAT runs):
+
+* ``ConnectionManager.connect`` / ``disconnect`` / ``broadcast_json`` with
+  fake sockets (no I/O, JSON encoding kept);
+* ``create_message``, ``get_messages_for_room`` and ``get_all_rooms``
+  against the configured database (``DATABASE_URL``; use a throwaway
+  database, it is seeded with ``bench-suite-*`` rooms), one session per
+  call as a request would use;
+* ``hash_password`` / ``verify_password``.
+
+Usage, from the repository root::
+
+    python -m benchmarks.run                      # run and print
+    python -m benchmarks.run --json results.json  # also write the results
+    python -m benchmarks.run --save-baseline      # store as benchmarks/baseline.json
+    python -m benchmarks.run --compare            # compare with the baseline
+
+``--compare`` exits with status 1 when a case got more than
+``--threshold`` percent slower (best times are compared, they are the
+least noisy), so it can gate a change in CI. Baselines are only
+comparable on the same machine and database; the ``meta`` block records
+both and a mismatch is reported. ``--only`` runs the cases whose full
+name contains the given text (``broadcast``, ``x100``, ``get_all_rooms``)
+and fails when there is none; the database is only touched when a
+database case is selected.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Awaitable, Callable, Dict, List, NamedTuple
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+from sqlalchemy import delete, func, insert, select, text, update
+
+from app.database.session import AsyncSessionLocal, engine
+from app.models.chatroom import ChatRoom
+from app.models.message import Message
+from app.models.user import User
+from app.services.chat_service import create_message, get_all_rooms, get_messages_for_room
+from app.utils.security import hash_password, verify_password
+from app.websocket.manager import ConnectionManager
+
+from benchmarks.common import FakeWebSocket
+
+BASELINE = Path(__file__).with_name("baseline.json")
+REPEAT = 5
+PREFIX = "bench-suite-"
+SEED_ROOMS = 200
+HISTORY_SIZES = (100, 1_000)
+BROADCAST_SIZES = (10, 100, 1_000)
+CONNECTIONS = 1_000
+
+UNITS = {"ns/op": 1, "us/op": 1_000, "ms/op": 1_000_000}
+
+
+class Result(NamedTuple):
+    best: float
+    median: float
+    unit: str
+
+
+async def _time(fn: Callable[[], object], number: int, unit: str = "ns/op") -> Result:
+    """Best and median of REPEAT runs of ``number`` calls (awaited if needed)."""
+    result = fn()
+    if inspect.isawaitable(result):
+        await result
+    # One untimed call first: pool connections, prepared statements, caches
+    samples: List[float] = []
+    for _ in range(REPEAT):
+        start = perf_counter_ns()
+        for _ in range(number):
+            result = fn()
+            if inspect.isawaitable(result):
+                await result
+        samples.append((perf_counter_ns() - start) / number / UNITS[unit])
+    return Result(min(samples), statistics.median(samples), unit)
+
+
+def _with_session(fn: Callable, *args) -> Callable[[], Awaitable[object]]:
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await fn(db, *args)
+    return call
+
+
+# Case groups: each returns {name: Result}
+
+async def _manager() -> Dict[str, Result]:
+    results = {}
+    connect, disconnect = [], []
+    for _ in range(REPEAT):
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(CONNECTIONS)]
+        start = perf_counter_ns()
+        for websocket in sockets:
+            await manager.connect("room", websocket)
+        connect.append((perf_counter_ns() - start) / CONNECTIONS)
+        start = perf_counter_ns()
+        for websocket in sockets:
+            manager.disconnect("room", websocket)
+        disconnect.append((perf_counter_ns() - start) / CONNECTIONS)
+    results["manager.connect"] = Result(min(connect), statistics.median(connect), "ns/op")
+    results["manager.disconnect"] = Result(min(disconnect), statistics.median(disconnect), "ns/op")
+
+    data = {"type": "message", "user_id": "0" * 36, "username": "bench", "content": "hello world",
+            "created_at": "2026-01-01T00:00:00", "seq": 1}
+    for size in BROADCAST_SIZES:
+        manager = ConnectionManager()
+        for _ in range(size):
+            await manager.connect("room", FakeWebSocket())
+        results[f"manager.broadcast_json x{size}"] = await _time(
+            lambda: manager.broadcast_json("room", data), max(10, 20_000 // size), "us/op")
+    return results
+
+
+async def _seed() -> tuple:
+    """(user id, room for writes, {size: history room}), created once per database."""
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(select(User.id).where(User.username == "bench-user"))
+        if user_id is None:
+            user_id = await db.scalar(insert(User).values(username="bench-user", password="x").returning(User.id))
+
+        existing = await db.scalar(select(func.count()).where(ChatRoom.name.startswith(PREFIX)))
+        for i in range(existing, SEED_ROOMS):
+            await db.execute(insert(ChatRoom).values(name=f"{PREFIX}{i:04d}"))
+        await db.commit()
+        rooms = dict((await db.execute(
+            select(ChatRoom.name, ChatRoom.id).where(ChatRoom.name.startswith(PREFIX))
+        )).all())
+
+        for size, name in zip(HISTORY_SIZES, sorted(rooms)[1:]):
+            room_id = rooms[name]
+            if await db.scalar(select(func.count()).where(Message.room_id == room_id)) != size:
+                await db.execute(delete(Message).where(Message.room_id == room_id))
+                await db.execute(insert(Message), [
+                    {"content": f"benchmark message {n}", "user_id": user_id, "room_id": room_id, "seq": n + 1}
+                    for n in range(size)
+                ])
+                await db.execute(update(ChatRoom).where(ChatRoom.id == room_id).values(message_count=size))
+
+        write_room = rooms[sorted(rooms)[0]]
+        await db.execute(delete(Message).where(Message.room_id == write_room))
+        await db.execute(update(ChatRoom).where(ChatRoom.id == write_room).values(message_count=0))
+        await db.commit()
+    history = {size: str(rooms[name]) for size, name in zip(HISTORY_SIZES, sorted(rooms)[1:])}
+    return str(user_id), str(write_room), history
+
+
+async def _database() -> Dict[str, Result]:
+    user_id, write_room, history = await _seed()
+    results = {
+        "create_message": await _time(
+            _with_session(create_message, write_room, user_id, "benchmark message"), 200, "us/op"),
+    }
+    for size, room_id in history.items():
+        results[f"get_messages_for_room x{size}"] = await _time(
+            _with_session(get_messages_for_room, room_id), max(5, 5_000 // size), "us/op")
+    results["get_all_rooms"] = await _time(_with_session(get_all_rooms), 50, "us/op")
+    return results
+
+
+async def _passwords() -> Dict[str, Result]:
+    hashed = hash_password("benchmark-password")
+    return {
+        "hash_password": await _time(lambda: hash_password("benchmark-password"), 3, "ms/op"),
+        "verify_password": await _time(lambda: verify_password("benchmark-password", hashed), 3, "ms/op"),
+    }
+
+
+GROUPS = (
+    # (the group's case names, so --only can pick groups without running
+    # them; the group; whether it uses the database)
+    (("manager.connect", "manager.disconnect", *(f"manager.broadcast_json x{size}" for size in BROADCAST_SIZES)),
+     _manager, False),
+    (("create_message", *(f"get_messages_for_room x{size}" for size in HISTORY_SIZES), "get_all_rooms"),
+     _database, True),
+    (("hash_password", "verify_password"), _passwords, False),
+)
+
+
+async def _meta(database: bool) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    meta = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.node()} {platform.machine()} {os.cpu_count()} CPUs",
+        "repeat": REPEAT,
+    }
+    if database:
+        # Only when a database case ran: CPU-only runs need no database
+        async with engine.connect() as conn:
+            server = (await conn.execute(text("SHOW server_version"))).scalar_one()
+            rooms = await conn.scalar(select(func.count()).select_from(ChatRoom))
+        meta["postgres"] = f"{engine.url.host or 'local'}/{engine.url.database} {server}"
+        meta["rooms_in_database"] = rooms
+    return meta
+
+
+def _selected(names, only: str | None) -> List[str]:
+    # Case names containing --only (all of them without it)
+    return [name for name in names if not only or only in name]
+
+
+async def _run(only: str | None) -> dict:
+    results: Dict[str, Result] = {}
+    database = False
+    for names, run, uses_database in GROUPS:
+        if not _selected(names, only):
+            continue
+        results.update(await run())
+        database = database or uses_database
+    if only:
+        results = {name: result for name, result in results.items() if only in name}
+    meta = await _meta(database)
+    await engine.dispose()
+    return {"meta": meta, "results": {name: result._asdict() for name, result in results.items()}}
+
+
+def _print(report: dict) -> None:
+    print(f"\nBenchmark suite ({report['meta']['commit'] or 'no commit'}, best / median of {REPEAT})")
+    width = max((len(name) for name in report["results"]), default=0)
+    for name, result in report["results"].items():
+        print(f"  {name:<{width}}  {result['best']:>12,.1f}  {result['median']:>12,.1f} {result['unit']}")
+
+
+def _compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print the change of every case against ``baseline``, return the regressions."""
+    for key in ("machine", "postgres", "python"):
+        if key in report["meta"] and baseline["meta"].get(key) != report["meta"][key]:
+            print(f"  note: {key} differs from the baseline "
+                  f"({baseline['meta'].get(key)} vs {report['meta'].get(key)})")
+    print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('date')}), "
+          f"slower by more than {threshold:g}% fails")
+    regressions = []
+    width = max((len(name) for name in report["results"]), default=0)
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or before["unit"] != result["unit"]:
+            print(f"  {name:<{width}}  (not in baseline)")
+            continue
+        change = (result["best"] - before["best"]) / before["best"] * 100
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"  {name:<{width}}  {before['best']:>12,.1f} -> {result['best']:>12,.1f} "
+              f"{result['unit']}  {change:+7.1f}%{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the hot-path benchmark suite.")
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results as {BASELINE}")
+    parser.add_argument("--compare", nargs="?", const=str(BASELINE), metavar="PATH",
+                        help="compare with a baseline (default: the stored one)")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown that counts as a regression (default: 10)")
+    parser.add_argument("--only", metavar="TEXT", help="run only cases whose name contains TEXT")
+    args = parser.parse_args()
+    if args.compare and not Path(args.compare).is_file():
+        parser.error(f"no baseline at {args.compare}, create one with --save-baseline")
+    if not any(_selected(names, args.only) for names, _, _ in GROUPS):
+        parser.error(f"no case name contains {args.only!r}")
+
+    report = asyncio.run(_run(args.only))
+    _print(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n  baseline saved to {BASELINE}")
+    if args.compare:
+        regressions = _compare(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n  {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()